@@ -0,0 +1,413 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import yt_dlp
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = "cache"
+CACHE_INDEX_FILE = "index.db"
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE_MB", "2048")) * 1024 * 1024
+CACHE_EVICTION_POLICY = os.getenv("CACHE_EVICTION_POLICY", "lru").lower()
+
+# File lạ trong thư mục cache chỉ bị dọn khi đã cũ hơn mức này (giây),
+# để không xóa file một tiến trình khác đang tải dở
+CACHE_ORPHAN_AGE = 3600
+
+# Một lượt tải đang diễn ra ở tiến trình khác bị coi là bỏ dở sau bấy nhiêu giây
+CACHE_DOWNLOAD_TIMEOUT = 900
+# Chu kỳ kiểm tra lượt tải của tiến trình khác đã xong chưa (giây)
+CACHE_DOWNLOAD_POLL = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    info TEXT NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    refs INTEGER NOT NULL,
+    PRIMARY KEY (key, pid)
+);
+CREATE TABLE IF NOT EXISTS downloads (
+    key TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL
+);
+"""
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    # os.kill trên Windows sẽ kết thúc tiến trình, nên coi như còn sống
+    if sys.platform == "win32":
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+
+    return True
+
+class CacheEntry:
+    """Một file âm thanh đã được tải về trong cache."""
+
+    def __init__(self, key: str, path: str, size: int, info: dict, last_access: float = 0, hits: int = 0):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.info = info
+        self.last_access = last_access or time.time()
+        self.hits = hits
+        # Số tham chiếu do tiến trình này giữ
+        self.refs = 0
+
+class AudioCache:
+    """
+    Cache âm thanh dùng chung cho tất cả các server, khóa theo extractor + id.
+
+    Index nằm trong một CSDL SQLite (chế độ WAL) ngay trong thư mục cache, nên
+    nhiều tiến trình bot trên cùng một máy dùng chung các file đã tải. Mỗi tiến
+    trình ghi "lease" (số tham chiếu theo PID) cho các file nó đang dùng; file còn
+    lease thì không bao giờ bị xóa, các file còn lại chỉ bị xóa (theo LRU hoặc LFU)
+    khi tổng dung lượng vượt quá giới hạn. Lease của tiến trình đã chết được thu hồi.
+
+    Bảng `downloads` đánh dấu các khóa đang được tải, để tiến trình khác chờ rồi
+    dùng file trong cache thay vì tải thêm một lần nữa.
+
+    Mọi thao tác với SQLite và ổ đĩa chạy trên một luồng riêng (có thể phải chờ khóa
+    ghi của tiến trình khác), nên vòng lặp sự kiện không bao giờ bị chặn. Các thao tác
+    không cần kết quả (`release`, `adopt`, `finish_download`) chỉ được xếp hàng.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_size: int = CACHE_MAX_SIZE, policy: str = CACHE_EVICTION_POLICY):
+        self.directory = directory
+        self.index_path = os.path.join(directory, CACHE_INDEX_FILE)
+        self.max_size = max_size
+        self.policy = policy if policy in ("lru", "lfu") else "lru"
+        self.entries: dict[str, CacheEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.db: sqlite3.Connection | None = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-cache")
+        self._extractors = None
+
+    @staticmethod
+    def make_key(extractor_key: str, video_id: str) -> str:
+        return f"{extractor_key}-{video_id}"
+
+    def key_from_info(self, info: dict) -> str | None:
+        extractor_key = info.get("extractor_key")
+        video_id = info.get("id")
+        if not extractor_key or not video_id:
+            return None
+
+        return self.make_key(extractor_key, video_id)
+
+    def key_from_url(self, url: str) -> str | None:
+        """Suy ra khóa cache từ URL mà không cần truy cập mạng."""
+        if self._extractors is None:
+            self._extractors = [
+                ie for ie in yt_dlp.extractor.gen_extractor_classes()
+                if ie.ie_key() != "Generic"
+            ]
+
+        for ie in self._extractors:
+            if not ie.suitable(url):
+                continue
+
+            video_id = ie.get_temp_id(url)
+            if not video_id:
+                return None
+
+            return self.make_key(ie.ie_key(), video_id)
+
+        return None
+
+    async def acquire(self, key: str) -> CacheEntry | None:
+        """Lấy một file từ cache và giữ tham chiếu tới nó. Trả về None nếu không có."""
+        return await self._run(self._acquire, key)
+
+    async def add(self, key: str, path: str, info: dict) -> CacheEntry | None:
+        """
+        Đăng ký một file vừa tải về và giữ tham chiếu tới nó. Trả về None nếu file
+        đã bị tiến trình khác xóa mất trước khi kịp đăng ký.
+        """
+        return await self._run(self._add, key, path, info)
+
+    def release(self, key: str):
+        """Bỏ tham chiếu tới một file, cho phép nó bị xóa khi cache đầy."""
+        self.executor.submit(self._release, key)
+
+    def adopt(self, key: str | None, path: str, info: dict):
+        """Đưa vào cache một file không ai giữ; không có khóa thì xóa file đi."""
+        self.executor.submit(self._adopt, key, path, info)
+
+    async def stats(self) -> dict:
+        return await self._run(self._stats)
+
+    async def claim_download(self, key: str) -> bool:
+        """
+        Đánh dấu tiến trình này đang tải `key`. Trả về False nếu một lượt tải khác
+        (ở tiến trình này hoặc tiến trình khác) vẫn đang diễn ra.
+        """
+        return await self._run(self._claim_download, key)
+
+    def finish_download(self, key: str):
+        self.executor.submit(self._finish_download, key)
+
+    async def wait_download(self, key: str):
+        """Chờ tới khi không còn lượt tải nào của `key` đang diễn ra."""
+        while await self._run(self._download_active, key):
+            await asyncio.sleep(CACHE_DOWNLOAD_POLL)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _acquire(self, key: str) -> CacheEntry | None:
+        db = self._connect()
+        # Đọc không cần khóa (WAL): lần tìm không thấy không phải chờ khóa ghi của tiến trình khác
+        if not db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+            self.misses += 1
+            return None
+
+        with db:
+            # Chỉ lấy khóa ghi để ghi lease, đọc lại vì tiến trình khác có thể vừa xóa mục này
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT path, size, info, last_access, hits FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and not os.path.exists(row[0]):
+                log.warning(f"File cache {row[0]} đã bị mất, xóa khỏi index.")
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                db.execute("DELETE FROM leases WHERE key = ?", (key,))
+                self.entries.pop(key, None)
+                row = None
+
+            if not row:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            db.execute("UPDATE entries SET hits = hits + 1, last_access = ? WHERE key = ?", (now, key))
+            self._lease(db, key, 1)
+
+        entry = self.entries.get(key)
+        if not entry:
+            entry = self.entries[key] = CacheEntry(key, row[0], row[1], json.loads(row[2]), row[3], row[4])
+        entry.refs += 1
+        entry.hits = row[4] + 1
+        entry.last_access = now
+        self.hits += 1
+        log.info(f"Cache hit: {key} (refs={entry.refs})")
+        return entry
+
+    def _add(self, key: str, path: str, info: dict) -> CacheEntry | None:
+        db = self._connect()
+        now = time.time()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                log.warning(f"File cache {path} đã bị xóa trước khi kịp đăng ký.")
+                return None
+
+            # Tiến trình khác có thể đã đăng ký cùng file trước đó
+            db.execute(
+                "INSERT INTO entries (key, path, size, info, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET last_access = excluded.last_access",
+                (key, path, size, json.dumps(info), now),
+            )
+            self._lease(db, key, 1)
+
+        entry = self.entries.get(key)
+        if entry:
+            entry.refs += 1
+            entry.last_access = now
+            return entry
+
+        entry = self.entries[key] = CacheEntry(key, path, size, info, now)
+        entry.refs = 1
+        log.info(f"Đã thêm {key} vào cache ({size / 1024 / 1024:.1f} MB)")
+
+        self._evict()
+        return entry
+
+    def _release(self, key: str):
+        entry = self.entries.get(key)
+        if not entry or entry.refs <= 0:
+            return
+
+        entry.refs -= 1
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._lease(db, key, -1)
+
+        if entry.refs == 0:
+            self.entries.pop(key, None)
+
+        self._evict()
+
+    def _adopt(self, key: str | None, path: str, info: dict):
+        if not key:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+
+        if self._add(key, path, info):
+            self._release(key)
+
+    def _evict(self):
+        db = self._connect()
+        # Đọc không cần khóa (WAL): phần lớn các lần gọi dừng ở đây
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        order = "hits, last_access" if self.policy == "lfu" else "last_access"
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            self._recover_leases(db)
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            candidates = db.execute(
+                "SELECT key, path, size FROM entries "
+                "WHERE key NOT IN (SELECT key FROM leases) "
+                f"ORDER BY {order}"
+            ).fetchall()
+
+            for key, path, size in candidates:
+                if total <= self.max_size:
+                    break
+
+                # Xóa file trước khi commit: tiến trình khác không thể giữ lease
+                # cho file này vì đang phải chờ khóa ghi
+                try:
+                    os.remove(path)
+                    log.info(f"Đã xóa file cache: {path}")
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    log.error(f"Lỗi khi xóa file cache {path}: {e}")
+                    continue
+
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def _stats(self) -> dict:
+        count, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {
+            "entries": count,
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _claim_download(self, key: str) -> bool:
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            if self._download_owner(db, key):
+                return False
+
+            db.execute(
+                "INSERT OR REPLACE INTO downloads (key, pid, started) VALUES (?, ?, ?)",
+                (key, os.getpid(), time.time()),
+            )
+            return True
+
+    def _finish_download(self, key: str):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM downloads WHERE key = ? AND pid = ?", (key, os.getpid()))
+
+    def _download_active(self, key: str) -> bool:
+        return self._download_owner(self._connect(), key) is not None
+
+    @staticmethod
+    def _download_owner(db: sqlite3.Connection, key: str) -> int | None:
+        """PID của tiến trình đang tải `key`, bỏ qua tiến trình đã dừng hoặc tải quá lâu."""
+        row = db.execute("SELECT pid, started FROM downloads WHERE key = ?", (key,)).fetchone()
+        if not row or not _pid_alive(row[0]) or time.time() - row[1] > CACHE_DOWNLOAD_TIMEOUT:
+            return None
+
+        return row[0]
+
+    def _lease(self, db: sqlite3.Connection, key: str, delta: int):
+        pid = os.getpid()
+        db.execute(
+            "INSERT INTO leases (key, pid, refs) VALUES (?, ?, ?) "
+            "ON CONFLICT(key, pid) DO UPDATE SET refs = refs + excluded.refs",
+            (key, pid, delta),
+        )
+        db.execute("DELETE FROM leases WHERE key = ? AND pid = ? AND refs <= 0", (key, pid))
+
+    def _recover_leases(self, db: sqlite3.Connection):
+        """Thu hồi lease của các tiến trình không còn chạy (bị tắt đột ngột)."""
+        for (pid,) in db.execute("SELECT DISTINCT pid FROM leases").fetchall():
+            if not _pid_alive(pid):
+                log.info(f"Thu hồi lease cache của tiến trình đã dừng (PID {pid})")
+                db.execute("DELETE FROM leases WHERE pid = ?", (pid,))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.db:
+            return self.db
+
+        os.makedirs(self.directory, exist_ok=True)
+        # isolation_level=None: tự quản lý transaction bằng BEGIN IMMEDIATE
+        db = sqlite3.connect(self.index_path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        self.db = db
+
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            # PID trùng với một tiến trình cũ đã chết: lease đó chắc chắn là rác
+            db.execute("DELETE FROM leases WHERE pid = ?", (os.getpid(),))
+            db.execute("DELETE FROM downloads WHERE pid = ?", (os.getpid(),))
+            self._recover_leases(db)
+            self._remove_orphans(db)
+
+        count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        log.info(f"Đã mở index cache: {count} file, {size / 1024 / 1024:.1f} MB")
+        self._evict()
+        return db
+
+    def _remove_orphans(self, db: sqlite3.Connection):
+        """Dọn các file không được quản lý (từ phiên bản cũ hoặc tải dở từ lâu)."""
+        known = {os.path.abspath(path) for (path,) in db.execute("SELECT path FROM entries")}
+        index = os.path.abspath(self.index_path)
+        now = time.time()
+
+        for name in os.listdir(self.directory):
+            path = os.path.abspath(os.path.join(self.directory, name))
+            if path in known or path.startswith(index) or not os.path.isfile(path):
+                continue
+
+            try:
+                if now - os.path.getmtime(path) > CACHE_ORPHAN_AGE:
+                    os.remove(path)
+            except OSError as e:
+                log.warning(f"Không thể xóa file cache không dùng {path}: {e}")
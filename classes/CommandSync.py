@@ -0,0 +1,109 @@
+import discord
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from discord import app_commands
+
+log = logging.getLogger(__name__)
+
+COMMAND_SYNC_FILE = os.getenv("COMMAND_SYNC_FILE", "command_sync.json")
+
+# Số lần đồng bộ chạy song song khi có nhiều server cần đồng bộ
+COMMAND_SYNC_CONCURRENCY = 4
+
+class CommandSync:
+    """
+    Chỉ đồng bộ lệnh slash với Discord khi cây lệnh thực sự thay đổi.
+
+    Cây lệnh của mỗi phạm vi (toàn cục hoặc từng server) được chuyển thành JSON
+    giống hệt dữ liệu gửi lên Discord rồi băm lại; mã băm của lần đồng bộ thành
+    công gần nhất được lưu vào file, nên các lần khởi động sau không cần gọi API
+    nếu không có gì thay đổi.
+    """
+
+    def __init__(self, tree: app_commands.CommandTree, path: str = COMMAND_SYNC_FILE):
+        self.tree = tree
+        self.path = path
+        self.semaphore = asyncio.Semaphore(COMMAND_SYNC_CONCURRENCY)
+        self.hashes: dict[str, str] = self._load()
+
+    def tree_hash(self, guild: discord.abc.Snowflake | None = None) -> str:
+        payload = [command.to_dict(self.tree) for command in self.tree.get_commands(guild=guild)]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    async def sync(self, guild: discord.abc.Snowflake | None = None, save: bool = True) -> bool:
+        """Đồng bộ một phạm vi nếu cần, trả về True nếu đã gọi API."""
+        scope = str(guild.id) if guild else "global"
+        digest = self.tree_hash(guild)
+
+        # Server chưa từng được ghi nhận mặc định không có lệnh riêng
+        known = self.hashes.get(scope) or (self.empty_hash if guild else None)
+        if known == digest:
+            return False
+
+        async with self.semaphore:
+            while True:
+                try:
+                    await self.tree.sync(guild=guild)
+                    break
+                except discord.RateLimited as e:
+                    log.warning(f"Đồng bộ lệnh ({scope}) bị giới hạn, thử lại sau {e.retry_after:.1f}s")
+                    await asyncio.sleep(e.retry_after)
+
+        self.hashes[scope] = digest
+        if save:
+            await self.save()
+        return True
+
+    async def save(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._save, dict(self.hashes))
+
+    async def sync_all(self, guilds: list[discord.Guild], include_global: bool = True) -> int:
+        """Đồng bộ lệnh toàn cục và lệnh riêng của các server, trả về số phạm vi đã gọi API."""
+        scopes = [None, *guilds] if include_global else list(guilds)
+        results = await asyncio.gather(
+            *(self.sync(guild, save=False) for guild in scopes),
+            return_exceptions=True,
+        )
+
+        synced = 0
+        for guild, result in zip(scopes, results):
+            if isinstance(result, discord.Forbidden):
+                log.warning(f"Không có quyền đồng bộ lệnh cho server: {guild.name} ({guild.id})")
+            elif isinstance(result, Exception):
+                log.error(f"Lỗi khi đồng bộ lệnh cho {guild.id if guild else 'toàn cục'}:", exc_info=result)
+            elif result:
+                synced += 1
+
+        if synced:
+            await self.save()
+        return synced
+
+    @property
+    def empty_hash(self) -> str:
+        return hashlib.sha256(b"[]").hexdigest()
+
+    def _load(self) -> dict[str, str]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Không thể đọc {self.path}, sẽ đồng bộ lại toàn bộ lệnh: {e}")
+            return {}
+
+    def _save(self, hashes: dict[str, str]):
+        if not self.path:
+            return
+
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(hashes, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.error(f"Không thể ghi {self.path}: {e}")
@@ -0,0 +1,95 @@
+import discord
+import asyncio
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable
+
+log = logging.getLogger(__name__)
+
+# Khoảng thời gian tối thiểu giữa hai lần sửa tin nhắn tiến độ (giây)
+PROGRESS_EDIT_INTERVAL = 2.0
+
+class EnqueueJob:
+    """
+    Một tác vụ thêm bài hát chạy nền, báo tiến độ bằng cách sửa một tin nhắn duy nhất.
+
+    Lệnh phát nhạc chỉ cần tạo tác vụ rồi trả lời ngay, việc phân giải và tải về
+    diễn ra ở đây. Mỗi server có thể có nhiều tác vụ cùng lúc và có thể hủy từng cái.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, jobs: dict[int, "EnqueueJob"], description: str, message: discord.Message | None):
+        self.id = next(self._ids)
+        self.jobs = jobs
+        self.description = description
+        self.message = message
+        self.status = "Đang chờ..."
+        self.percent: float | None = None
+        self.task: asyncio.Task | None = None
+        self._last_edit = 0.0
+        self._editing = False
+        self._edit_task: asyncio.Task | None = None
+
+    def start(self, func: Callable[["EnqueueJob"], Awaitable[None]]) -> "EnqueueJob":
+        self.jobs[self.id] = self
+        self.task = asyncio.create_task(self._run(func))
+        return self
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def progress_hook(self) -> Callable[[float], None]:
+        """Hàm nhận phần trăm tải về, an toàn khi gọi từ luồng worker của yt-dlp."""
+        loop = asyncio.get_running_loop()
+        return lambda percent: loop.call_soon_threadsafe(self._on_progress, percent)
+
+    async def update(self, status: str):
+        self.status = status
+        self.percent = None
+        await self._edit(status)
+
+    async def finish(self, content: str):
+        self.status = content
+        await self._edit(content, force=True)
+
+    def describe(self) -> str:
+        if self.percent is None:
+            return self.status
+
+        return f"{self.status} `{self.percent:.0f}%`"
+
+    async def _run(self, func: Callable[["EnqueueJob"], Awaitable[None]]):
+        try:
+            await func(self)
+        except asyncio.CancelledError:
+            await self.finish(f"🚫 Đã hủy: {self.description}")
+        except Exception as e:
+            log.error(f"Lỗi trong tác vụ thêm bài #{self.id} ({self.description}):", exc_info=e)
+            await self.finish(f"❌ Đã có lỗi khi xử lý: {self.description}")
+        finally:
+            self.jobs.pop(self.id, None)
+
+    def _on_progress(self, percent: float):
+        self.percent = percent
+        if self._editing or time.monotonic() - self._last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+
+        self._edit_task = asyncio.create_task(self._edit(self.describe()))
+
+    async def _edit(self, content: str, force: bool = False):
+        if not self.message:
+            return
+        if not force and (self._editing or time.monotonic() - self._last_edit < PROGRESS_EDIT_INTERVAL):
+            return
+
+        self._editing = True
+        self._last_edit = time.monotonic()
+        try:
+            await self.message.edit(content=content)
+        except discord.HTTPException as e:
+            log.warning(f"Không thể cập nhật tin nhắn tiến độ #{self.id}: {e}")
+        finally:
+            self._editing = False
@@ -1,23 +1,54 @@
 import discord
 import asyncio
 import logging
+import os
+import time
 from discord.ext import commands
 import discord.http
-from classes import Song
+from classes import Song, OggOpusSource, PrebufferedSource, LiveSource, TrackedSource, PlaybackQueue, EnqueueJob, UIUpdater, TimerWheel, QueueJournal
 from typing import Union
-from enums import LoopMode
+from classes.utils import format_duration
+from enums import LoopMode, TaskPriority
 
 log = logging.getLogger(__name__)
 AnyContext = Union[commands.Context, discord.Interaction]
 VocalGuildChannel = Union[discord.VoiceChannel, discord.StageChannel]
 
+# Âm lượng mặc định (%). Ở 100%, nguồn Opus được gửi thẳng cho Discord không cần mã hóa lại
+DEFAULT_VOLUME = min(200, max(0, int(os.getenv("DEFAULT_VOLUME", "100"))))
+
+PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", "2"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "3"))
+
+# Giới hạn số bài hát được tải trước cùng lúc trên toàn bộ bot
+prefetch_semaphore = asyncio.Semaphore(PREFETCH_WORKERS)
+
+# Thời gian chờ trước khi tự ngắt kết nối: hàng đợi trống / chỉ còn một mình trong kênh (giây)
+IDLE_TIMEOUT = 300
+ALONE_TIMEOUT = 900
+
+# Hẹn giờ dùng chung cho mọi server
+timers = TimerWheel()
+# Nhật ký trạng thái các server để khôi phục sau khi khởi động lại
+journal = QueueJournal()
+
+# Thời gian chờ discord.py tự kết nối lại kênh thoại trước khi bỏ cuộc (giây)
+VOICE_RECONNECT_TIMEOUT = 30
+# Thời gian chờ phân giải lại URL khi luồng trực tiếp bị ngắt (giây)
+LIVE_RESOLVE_TIMEOUT = 30
+
+# Chuẩn bị nguồn phát của bài tiếp theo khi bài hiện tại còn bấy nhiêu giây
+PREPARE_LEAD_TIME = 10
+# Số khung hình (20ms) được đọc trước cho bài tiếp theo
+PREBUFFER_FRAMES = 25
+
 class GuildState:
     """Quản lý trạng thái của từng server."""
 
     def __init__(self, bot: commands.Bot, guild_id: int):
         self.bot = bot
         self.guild_id = guild_id
-        self.queue = asyncio.Queue[Song]()
+        self.queue = PlaybackQueue[Song]()
         self.voice_client: discord.VoiceClient | None = None
         self.voice_channel: discord.VoiceChannel | None = None
         self.now_playing_message: discord.Message | None = None
@@ -26,52 +57,297 @@ class GuildState:
         self.player_task: asyncio.Task | None = None
         self.last_ctx: AnyContext | None = None
         self.song_finished_event = asyncio.Event()
-        self.volume = 0.5
+        self.volume = DEFAULT_VOLUME / 100
         self.restarting = False
+        self.prefetch_count = PREFETCH_COUNT
+        self.prefetch_tasks: dict[Song, asyncio.Task] = {}
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+        self.jobs: dict[int, EnqueueJob] = {}
+        self.prepare_task: asyncio.Task | None = None
+        self.prepared: tuple[Song, float, discord.AudioSource] | None = None
+        self.ui = UIUpdater(self)
+        self.finished_at: float | None = None
+        self.last_gap: float | None = None
+        self.closed = False
+        self.tracker: TrackedSource | None = None
+        self.restored_channel: discord.abc.Messageable | None = None
+
+    @property
+    def text_channel(self) -> discord.abc.Messageable | None:
+        """Kênh nhận thông báo: kênh của lệnh gần nhất, hoặc kênh cũ nếu phiên được khôi phục."""
+        if self.last_ctx:
+            return self.last_ctx.channel
+
+        return self.restored_channel
+
+    @property
+    def bitrate(self) -> int | None:
+        """Bitrate (bit/s) của kênh thoại đang kết nối, dùng để chọn định dạng tải về."""
+        return self.voice_channel.bitrate if self.voice_channel else None
+
+    def snapshot(self) -> dict | None:
+        """Những gì cần để khôi phục phiên phát nhạc này sau khi bot khởi động lại."""
+        if not self.voice_channel or not self.text_channel:
+            return None
+
+        current = None
+        position = 0
+        if self.current_song and not self.current_song.is_live:
+            current = {**self.current_song.to_dict(), "requester_id": self.current_song.requester.id}
+            playing = self.voice_client and (self.voice_client.is_playing() or self.voice_client.is_paused())
+            position = round(self.get_position(), 2) if playing else self.current_song.start_time
+
+        return {
+            "voice_channel_id": self.voice_channel.id,
+            "text_channel_id": self.text_channel.id,
+            "volume": self.volume,
+            "loop_mode": self.loop_mode.value,
+            "current": current,
+            "position": position,
+            "queue": [{**song.to_dict(), "requester_id": song.requester.id} for song in self.queue],
+        }
+
+    def save(self):
+        journal.mark(self.guild_id)
 
     async def connect_voice(self, channel: VocalGuildChannel):
         if not self.voice_client or not self.voice_client.is_connected():
             log.info(f"Connecting to voice channel #{channel.id}")
             self.voice_client = await channel.connect()
             self.voice_channel = channel
+            journal.track(self.guild_id, self.snapshot)
             return
 
         if self.voice_client.channel != channel:
             log.info(f"Moving to voice channel #{channel.id}")
             await self.voice_client.move_to(channel)
             self.voice_channel = channel
+            self.save()
 
     async def add_song(self, song: Song):
-        await self.queue.put(song)
+        self.queue.append(song)
         song.guild = self
         log.info(f"Added song {song.title} to guild {self.guild_id}'s queue")
+        self.schedule_prefetch()
+        self.save()
+
+    def schedule_prefetch(self):
+        """Tải trước các bài sắp phát, hủy những tác vụ tải trước không còn cần thiết."""
+        upcoming = [
+            song for song in self.queue.head(self.prefetch_count)
+            if not song.resolved
+        ]
+
+        for song, task in list(self.prefetch_tasks.items()):
+            if song not in upcoming:
+                task.cancel()
+                del self.prefetch_tasks[song]
+
+        for song in upcoming:
+            if song not in self.prefetch_tasks:
+                self.prefetch_tasks[song] = asyncio.create_task(self._prefetch(song))
+
+    def cancel_prefetch(self):
+        for task in self.prefetch_tasks.values():
+            task.cancel()
+
+        self.prefetch_tasks.clear()
+
+    async def _prefetch(self, song: Song):
+        async with prefetch_semaphore:
+            log.info(f"Guild {self.guild_id}: Tải trước bài hát '{song.title}'")
+            if await song.resolve(TaskPriority.PREFETCH):
+                song.prefetched = True
+
+    async def resolve_song(self, song: Song) -> bool:
+        """Đảm bảo bài hát đã được tải về trước khi phát, ghi nhận hit/miss của việc tải trước."""
+        task = self.prefetch_tasks.pop(song, None)
+
+        if song.resolved:
+            if song.prefetched:
+                self.prefetch_hits += 1
+            return True
+
+        self.prefetch_misses += 1
+
+        # Đang tải trước dở dang thì chờ nó xong thay vì tải lại từ đầu
+        if task and not task.done():
+            await task
+
+        return await song.resolve()
 
     def start_player_loop(self):
         if self.player_task is None or self.player_task.done():
             self.player_task = asyncio.create_task(self.player_loop())
 
+    def create_source(self, song: Song, prebuffer: bool = False, start_time: float | None = None) -> discord.AudioSource:
+        if start_time is None:
+            start_time = song.start_time
+
+        # Luồng trực tiếp: đệm chống giật và tự mở lại khi mất kết nối
+        if song.is_live:
+            source = LiveSource(
+                lambda: discord.FFmpegPCMAudio(song.get_source(), **song.get_playback_options()),
+                refresh=lambda: self._refresh_live(song),
+                reconnect_on_eof=song.is_endless(),
+            )
+            return discord.PCMVolumeTransformer(source, volume=self.volume)
+
+        path = song.get_source()
+
+        # Nguồn Opus ở âm lượng 100% được chuyển thẳng, không giải mã/mã hóa lại
+        if self.volume == 1.0 and song.is_opus():
+            if path == song.filepath and OggOpusSource.supports(path):
+                return OggOpusSource(path, start_time)
+
+            source = discord.FFmpegOpusAudio(path, codec="copy", **song.get_playback_options(start_time))
+            return PrebufferedSource(source) if prebuffer else source
+
+        source = discord.FFmpegPCMAudio(path, **song.get_playback_options(start_time))
+        return discord.PCMVolumeTransformer(
+            PrebufferedSource(source) if prebuffer else source, volume=self.volume
+        )
+
     def start_stream(self):
         log.info("Starting audio stream...")
         if self.voice_client.is_playing():
             self.voice_client.stop()
 
-        source = discord.PCMVolumeTransformer(
-            discord.FFmpegPCMAudio(
-                self.current_song.url if self.current_song.is_live else self.current_song.filepath,
-                **self.current_song.get_playback_options()
-            ),
-            volume=self.volume,
-        )
-
+        source = self._take_prepared(self.current_song) or self.create_source(self.current_song)
+        self.tracker = TrackedSource(source, self.current_song)
         self.voice_client.play(
-            source,
+            self.tracker,
             expected_packet_loss=0.2,
             signal_type="music",
-            after=lambda e: self.bot.loop.call_soon_threadsafe(
-                self.song_finished_event.set
-            ),
+            after=lambda e: self.bot.loop.call_soon_threadsafe(self._on_song_finished),
         )
 
+        if self.finished_at is not None and not self.restarting:
+            self.last_gap = time.perf_counter() - self.finished_at
+            self.finished_at = None
+            log.debug(f"Guild {self.guild_id}: Khoảng lặng giữa hai bài {self.last_gap * 1000:.1f}ms")
+
+        self.cancel_prepare()
+        if self.current_song.duration and not self.current_song.is_live:
+            self.prepare_task = asyncio.create_task(self._prepare_next(self.current_song))
+
+    def _refresh_live(self, song: Song) -> bool:
+        """Phân giải lại URL của luồng trực tiếp, gọi từ luồng đọc của LiveSource."""
+        future = asyncio.run_coroutine_threadsafe(song.refresh_stream(force=True), self.bot.loop)
+        try:
+            return future.result(timeout=LIVE_RESOLVE_TIMEOUT)
+        finally:
+            future.cancel()
+
+    def _on_song_finished(self):
+        self.finished_at = time.perf_counter()
+        self.song_finished_event.set()
+
+    async def _prepare_next(self, playing: Song):
+        """Khi bài hiện tại sắp hết, khởi động sẵn nguồn phát của bài tiếp theo trong hàng đợi."""
+        # Vị trí chỉ tăng khi đang phát, nên tạm dừng sẽ tự động lùi thời điểm chuẩn bị
+        while (remaining := playing.duration - self.get_position()) > PREPARE_LEAD_TIME:
+            await asyncio.sleep(remaining - PREPARE_LEAD_TIME)
+
+        song, start_time = self._next_song()
+        if not song or song.is_live:
+            return
+
+        if self.prepared and self.prepared[0] is song and self.prepared[1] == start_time:
+            return
+
+        if not song.resolved:
+            task = self.prefetch_tasks.get(song)
+            if not task:
+                return
+            # Không dùng `await task` để việc hủy chuẩn bị không hủy luôn việc tải trước
+            await asyncio.wait([task])
+            if not song.resolved or self._next_song()[0] is not song:
+                return
+
+        await song.attach_cached_file()
+        source = self.create_source(song, prebuffer=True, start_time=start_time)
+        buffered = source.original if isinstance(source, discord.PCMVolumeTransformer) else source
+        if isinstance(buffered, PrebufferedSource):
+            future = asyncio.get_running_loop().run_in_executor(None, buffered.prime, PREBUFFER_FRAMES)
+            try:
+                await asyncio.shield(future)
+            except asyncio.CancelledError:
+                future.add_done_callback(lambda _: source.cleanup())
+                raise
+
+        self.discard_prepared()
+        self.prepared = (song, start_time, source)
+        log.info(f"Guild {self.guild_id}: Đã chuẩn bị sẵn nguồn phát cho '{song.title}'")
+
+    def _next_song(self) -> tuple[Song, float]:
+        """Bài sẽ được phát sau bài hiện tại (theo chế độ lặp) và vị trí bắt đầu của nó."""
+        if self.loop_mode == LoopMode.SONG and self.current_song:
+            return self.current_song, 0
+
+        song = self.queue.peek()
+        return song, song.start_time if song else 0
+
+    def _take_prepared(self, song: Song) -> discord.AudioSource | None:
+        """Lấy nguồn đã chuẩn bị nếu nó đúng là của bài sắp phát và vẫn còn phù hợp."""
+        if not self.prepared:
+            return None
+
+        # Phát lại bài hiện tại (tua, đổi âm lượng) thì giữ nguyên nguồn của bài tiếp theo
+        if self.prepared[0] is not song and self.restarting:
+            return None
+
+        prepared_song, start_time, source = self.prepared
+        self.prepared = None
+        passthrough = not isinstance(source, discord.PCMVolumeTransformer)
+        if (
+            prepared_song is song and start_time == song.start_time
+            and passthrough == (self.volume == 1.0 and song.is_opus())
+        ):
+            if not passthrough:
+                source.volume = self.volume
+            return source
+
+        source.cleanup()
+        return None
+
+    def cancel_prepare(self):
+        if self.prepare_task:
+            self.prepare_task.cancel()
+            self.prepare_task = None
+
+    def discard_prepared(self):
+        if self.prepared:
+            self.prepared[2].cleanup()
+            self.prepared = None
+
+    def get_position(self) -> float:
+        """Vị trí phát (giây) của bài hiện tại, tính theo số mẫu âm thanh đã gửi đi."""
+        if not self.current_song:
+            return 0
+
+        if self.tracker and self.tracker.song is self.current_song:
+            return self.current_song.start_time + self.tracker.elapsed()
+
+        return self.current_song.start_time
+
+    def apply_volume(self):
+        if not self.tracker or not self.voice_client or self.voice_client.source is not self.tracker:
+            return
+
+        source = self.tracker.original
+        if isinstance(source, discord.PCMVolumeTransformer):
+            source.volume = self.volume
+        elif self.volume != 1.0:
+            # Đường chuyển thẳng Opus không chỉnh được âm lượng, chuyển về đường PCM
+            self.seek(self.get_position())
+
+    def seek(self, seconds: float):
+        """Phát lại bài hiện tại từ vị trí `seconds`, dùng lại file/URL đã có (không tải lại)."""
+        self.current_song.start_time = seconds
+        self.restart_current_song()
+
     def restart_current_song(self):
         log.info("Restarting current song...")
         self.restarting = True
@@ -89,50 +365,68 @@ class GuildState:
                 previous_song = self.current_song
                 if previous_song:
                     if self.loop_mode == LoopMode.QUEUE:
-                        await self.queue.put(previous_song)
+                        self.queue.append(previous_song)
                     elif self.loop_mode != LoopMode.SONG:
                         previous_song.cleanup()
+                    else:
+                        # Lặp lại bài hát thì phát lại từ đầu, kể cả khi lần trước đã tua
+                        previous_song.start_time = 0
 
                 # Lấy bài hát tiếp theo
-                try:
-                    # Nếu không lặp lại bài hát, lấy bài mới từ hàng đợi
-                    if self.loop_mode != LoopMode.SONG or not self.current_song:
-                        self.current_song = await asyncio.wait_for(
-                            self.queue.get(), timeout=300
-                        )
-                    # Nếu lặp lại, self.current_song vẫn giữ nguyên
-                except asyncio.TimeoutError:
-                    log.info(
-                        f"Guild {self.guild_id} không hoạt động trong 5 phút, bắt đầu dọn dẹp."
-                    )
+                # Nếu không lặp lại bài hát, lấy bài mới từ hàng đợi
+                if self.loop_mode != LoopMode.SONG or not self.current_song:
+                    if self.queue.empty():
+                        timers.schedule(("idle", self.guild_id), IDLE_TIMEOUT, self._on_idle)
+                    try:
+                        self.current_song = await self.queue.get()
+                    finally:
+                        timers.cancel(("idle", self.guild_id))
+                # Nếu lặp lại, self.current_song vẫn giữ nguyên
+
+                log.info(
+                    f"Guild {self.guild_id}: Lấy bài hát '{self.current_song.title}' từ hàng đợi."
+                )
 
-                    if self.last_ctx and self.last_ctx.channel:
+                if not await self.resolve_song(self.current_song):
+                    log.warning(
+                        f"Guild {self.guild_id}: Không thể tải bài hát '{self.current_song.title}', bỏ qua."
+                    )
+                    if self.text_channel:
                         try:
-                            await self.last_ctx.channel.send(
-                                "😴 Đã tự động ngắt kết nối do không hoạt động."
+                            await self.text_channel.send(
+                                f"❌ Không thể tải **{self.current_song.title}**, bỏ qua bài này."
                             )
                         except discord.Forbidden:
                             pass
 
-                    return await self.cleanup()
-
-                log.info(
-                    f"Guild {self.guild_id}: Lấy bài hát '{self.current_song.title}' từ hàng đợi."
-                )
-
-                await self.update_voice_channel_status()
-                await self.update_now_playing_message(new_song=True)
+                    self.current_song = None
+                    continue
 
             # Phát bài hát mới
             try:
+                # URL phát trực tiếp có thể đã hết hạn (bài tải trước từ lâu, lặp lại, tua, kết nối lại)
+                if not await self.current_song.refresh_stream():
+                    log.warning(
+                        f"Guild {self.guild_id}: Không thể làm mới URL phát của '{self.current_song.title}', dùng URL cũ."
+                    )
+
                 self.start_stream()
+
+                if not self.restarting:
+                    self.schedule_prefetch()
+                    self.ui.request(new_song=True)
                 self.restarting = False
+                self.save()
 
                 await self.song_finished_event.wait()
 
                 if self.restarting:
                     continue
 
+                # Mất kết nối kênh thoại giữa chừng: chờ kết nối lại rồi phát tiếp từ vị trí cũ
+                if await self._resume_after_reconnect():
+                    continue
+
                 if self.current_song:
                     log.info(
                         f"Guild {self.guild_id}: Sự kiện kết thúc bài hát '{self.current_song.title}' được kích hoạt."
@@ -143,9 +437,9 @@ class GuildState:
                     exc_info=e,
                 )
 
-                if self.last_ctx and self.last_ctx.channel:
+                if self.text_channel:
                     try:
-                        await self.last_ctx.channel.send(
+                        await self.text_channel.send(
                             f"🤖 Gặp lỗi nghiêm trọng, Miku cần khởi động lại trình phát nhạc. Lỗi: `{e}`"
                         )
                     except discord.Forbidden:
@@ -155,9 +449,9 @@ class GuildState:
             # Kiểm tra nếu hàng đợi trống sau khi bài hát kết thúc
             if self.queue.empty() and self.loop_mode == LoopMode.OFF:
                 log.info(f"Guild {self.guild_id}: Hàng đợi đã hết.")
-                if self.last_ctx and self.last_ctx.channel:
+                if self.text_channel:
                     try:
-                        await self.last_ctx.channel.send(
+                        await self.text_channel.send(
                             "🎶 Hàng đợi đã kết thúc! Miku đi nghỉ đây (´｡• ᵕ •｡`) ♡"
                         )
                     except discord.Forbidden:
@@ -165,17 +459,18 @@ class GuildState:
 
                 return await self.cleanup()
 
+    def voice_status(self) -> str:
+        return f"🎵 {self.current_song.title}" if self.current_song else ""
+
     async def update_voice_channel_status(self):
         guild = self.bot.get_guild(self.guild_id)
         route = discord.http.Route("PUT", "/channels/{channel_id}/voice-status", channel_id=self.voice_client.channel.id)
-        payload = {
-            "status": f"🎵 {self.current_song.title}" if self.current_song else ""
-        }
+        payload = {"status": self.voice_status()}
 
         await guild._state.http.request(route, json=payload)
 
     async def update_now_playing_message(self, new_song=False):
-        if not self.last_ctx:
+        if not self.text_channel:
             return
         
         if not self.current_song and self.now_playing_message:
@@ -209,14 +504,15 @@ class GuildState:
                 
         if not self.now_playing_message:
             try:
-                self.now_playing_message = await self.last_ctx.channel.send(
+                self.now_playing_message = await self.text_channel.send(
                     embed=embed, view=view
                 )
             except (discord.Forbidden, discord.HTTPException) as e:
                 log.warning(f"Không thể gửi/cập nhật tin nhắn Now Playing: {e}")
                 self.now_playing_message = None
 
-    def create_now_playing_embed(self) -> discord.Embed:
+    def create_now_playing_embed(self, show_position: bool = True) -> discord.Embed:
+        """`show_position=False` bỏ vị trí phát, dùng để so sánh xem nội dung có thực sự thay đổi."""
         song = self.current_song
         embed = discord.Embed(title=song.title, url=song.url, color=0x39D0D6)
         embed.set_author(
@@ -227,6 +523,8 @@ class GuildState:
         embed.add_field(name="Nghệ sĩ", value=song.uploader or "N/A", inline=True)
         # Add live indicator to duration if song is live
         duration_text = song.format_duration()
+        if show_position:
+            duration_text = f"{format_duration(self.get_position())} / {duration_text}"
         if getattr(song, "is_live", False):
             duration_text = "🔴 LIVE"
         embed.add_field(name="Thời lượng", value=duration_text, inline=True)
@@ -239,9 +537,9 @@ class GuildState:
         next_song_title = (
             "Không có"
             if self.queue.empty()
-            else self.queue._queue[0].title[:50] + "..."
+            else self.queue.peek().title[:50] + "..."
         )
-        total_songs = self.queue.qsize() + (1 if self.current_song else 0)
+        total_songs = len(self.queue) + (1 if self.current_song else 0)
         embed.set_footer(
             text=f"Tiếp theo: {next_song_title} • Lặp: {loop_status[self.loop_mode]} • Tổng cộng: {total_songs} bài"
         )
@@ -327,7 +625,8 @@ class GuildState:
             mode_text[self.loop_mode], ephemeral=True
         )
 
-        await self.update_now_playing_message()
+        self.ui.request()
+        self.save()
 
     async def queue_callback(self, interaction: discord.Interaction):
         embed = self._create_queue_embed()
@@ -347,23 +646,69 @@ class GuildState:
                 value=f"[{self.current_song.title}]({self.current_song.url}) - Y/c bởi {self.current_song.requester.mention}",
                 inline=False,
             )
-        queue_list = list(self.queue._queue)
-        if queue_list:
+        queue_size = len(self.queue)
+        if queue_size:
             queue_text = "\n".join(
                 [
                     f"`{i+1}.` [{song.title}]({song.url})"
-                    for i, song in enumerate(queue_list[:10])
+                    for i, song in enumerate(self.queue.head(10))
                 ]
             )
-            if len(queue_list) > 10:
-                queue_text += f"\n... và {len(queue_list) - 10} bài hát khác."
+            if queue_size > 10:
+                queue_text += f"\n... và {queue_size - 10} bài hát khác."
             embed.add_field(name="🎶 Tiếp theo", value=queue_text, inline=False)
         embed.set_footer(
-            text=f"Tổng cộng: {len(queue_list) + (1 if self.current_song else 0)} bài hát"
+            text=f"Tổng cộng: {queue_size + (1 if self.current_song else 0)} bài hát"
         )
         return embed
 
+    async def _resume_after_reconnect(self) -> bool:
+        song = self.current_song
+        if self.closed or not song or not self.voice_client or self.voice_client.is_connected():
+            return False
+
+        position = self.get_position()
+        if song.duration and position >= song.duration - 1:
+            return False
+
+        log.info(f"Guild {self.guild_id}: Mất kết nối kênh thoại tại {position:.1f}s, chờ kết nối lại...")
+        for _ in range(VOICE_RECONNECT_TIMEOUT):
+            await asyncio.sleep(1)
+            if self.closed:
+                return False
+            if self.voice_client and self.voice_client.is_connected():
+                song.start_time = 0 if song.is_live else position
+                self.restarting = True
+                return True
+
+        log.info(f"Guild {self.guild_id}: Không thể kết nối lại kênh thoại, bắt đầu dọn dẹp.")
+        await self.cleanup()
+        return True
+
+    async def _on_idle(self):
+        log.info(
+            f"Guild {self.guild_id} không hoạt động trong {IDLE_TIMEOUT // 60} phút, bắt đầu dọn dẹp."
+        )
+
+        if self.text_channel:
+            try:
+                await self.text_channel.send(
+                    "😴 Đã tự động ngắt kết nối do không hoạt động."
+                )
+            except discord.Forbidden:
+                pass
+
+        await self.cleanup()
+
     async def cleanup(self):
+        # Nhiều nguồn (hết hàng đợi, hẹn giờ, lệnh stop) có thể cùng yêu cầu dọn dẹp
+        if self.closed:
+            return
+
+        self.closed = True
+        journal.forget(self.guild_id)
+        timers.cancel(("idle", self.guild_id))
+        timers.cancel(("alone", self.guild_id))
         log.info(f"Bắt đầu cleanup cho guild {self.guild_id}")
         self.bot.dispatch("session_end", self.guild_id)
 
@@ -371,6 +716,14 @@ class GuildState:
             await self.voice_client.disconnect(force=True)
             log.info(f"Đã ngắt kết nối voice client khỏi guild {self.guild_id}")
 
+        self.ui.stop()
+        self.cancel_prefetch()
+        self.cancel_prepare()
+        self.discard_prepared()
+
+        for job in list(self.jobs.values()):
+            job.cancel()
+
         if self.current_song:
             self.current_song.cleanup()
             self.current_song = None
@@ -382,12 +735,8 @@ class GuildState:
             log.warning(f"Error occured while updating playing message and status: {e}")
 
         # Cleanup cache files after voice client clean up to avoid cache file locking by ffmpeg
-        while not self.queue.empty():
-            try:
-                song = self.queue.get_nowait()
-                song.cleanup()
-            except asyncio.QueueEmpty:
-                break
+        for song in self.queue.clear():
+            song.cleanup()
 
         # Finally, we can commit sudoku our task.
         if self.player_task:
@@ -0,0 +1,181 @@
+import time
+import logging
+import threading
+import subprocess
+import discord
+from collections import deque
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+# Số khung (20ms) được đọc trước để bù dao động mạng, giữ nhỏ để độ trễ thấp
+LIVE_BUFFER_FRAMES = 50
+# Không nhận được khung mới trong bấy nhiêu giây thì coi như luồng bị treo
+LIVE_STALL_TIMEOUT = 5
+# Số lần mở lại liên tiếp không thành công trước khi bỏ cuộc
+LIVE_MAX_RECONNECTS = 5
+LIVE_MAX_RECONNECT_DELAY = 10
+# Thời gian chờ FFmpeg thoát sau khi hết dữ liệu để biết nó dừng bình thường hay do lỗi (giây)
+LIVE_EXIT_TIMEOUT = 1
+
+SILENCE = b"\x00" * discord.opus.Encoder.FRAME_SIZE
+
+class LiveSource(discord.AudioSource):
+    """
+    Nguồn PCM cho luồng phát trực tiếp, chịu được mạng chập chờn.
+
+    Một luồng riêng đọc trước các khung từ FFmpeg vào bộ đệm vòng có giới hạn; trình
+    phát chỉ lấy từ bộ đệm, nên dao động ngắn không làm giật tiếng, còn khi bộ đệm cạn
+    thì phát khoảng lặng thay vì kết thúc bài. Khi FFmpeg dừng vì lỗi hoặc không trả về
+    dữ liệu quá lâu, nguồn được mở lại (lần đầu với URL cũ, các lần sau phân giải lại URL)
+    mà trình phát không hề biết; chỉ sau nhiều lần thất bại liên tiếp thì bài mới kết thúc.
+
+    FFmpeg kết thúc bình thường (hết dữ liệu) thì bài cũng kết thúc, trừ khi
+    `reconnect_on_eof` (luồng đang phát trực tiếp thật sự, hết dữ liệu là do mất kết nối).
+    """
+
+    def __init__(
+        self, open_source: Callable[[], discord.AudioSource],
+        refresh: Callable[[], object] | None = None, frames: int = LIVE_BUFFER_FRAMES,
+        reconnect_on_eof: bool = False,
+    ):
+        self.open_source = open_source
+        self.refresh = refresh
+        self.reconnect_on_eof = reconnect_on_eof
+        self.frames = frames
+        self.buffer: deque[bytes] = deque()
+        self.condition = threading.Condition()
+        self.source: discord.AudioSource | None = None
+        self.stalled: discord.AudioSource | None = None
+        self.last_frame = time.monotonic()
+        self.finished = False
+        self.closed = False
+        self.reconnects = 0
+        self.underruns = 0
+        self.thread = threading.Thread(target=self._run, name="live-source", daemon=True)
+        self.thread.start()
+
+    def read(self) -> bytes:
+        with self.condition:
+            if self.buffer:
+                frame = self.buffer.popleft()
+                self.condition.notify()
+                return frame
+
+            if self.finished or self.closed:
+                return b""
+
+        # Bộ đệm cạn: phát khoảng lặng để trình phát không coi là hết bài
+        self.underruns += 1
+        self._check_stall()
+        return SILENCE
+
+    def cleanup(self):
+        with self.condition:
+            if self.closed:
+                return
+
+            self.closed = True
+            source = self.source
+            self.condition.notify_all()
+
+        if source:
+            source.cleanup()
+        log.info(f"Luồng trực tiếp đã dừng ({self.reconnects} lần mở lại, {self.underruns} khung lặng)")
+
+    def _check_stall(self):
+        source = self.source
+        if not source or source is self.stalled or time.monotonic() - self.last_frame < LIVE_STALL_TIMEOUT:
+            return
+
+        log.warning(f"Luồng trực tiếp không có dữ liệu trong {LIVE_STALL_TIMEOUT}s, đang mở lại...")
+        self.stalled = source
+        # Dừng FFmpeg để luồng đọc thoát khỏi read(); không làm trên luồng phát âm thanh
+        threading.Thread(target=source.cleanup, name="live-source-stop", daemon=True).start()
+
+    def _run(self):
+        failures = 0
+        while not self.closed and failures <= LIVE_MAX_RECONNECTS:
+            if failures:
+                time.sleep(min(LIVE_MAX_RECONNECT_DELAY, 2 ** (failures - 1)))
+                if self.closed:
+                    break
+
+                self.reconnects += 1
+                log.info(f"Mở lại luồng trực tiếp (lần thử {failures}/{LIVE_MAX_RECONNECTS})...")
+                # Lần đầu thử lại với URL cũ (mạng chập chờn), sau đó mới phân giải lại URL
+                if self.refresh and failures > 1:
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        log.warning(f"Không thể phân giải lại luồng trực tiếp: {e}")
+
+            try:
+                source = self.open_source()
+            except Exception as e:
+                log.warning(f"Không thể mở luồng trực tiếp: {e}")
+                failures += 1
+                continue
+
+            received, clean = self._pump(source)
+            if clean and not self.reconnect_on_eof:
+                break
+
+            # Đọc được một lượng dữ liệu đáng kể thì coi như kết nối đã ổn định trở lại
+            failures = 1 if received >= self.frames else failures + 1
+
+        with self.condition:
+            self.finished = True
+
+        if not self.closed and failures > LIVE_MAX_RECONNECTS:
+            log.error("Không thể kết nối lại luồng trực tiếp, dừng phát.")
+
+    def _pump(self, source: discord.AudioSource) -> tuple[int, bool]:
+        """
+        Đọc khung từ `source` vào bộ đệm cho tới khi nó kết thúc. Trả về số khung đã đọc
+        và liệu nguồn có kết thúc bình thường (không lỗi, không bị treo, FFmpeg thoát với mã 0).
+        """
+        with self.condition:
+            if self.closed:
+                source.cleanup()
+                return 0, False
+            self.source = source
+
+        self.last_frame = time.monotonic()
+        received = 0
+        clean = False
+        try:
+            while not self.closed:
+                frame = source.read()
+                if not frame:
+                    break
+
+                with self.condition:
+                    while len(self.buffer) >= self.frames and not self.closed:
+                        self.condition.wait()
+                    self.buffer.append(frame)
+
+                self.last_frame = time.monotonic()
+                received += 1
+
+            clean = not self.closed and source is not self.stalled and self._exited_cleanly(source)
+        except Exception as e:
+            log.warning(f"Lỗi khi đọc luồng trực tiếp: {e}")
+        finally:
+            with self.condition:
+                self.source = None
+            source.cleanup()
+
+        return received, clean
+
+    @staticmethod
+    def _exited_cleanly(source: discord.AudioSource) -> bool:
+        """Tiến trình FFmpeg của nguồn đã thoát với mã 0 (nguồn không phải FFmpeg thì coi là có)."""
+        process = getattr(source, "_process", None)
+        if process is None:
+            return True
+
+        try:
+            return process.wait(timeout=LIVE_EXIT_TIMEOUT) == 0
+        except subprocess.TimeoutExpired:
+            return False
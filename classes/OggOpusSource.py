@@ -0,0 +1,203 @@
+import discord
+import os
+import mmap
+import bisect
+import logging
+import functools
+
+log = logging.getLogger(__name__)
+
+OPUS_SAMPLE_RATE = 48000
+OGG_PAGE_HEADER_SIZE = 27
+
+def packet_samples(packet: bytes) -> int:
+    """Số mẫu (48kHz) trong một gói Opus, đọc từ byte TOC (RFC 6716, mục 3.1)."""
+    if not packet:
+        return 0
+
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config & 3]
+    elif config < 16:
+        frame = (480, 960)[config & 1]
+    else:
+        frame = (120, 240, 480, 960)[config & 3]
+
+    code = toc & 3
+    if code == 0:
+        count = 1
+    elif code < 3:
+        count = 2
+    else:
+        count = packet[1] & 0x3F if len(packet) > 1 else 0
+
+    return frame * count
+
+def _read_page(mm: mmap.mmap, offset: int):
+    """Đọc header của trang Ogg tại offset: (header_type, granule, lacing, body_offset, next_offset)."""
+    if mm[offset:offset + 4] != b"OggS":
+        raise ValueError(f"Không tìm thấy trang Ogg tại vị trí {offset}")
+
+    header_type = mm[offset + 5]
+    granule = int.from_bytes(mm[offset + 6:offset + 14], "little", signed=True)
+    segments = mm[offset + 26]
+    body = offset + OGG_PAGE_HEADER_SIZE + segments
+    lacing = mm[offset + OGG_PAGE_HEADER_SIZE:body]
+    return header_type, granule, lacing, body, body + sum(lacing)
+
+@functools.lru_cache(maxsize=64)
+def _build_index(path: str, size: int, mtime: float):
+    """
+    Quét header các trang một lần và trả về (pre_skip, audio_start, granules, offsets).
+    Kết quả được cache theo (path, size, mtime) nên các lần tua sau không phải quét lại.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        offset = 0
+        packets = 0
+        pre_skip = 0
+        audio_start = None
+        granules: list[int] = []
+        offsets: list[int] = []
+
+        while offset + OGG_PAGE_HEADER_SIZE <= size:
+            _, granule, lacing, body, next_offset = _read_page(mm, offset)
+
+            if audio_start is None:
+                # Hai gói đầu là OpusHead và OpusTags, âm thanh bắt đầu ở trang kế tiếp
+                if packets == 0 and mm[body:body + 8] == b"OpusHead":
+                    pre_skip = int.from_bytes(mm[body + 10:body + 12], "little")
+                packets += sum(1 for length in lacing if length < 255)
+                if packets >= 2:
+                    audio_start = next_offset
+            elif granule >= 0:
+                granules.append(granule)
+                offsets.append(offset)
+
+            offset = next_offset
+
+    return pre_skip, audio_start or size, granules, offsets
+
+class OggOpusSource(discord.AudioSource):
+    """
+    Phát trực tiếp file Ogg Opus trong cache mà không cần FFmpeg.
+
+    File được ánh xạ vào bộ nhớ (mmap), các gói Opus được tách ra từ các trang
+    Ogg khi cần và gửi thẳng cho Discord. Việc tua dùng bảng granule position
+    đã tính sẵn nên chỉ cần tìm nhị phân thay vì khởi động lại một tiến trình.
+    """
+
+    def __init__(self, path: str, start_time: float = 0):
+        self.path = path
+        self._file = self._mm = None
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            stat = os.stat(path)
+            self.pre_skip, self.audio_start, self.granules, self.offsets = _build_index(
+                path, stat.st_size, stat.st_mtime
+            )
+        except Exception:
+            self.cleanup()
+            raise
+
+        self._packets = self._iter_packets(*self._seek(start_time))
+
+    @staticmethod
+    def supports(path: str | None) -> bool:
+        if not path or not path.endswith((".opus", ".ogg")):
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                return f.read(4) == b"OggS"
+        except OSError:
+            return False
+
+    def is_opus(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        return next(self._packets, b"")
+
+    def cleanup(self):
+        if self._mm is not None and not self._mm.closed:
+            self._mm.close()
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+    def _seek(self, seconds: float) -> tuple[int, int]:
+        """Trả về (offset trang bắt đầu, số mẫu cần bỏ qua để tới đúng vị trí)."""
+        if seconds <= 0 or not self.granules:
+            return self.audio_start, 0
+
+        target = self.pre_skip + int(seconds * OPUS_SAMPLE_RATE)
+        index = bisect.bisect_left(self.granules, target)
+        if index >= len(self.granules):
+            return len(self._mm), 0
+
+        # Granule của một trang là vị trí kết thúc của gói cuối cùng hoàn tất trên trang đó,
+        # nên vị trí bắt đầu của gói mới đầu tiên = granule - tổng độ dài các gói mới trên trang.
+        # Nếu vị trí cần tua nằm trong gói nối từ trang trước thì lùi lại một trang.
+        while True:
+            offset = self.offsets[index]
+            samples = sum(packet_samples(packet) for packet in self._page_packets(offset))
+            position = self.granules[index] - samples
+            if position <= target or index == 0:
+                return offset, max(0, target - position)
+
+            index -= 1
+
+    def _page_packets(self, offset: int):
+        """Các gói bắt đầu và kết thúc trọn vẹn trong một trang."""
+        header_type, _, lacing, pos, _ = _read_page(self._mm, offset)
+        start = pos
+        continued = header_type & 0x01
+        for length in lacing:
+            pos += length
+            if length < 255:
+                if not continued:
+                    yield self._mm[start:pos]
+                continued = False
+                start = pos
+
+    def _iter_packets(self, offset: int, skip_samples: int):
+        size = len(self._mm)
+        partial: list[bytes] = []
+        skipping = None
+
+        while offset + OGG_PAGE_HEADER_SIZE <= size:
+            header_type, _, lacing, pos, next_offset = _read_page(self._mm, offset)
+            # Phần tiếp nối của gói từ trang trước (khi bắt đầu giữa chừng) bị bỏ qua
+            if skipping is None:
+                skipping = bool(header_type & 0x01)
+            start = pos
+
+            for length in lacing:
+                pos += length
+                if length == 255:
+                    continue
+
+                if skipping:
+                    skipping = False
+                    start = pos
+                    continue
+
+                packet = self._mm[start:pos]
+                if partial:
+                    packet = b"".join(partial) + packet
+                    partial.clear()
+                start = pos
+
+                if skip_samples > 0:
+                    skip_samples -= packet_samples(packet)
+                    if skip_samples >= 0:
+                        continue
+
+                yield packet
+
+            if start < pos and not skipping:
+                partial.append(self._mm[start:pos])
+
+            offset = next_offset
@@ -0,0 +1,123 @@
+import asyncio
+import random
+import itertools
+from typing import Generic, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+class PlaybackQueue(Generic[T]):
+    """
+    Hàng đợi phát nhạc hỗ trợ truy cập, chèn, xóa và di chuyển theo vị trí.
+
+    Các phần tử được chia thành nhiều khối nhỏ nên việc xóa/chèn ở giữa chỉ
+    phải dịch chuyển trong một khối thay vì sao chép và đưa lại toàn bộ hàng
+    đợi. Trình phát có thể `await get()` để chờ tới khi hàng đợi có bài.
+    """
+
+    BLOCK_SIZE = 256
+
+    def __init__(self, items: Iterable[T] = ()):
+        self._blocks: list[list[T]] = []
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self.extend(items)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[T]:
+        for block in self._blocks:
+            yield from block
+
+    def __getitem__(self, index: int) -> T:
+        block, offset = self._locate(index)
+        return self._blocks[block][offset]
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def peek(self) -> T | None:
+        return self._blocks[0][0] if self._size else None
+
+    def head(self, count: int) -> list[T]:
+        return list(itertools.islice(self, count))
+
+    def append(self, item: T):
+        if not self._blocks or len(self._blocks[-1]) >= self.BLOCK_SIZE:
+            self._blocks.append([])
+
+        self._blocks[-1].append(item)
+        self._size += 1
+        self._not_empty.set()
+
+    def extend(self, items: Iterable[T]):
+        for item in items:
+            self.append(item)
+
+    def insert(self, index: int, item: T):
+        if index < 0:
+            index = max(0, index + self._size)
+        if index >= self._size:
+            return self.append(item)
+
+        block, offset = self._locate(index)
+        self._blocks[block].insert(offset, item)
+        self._size += 1
+
+        if len(self._blocks[block]) > self.BLOCK_SIZE * 2:
+            half = self._blocks[block][self.BLOCK_SIZE:]
+            del self._blocks[block][self.BLOCK_SIZE:]
+            self._blocks.insert(block + 1, half)
+
+    def pop(self, index: int = 0) -> T:
+        block, offset = self._locate(index)
+        item = self._blocks[block].pop(offset)
+        if not self._blocks[block]:
+            del self._blocks[block]
+
+        self._size -= 1
+        return item
+
+    def move(self, source: int, destination: int):
+        self.insert(destination, self.pop(source))
+
+    def shuffle(self):
+        items = list(self)
+        random.shuffle(items)
+        self._rebuild(items)
+
+    def clear(self) -> list[T]:
+        items = list(self)
+        self._rebuild([])
+        return items
+
+    async def get(self) -> T:
+        while not self._size:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        return self.pop(0)
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("Vị trí trong hàng đợi không hợp lệ")
+
+        if index >= self._size - len(self._blocks[-1]):
+            return len(self._blocks) - 1, index - (self._size - len(self._blocks[-1]))
+
+        for block, items in enumerate(self._blocks):
+            if index < len(items):
+                return block, index
+            index -= len(items)
+
+        raise IndexError("Vị trí trong hàng đợi không hợp lệ")
+
+    def _rebuild(self, items: list[T]):
+        self._blocks = [
+            items[i:i + self.BLOCK_SIZE] for i in range(0, len(items), self.BLOCK_SIZE)
+        ]
+        self._size = len(items)
+        if self._size:
+            self._not_empty.set()
@@ -0,0 +1,36 @@
+import discord
+from collections import deque
+
+class PrebufferedSource(discord.AudioSource):
+    """
+    Bọc một nguồn âm thanh và đọc trước vài khung hình đầu tiên.
+
+    Dùng để chuẩn bị bài tiếp theo khi bài hiện tại sắp hết: FFmpeg đã được khởi
+    động và dữ liệu đầu tiên đã sẵn sàng, nên lúc chuyển bài trình phát có thể
+    gửi khung hình đầu tiên ngay lập tức.
+    """
+
+    def __init__(self, original: discord.AudioSource):
+        self.original = original
+        self.frames: deque[bytes] = deque()
+
+    def prime(self, count: int):
+        """Đọc trước tối đa `count` khung hình. Có thể chặn, nên chạy trên luồng khác."""
+        while len(self.frames) < count:
+            frame = self.original.read()
+            self.frames.append(frame)
+            if not frame:
+                break
+
+    def read(self) -> bytes:
+        if self.frames:
+            return self.frames.popleft()
+
+        return self.original.read()
+
+    def is_opus(self) -> bool:
+        return self.original.is_opus()
+
+    def cleanup(self):
+        self.frames.clear()
+        self.original.cleanup()
@@ -0,0 +1,169 @@
+import os
+import json
+import asyncio
+import contextlib
+import logging
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+QUEUE_JOURNAL_FILE = os.getenv("QUEUE_JOURNAL_FILE", "queues.jsonl")
+QUEUE_SNAPSHOT_INTERVAL = int(os.getenv("QUEUE_SNAPSHOT_INTERVAL", "15"))
+
+# Thời gian gom các thay đổi liên tiếp thành một lần ghi (giây)
+JOURNAL_BATCH_DELAY = 1.0
+# Chỉ nén lại file khi số dòng vượt quá mức này và gấp nhiều lần số server còn lưu
+JOURNAL_COMPACT_MIN_LINES = 1000
+JOURNAL_COMPACT_RATIO = 4
+
+class QueueJournal:
+    """
+    Lưu trạng thái phát nhạc của từng server vào một file chỉ ghi nối (JSON lines).
+
+    Mỗi dòng là ảnh chụp mới nhất của một server (`snapshot` = null nghĩa là phiên đã
+    kết thúc), dòng sau ghi đè dòng trước khi đọc lại. Các thay đổi chỉ đánh dấu server
+    là cần lưu; một tác vụ nền gom chúng lại, mã hóa và ghi trên luồng khác, đồng thời
+    chụp lại định kỳ các server đang phát để giữ vị trí phát. File được nén lại (chỉ giữ
+    dòng cuối của mỗi server) khi đã dài hơn nhiều lần so với số server cần lưu.
+    """
+
+    def __init__(self, path: str = QUEUE_JOURNAL_FILE, interval: int = QUEUE_SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.sources: dict[int, Callable[[], dict]] = {}
+        self.dirty: set[int] = set()
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        # Chỉ được truy cập từ luồng ghi (các lần ghi chạy tuần tự)
+        self.live: dict[int, str] = {}
+        self.lines = 0
+
+    def load(self) -> dict[int, dict]:
+        """Đọc lại file và trả về ảnh chụp mới nhất của các server chưa kết thúc phiên."""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+
+        snapshots: dict[int, dict] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dòng cuối có thể bị ghi dở khi bot bị tắt đột ngột
+                        continue
+
+                    self.lines += 1
+                    guild_id = record["guild_id"]
+                    if record.get("snapshot"):
+                        snapshots[guild_id] = record["snapshot"]
+                        self.live[guild_id] = line.rstrip("\n")
+                    else:
+                        snapshots.pop(guild_id, None)
+                        self.live.pop(guild_id, None)
+        except OSError as e:
+            log.error(f"Không thể đọc nhật ký hàng đợi {self.path}: {e}")
+            return {}
+
+        log.info(f"Đã đọc {len(snapshots)} phiên phát nhạc từ {self.path}")
+        return snapshots
+
+    def track(self, guild_id: int, snapshot: Callable[[], dict]):
+        """Đăng ký hàm chụp trạng thái của một server để được lưu định kỳ."""
+        self.sources[guild_id] = snapshot
+        self.mark(guild_id)
+
+    def mark(self, guild_id: int):
+        """Đánh dấu server có thay đổi, sẽ được lưu trong lần ghi kế tiếp."""
+        if not self.path or guild_id not in self.sources:
+            return
+
+        self.dirty.add(guild_id)
+        self.wakeup.set()
+        self._ensure_running()
+
+    def forget(self, guild_id: int):
+        """Phiên đã kết thúc: ghi dòng xóa để không khôi phục lại sau khi khởi động."""
+        if not self.path:
+            return
+
+        self.sources.pop(guild_id, None)
+        self.dirty.add(guild_id)
+        self.wakeup.set()
+        self._ensure_running()
+
+    async def flush(self):
+        dirty, self.dirty = self.dirty, set()
+        records = []
+        for guild_id in dirty:
+            source = self.sources.get(guild_id)
+            try:
+                records.append((guild_id, source() if source else None))
+            except Exception as e:
+                log.warning(f"Không thể chụp trạng thái của guild {guild_id}: {e}")
+
+        if records:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, records)
+
+    def _ensure_running(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_periodic = loop.time()
+
+        while self.sources or self.dirty:
+            self.wakeup.clear()
+            if not self.dirty:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+
+            await asyncio.sleep(JOURNAL_BATCH_DELAY)
+
+            if loop.time() - last_periodic >= self.interval:
+                last_periodic = loop.time()
+                self.dirty.update(self.sources)
+
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Lỗi khi ghi nhật ký hàng đợi: {e}", exc_info=True)
+
+    def _write(self, records: list[tuple[int, dict | None]]):
+        lines = []
+        for guild_id, snapshot in records:
+            line = json.dumps({"guild_id": guild_id, "snapshot": snapshot}, ensure_ascii=False)
+            # Không ghi lại ảnh chụp giống hệt lần trước (vd: đang tạm dừng)
+            if snapshot is None:
+                if self.live.pop(guild_id, None) is None:
+                    continue
+            elif self.live.get(guild_id) == line:
+                continue
+            else:
+                self.live[guild_id] = line
+
+            lines.append(line)
+
+        if not lines:
+            return
+
+        try:
+            if self.lines >= JOURNAL_COMPACT_MIN_LINES and self.lines >= JOURNAL_COMPACT_RATIO * len(self.live):
+                self._compact()
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.lines += len(lines)
+        except OSError as e:
+            log.error(f"Không thể ghi nhật ký hàng đợi {self.path}: {e}")
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for line in self.live.values():
+                f.write(line + "\n")
+
+        os.replace(tmp_path, self.path)
+        self.lines = len(self.live)
+        log.info(f"Đã nén nhật ký hàng đợi còn {self.lines} dòng")
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "21600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_CACHE_FILE = os.getenv("SEARCH_CACHE_FILE", "")
+
+# Gom các thay đổi trong khoảng này (giây) thành một lần ghi file
+SEARCH_CACHE_SAVE_DELAY = 5
+
+class SearchCache:
+    """
+    Cache kết quả tìm kiếm theo truy vấn đã chuẩn hóa, có thời hạn (TTL) và
+    giới hạn số lượng (LRU). Chỉ lưu các trường mà SearchView cần hiển thị.
+
+    File (nếu có) được đọc một lần bằng `load()` và ghi lại ở nền trên luồng khác,
+    gom nhiều lần thêm mới thành một lần ghi.
+    """
+
+    FIELDS = ("id", "title", "uploader", "duration", "url", "thumbnail")
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, ttl: int = SEARCH_CACHE_TTL, path: str = SEARCH_CACHE_FILE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.entries: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+        self.loaded = False
+        self.load_lock = asyncio.Lock()
+        self.dirty = False
+        self.save_task: asyncio.Task | None = None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @classmethod
+    def compact(cls, entry: dict) -> dict:
+        thumbnail = entry.get("thumbnail")
+        if not thumbnail and entry.get("thumbnails"):
+            thumbnail = entry["thumbnails"][-1].get("url")
+
+        return {
+            "id": entry.get("id"),
+            "title": entry.get("title"),
+            "uploader": entry.get("uploader") or entry.get("channel"),
+            "duration": entry.get("duration"),
+            "url": entry.get("webpage_url") or entry.get("url"),
+            "thumbnail": thumbnail,
+        }
+
+    async def load(self):
+        """Đọc cache đã lưu (chỉ lần đầu), trên luồng khác để không chặn event loop."""
+        if self.loaded:
+            return
+
+        async with self.load_lock:
+            if self.loaded:
+                return
+
+            data = await asyncio.get_running_loop().run_in_executor(None, self._read) if self.path else {}
+            self.loaded = True
+
+            now = time.time()
+            loaded = OrderedDict(
+                (key, (created, results)) for key, (created, results) in data.items()
+                if now - created <= self.ttl
+            )
+            # Kết quả được thêm trong lúc đang đọc là mới nhất, xếp sau cùng
+            loaded.update(self.entries)
+            self.entries = loaded
+
+            if data:
+                log.info(f"Đã tải cache tìm kiếm: {len(self.entries)} truy vấn")
+
+    def get(self, query: str) -> list[dict] | None:
+        key = self.normalize(query)
+        item = self.entries.get(key)
+
+        if item and time.time() - item[0] > self.ttl:
+            del self.entries[key]
+            item = None
+
+        if not item:
+            return None
+
+        self.entries.move_to_end(key)
+        return item[1]
+
+    def put(self, query: str, entries: list[dict]) -> list[dict]:
+        key = self.normalize(query)
+        results = [self.compact(entry) for entry in entries]
+        self.entries[key] = (time.time(), results)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        self._schedule_save()
+        return results
+
+    def record(self, hit: bool, elapsed: float):
+        if hit:
+            self.hits += 1
+            self.hit_time += elapsed
+        else:
+            self.misses += 1
+            self.miss_time += elapsed
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "avg_hit_ms": self.hit_time / self.hits * 1000 if self.hits else 0.0,
+            "avg_miss_ms": self.miss_time / self.misses * 1000 if self.misses else 0.0,
+        }
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning(f"Không thể đọc cache tìm kiếm {self.path}: {e}")
+            return {}
+
+    def _schedule_save(self):
+        if not self.path:
+            return
+
+        self.dirty = True
+        if self.save_task is None or self.save_task.done():
+            self.save_task = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        loop = asyncio.get_running_loop()
+        while self.dirty:
+            await asyncio.sleep(SEARCH_CACHE_SAVE_DELAY)
+            self.dirty = False
+            # Các danh sách kết quả không bị sửa sau khi thêm, chỉ cần chụp lại dict
+            await loop.run_in_executor(None, self._write, dict(self.entries))
+
+    def _write(self, entries: dict):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.error(f"Không thể ghi cache tìm kiếm {self.path}: {e}")
@@ -0,0 +1,20 @@
+from classes.utils import format_duration
+
+class SearchResult:
+    """Một kết quả tìm kiếm, chỉ giữ các trường mà SearchView hiển thị."""
+
+    __slots__ = ("id", "title", "uploader", "duration", "url", "thumbnail")
+
+    def __init__(self, data: dict):
+        self.id = data.get("id")
+        self.title = data.get("title") or "Không có tiêu đề"
+        self.uploader = data.get("uploader")
+        self.duration = data.get("duration")
+        self.url = data.get("url")
+        self.thumbnail = data.get("thumbnail")
+
+    def format_duration(self):
+        return format_duration(self.duration)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
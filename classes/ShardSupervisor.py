@@ -0,0 +1,159 @@
+import os
+import time
+import queue
+import logging
+import multiprocessing
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+# Chu kỳ gửi tình trạng từ worker về tiến trình giám sát (giây)
+HEALTH_INTERVAL = 30
+# Khoảng cách giữa hai lần khởi động worker để không vượt giới hạn IDENTIFY của Discord
+WORKER_START_DELAY = 5
+WORKER_MAX_BACKOFF = 60
+
+# Các file mà mỗi worker dùng bản riêng (thêm hậu tố .<số thứ tự worker>), cùng giá trị mặc định.
+# Giá trị rỗng nghĩa là tính năng bị tắt, khi đó không đặt biến.
+WORKER_FILES = {
+    "QUEUE_JOURNAL_FILE": "queues.jsonl",
+    "COMMAND_SYNC_FILE": "command_sync.json",
+    "SEARCH_CACHE_FILE": "",
+}
+
+class ShardSupervisor:
+    """
+    Chạy bot thành nhiều tiến trình worker, mỗi worker giữ một dải shard và các
+    GuildState của riêng nó, để FFmpeg và việc mã hóa âm thanh được chia ra nhiều
+    nhân CPU. Worker bị dừng bất thường hoặc không gửi tình trạng quá lâu sẽ được
+    khởi động lại (chờ lâu dần nếu liên tục lỗi).
+
+    `target(shard_ids, shard_count, health)` là điểm vào của một worker; nó gửi
+    định kỳ một dict tình trạng (có "pid" và "time") vào hàng đợi `health`.
+    """
+
+    def __init__(self, target: Callable, workers: int, shard_count: int):
+        self.target = target
+        self.context = multiprocessing.get_context("spawn")
+        self.health = self.context.Queue()
+        shard_count = max(shard_count, workers)
+        self.shard_count = shard_count
+        # Chia các shard thành các dải liên tiếp cho từng worker
+        self.ranges = [
+            list(range(shard_count * i // workers, shard_count * (i + 1) // workers))
+            for i in range(workers)
+        ]
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self.started: dict[int, float] = {}
+        self.backoff: dict[int, float] = {}
+        self.reports: dict[int, dict] = {}
+        self.restarts = 0
+        self.stopped = False
+
+    def start_worker(self, index: int):
+        # Mỗi worker dùng các file riêng (biến môi trường được tiến trình con
+        # kế thừa lúc khởi động, trước khi nó import các module)
+        previous = {name: os.environ.get(name) for name in WORKER_FILES}
+        for name, default in WORKER_FILES.items():
+            path = os.getenv(name, default)
+            if path:
+                os.environ[name] = f"{path}.{index}"
+
+        try:
+            process = self.context.Process(
+                target=self.target,
+                args=(self.ranges[index], self.shard_count, self.health),
+                name=f"worker-{index}",
+            )
+            process.start()
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        self.processes[index] = process
+        self.started[index] = time.monotonic()
+        self.reports.pop(index, None)
+        log.info(f"Đã khởi động worker {index} (PID {process.pid}) cho shard {self.ranges[index]}")
+
+    def run(self):
+        log.info(f"Chạy {len(self.ranges)} worker cho {self.shard_count} shard.")
+        for index in range(len(self.ranges)):
+            if self.stopped:
+                break
+            self.start_worker(index)
+            time.sleep(WORKER_START_DELAY)
+
+        last_summary = time.monotonic()
+        try:
+            while not self.stopped:
+                self.collect_health()
+                self.check_workers()
+
+                if time.monotonic() - last_summary >= HEALTH_INTERVAL:
+                    last_summary = time.monotonic()
+                    self.log_summary()
+        finally:
+            for process in self.processes.values():
+                process.terminate()
+            for process in self.processes.values():
+                process.join(timeout=10)
+
+    def stop(self):
+        """Yêu cầu `run()` dừng và tắt các worker (gọi được từ luồng khác)."""
+        self.stopped = True
+
+    def collect_health(self):
+        try:
+            report = self.health.get(timeout=1)
+        except queue.Empty:
+            return
+
+        for index, process in self.processes.items():
+            if process.pid == report["pid"]:
+                self.reports[index] = report
+                break
+
+    def check_workers(self):
+        now = time.monotonic()
+        for index, process in list(self.processes.items()):
+            if self.stopped:
+                return
+
+            report = self.reports.get(index)
+            # Worker không phản hồi: coi như bị treo
+            hung = report and time.time() - report["time"] > HEALTH_INTERVAL * 4
+            if process.is_alive() and not hung:
+                continue
+
+            if hung:
+                log.warning(f"Worker {index} không phản hồi, đang khởi động lại...")
+                process.kill()
+            process.join(timeout=10)
+
+            # Chạy ổn định một thời gian thì đặt lại thời gian chờ
+            if now - self.started[index] > WORKER_MAX_BACKOFF * 5:
+                self.backoff[index] = 0
+            delay = self.backoff.get(index, 0)
+            self.backoff[index] = min(WORKER_MAX_BACKOFF, max(WORKER_START_DELAY, delay * 2))
+
+            log.error(f"Worker {index} đã dừng (mã {process.exitcode}), khởi động lại sau {delay:.0f}s.")
+            del self.processes[index]
+            time.sleep(delay)
+            self.restarts += 1
+            self.start_worker(index)
+
+    def log_summary(self):
+        guilds = sum(report["guilds"] for report in self.reports.values())
+        sessions = sum(report["sessions"] for report in self.reports.values())
+        alive = sum(process.is_alive() for process in self.processes.values())
+        latencies = ", ".join(
+            f"{index}: {self.reports[index]['latency'] * 1000:.0f}ms" if index in self.reports else f"{index}: N/A"
+            for index in sorted(self.processes)
+        )
+        log.info(
+            f"Tình trạng: {alive}/{len(self.ranges)} worker hoạt động • "
+            f"{guilds} server • {sessions} phiên phát nhạc • Độ trễ [{latencies}]"
+        )
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+log = logging.getLogger(__name__)
+
+class Flight:
+    """Một tác vụ đang chạy cùng với số lượng người đang chờ kết quả của nó."""
+
+    def __init__(self, task: asyncio.Task, unclaimed: Callable[[Any], None] | None = None):
+        self.task = task
+        self.waiters = 0
+        self.unclaimed = unclaimed
+        # Đã có người chờ nhận được kết quả (hoặc kết quả đã được chuyển cho `unclaimed`)
+        self.delivered = False
+        # Đã bị hủy nhưng tác vụ có thể chưa dừng hẳn (vd: đang chờ một lượt tải trên luồng khác)
+        self.cancelled = False
+
+class SingleFlight:
+    """
+    Gộp các yêu cầu giống nhau đang diễn ra đồng thời thành một tác vụ duy nhất.
+
+    Tất cả người gọi với cùng một khóa sẽ chờ chung một kết quả (hoặc một lỗi).
+    Khi người chờ cuối cùng bị hủy, tác vụ bên dưới cũng bị hủy theo; khóa vẫn được
+    giữ tới khi tác vụ đó dừng hẳn, và yêu cầu mới cùng khóa sẽ chờ tới lúc đó.
+
+    Nếu tác vụ vẫn chạy xong nhưng không người chờ nào nhận được kết quả (tất cả bị
+    hủy đúng lúc đó), kết quả được chuyển cho `unclaimed` để giải phóng tài nguyên.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.flights: dict[str, Flight] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]], unclaimed: Callable[[Any], None] | None = None):
+        flight = self.flights.get(key)
+
+        # Không chạy song song với một tác vụ cũ đang dừng lại, để hai lượt không cùng ghi một file
+        while flight and flight.cancelled and not flight.task.done():
+            log.info(f"[{self.name}] Chờ tác vụ đã hủy dừng hẳn: {key}")
+            await asyncio.wait([flight.task])
+            flight = self.flights.get(key)
+
+        if flight and not flight.cancelled:
+            self.coalesced += 1
+            log.info(f"[{self.name}] Gộp yêu cầu trùng lặp: {key}")
+        else:
+            flight = Flight(asyncio.create_task(factory()), unclaimed)
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._on_done(key, flight))
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+            flight.delivered = True
+            return result
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                if not flight.task.done():
+                    log.info(f"[{self.name}] Không còn ai chờ, hủy tác vụ: {key}")
+                    flight.cancelled = True
+                    flight.task.cancel()
+                else:
+                    self._hand_over(key, flight)
+
+    def _on_done(self, key: str, flight: Flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+        # Tác vụ đã bị hủy nhưng vẫn trả về kết quả
+        if flight.waiters == 0:
+            self._hand_over(key, flight)
+
+    def _hand_over(self, key: str, flight: Flight):
+        task = flight.task
+        if flight.delivered or not flight.unclaimed or task.cancelled() or task.exception():
+            return
+
+        flight.delivered = True
+        log.info(f"[{self.name}] Không ai nhận kết quả, giải phóng: {key}")
+        flight.unclaimed(task.result())
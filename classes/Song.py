@@ -1,11 +1,15 @@
 import discord
 import asyncio
-import yt_dlp
-import functools
+import contextlib
 import logging
 import os
-import logging
-from classes import GuildState
+import shlex
+import time
+from urllib.parse import urlsplit, parse_qs
+from classes import GuildState, AudioCache, YTDLPool, SingleFlight, StreamURLCache, SearchCache, SearchResult
+from classes.utils import format_duration
+from classes.YTDLPool import extract_info, extract_unprocessed, process_info, iter_playlist, download
+from enums import TaskPriority
 
 log = logging.getLogger(__name__)
 
@@ -22,9 +26,29 @@ YTDL_SEARCH_OPTIONS = {
     "extract_flat": "search"
 }
 
+# Các mức bitrate (kbps) dùng để chọn định dạng, để chỉ có vài bộ tùy chọn yt-dlp khác nhau
+FORMAT_BITRATE_TIERS = (64, 96, 128, 256, 384)
+# Bitrate mặc định của kênh thoại Discord (bit/s)
+DEFAULT_VOICE_BITRATE = 64000
+
+def format_selector(kbps: int) -> str:
+    """
+    Ưu tiên Opus (phát thẳng được, không cần mã hóa lại) có bitrate thấp nhất mà vẫn
+    đạt mức của kênh thoại; không có thì lấy Opus tốt nhất, rồi mới tới các codec khác.
+    """
+    # Bitrate trung bình yt-dlp báo thường thấp hơn mức danh nghĩa (vd: 250 của YouTube ~ 60 kbps)
+    minimum = int(kbps * 0.85)
+    return "/".join((
+        f"worstaudio[acodec=opus][abr>={minimum}]",
+        "bestaudio[acodec=opus]",
+        f"worstaudio[abr>={minimum}]",
+        "bestaudio",
+        "best",
+    ))
+
 YTDL_DOWNLOAD_OPTIONS = {
-    "format": "bestaudio[ext=m4a]/bestaudio/best",
-    "outtmpl": "cache/%(id)s.%(ext)s",
+    "format": format_selector(DEFAULT_VOICE_BITRATE // 1000),
+    "outtmpl": "cache/%(extractor_key)s-%(id)s.%(ext)s",
     "restrictfilenames": True,
     "noplaylist": True,
     "nocheckcertificate": True,
@@ -33,47 +57,244 @@ YTDL_DOWNLOAD_OPTIONS = {
     "quiet": False,
     "no_warnings": True,
     "source_address": "0.0.0.0",
-    "cachedir": False
+    "cachedir": False,
+    # Chuyển Opus trong WebM sang Ogg (không mã hóa lại) để phát được không cần FFmpeg
+    "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "webm>opus"}],
+}
+
+YTDL_PLAYLIST_OPTIONS = {
+    "noplaylist": False,
+    "extract_flat": "in_playlist",
+    "lazy_playlist": True,
+    "nocheckcertificate": True,
+    "ignoreerrors": True,
+    "logtostderr": False,
+    "quiet": True,
+    "no_warnings": True,
+    "source_address": "0.0.0.0",
 }
 
+# Tùy chọn tải theo từng mức bitrate, tạo khi cần
+_download_options: dict[int, dict] = {}
+
+def download_options(bitrate: int | None = None) -> dict:
+    """Tùy chọn tải với bộ chọn định dạng phù hợp bitrate (bit/s) của kênh thoại."""
+    kbps = (bitrate or DEFAULT_VOICE_BITRATE) / 1000
+    tier = next((tier for tier in FORMAT_BITRATE_TIERS if tier >= kbps), FORMAT_BITRATE_TIERS[-1])
+
+    options = _download_options.get(tier)
+    if options is None:
+        options = _download_options[tier] = {**YTDL_DOWNLOAD_OPTIONS, "format": format_selector(tier)}
+
+    return options
+
+# Số bài tối đa được thêm từ một danh sách phát trong một lần yêu cầu
+PLAYLIST_MAX_ENTRIES = int(os.getenv("PLAYLIST_MAX_ENTRIES", "200"))
+
+# Tùy chọn FFmpeg cho luồng trực tiếp: tự kết nối lại khi mạng lỗi, dừng hẳn nếu không
+# nhận được dữ liệu trong 10 giây (LiveSource sẽ mở lại), và không đệm đầu vào để giảm độ trễ
+LIVE_FFMPEG_OPTIONS = (
+    "-reconnect 1 -reconnect_streamed 1 -reconnect_on_network_error 1 -reconnect_delay_max 5 "
+    "-rw_timeout 10000000 -fflags nobuffer -flags low_delay"
+)
+# Nguồn không có thời lượng nhưng không thực sự đang phát trực tiếp (link mp3/ogg trực tiếp...):
+# không tự kết nối lại khi hết dữ liệu, để bài kết thúc khi máy chủ đóng kết nối bình thường
+OPEN_ENDED_FFMPEG_OPTIONS = "-reconnect 1 -reconnect_on_network_error 1 -reconnect_delay_max 5 -rw_timeout 10000000"
+
+# Bài hát dài hơn ngưỡng này (giây) sẽ được phát ngay từ URL trong lúc tải về nền.
+# Đặt giá trị âm để tắt.
+STREAM_MIN_DURATION = int(os.getenv("STREAM_MIN_DURATION", "300"))
+
+# Info chưa xử lý của bài được xếp hàng (chưa tải) chỉ được dùng lại trong khoảng này (giây),
+# vì URL các định dạng trong đó sẽ hết hạn
+LAZY_INFO_MAX_AGE = 1800
+
+# Các trường thông tin được lưu kèm file trong cache, đủ để dựng lại Song
+CACHED_INFO_FIELDS = (
+    "id", "extractor_key", "webpage_url", "url", "title", "fulltitle",
+    "thumbnail", "duration", "uploader", "channel", "creator", "ext", "acodec",
+)
+
+# Cache âm thanh dùng chung cho tất cả các server
+audio_cache = AudioCache()
+
+# URL phát trực tiếp đã phân giải (luồng live, bài dài), dùng lại tới khi sắp hết hạn
+stream_urls = StreamURLCache()
+
+# Cache kết quả tìm kiếm dùng chung
+search_cache = SearchCache()
+
+# Bộ thực thi yt-dlp dùng chung, có giới hạn và chia lượt công bằng giữa các server
+ytdl_pool = YTDLPool()
+
+# Gộp các lượt tải/tìm kiếm giống nhau đang diễn ra đồng thời
+download_flight = SingleFlight("download")
+search_flight = SingleFlight("search")
+
+# Giữ tham chiếu tới các tác vụ tải nền để chúng không bị thu gom giữa chừng
+background_downloads: set[asyncio.Task] = set()
+
+def _guild_id_of(requester: discord.Member | discord.User) -> int | None:
+    guild = getattr(requester, "guild", None)
+    return guild.id if guild else None
+
+class FetchResult:
+    """Kết quả của một lần trích xuất/tải về, có thể được chia sẻ cho nhiều người gọi."""
+
+    def __init__(self, data: dict, is_live: bool = False, filepath: str | None = None, stream_url: str | None = None):
+        self.data = data
+        self.is_live = is_live
+        self.filepath = filepath
+        self.stream_url = stream_url
+        self.cache_key = None
+        self.claimed = False
+
 class Song:
-    """Đại diện cho một bài hát."""
+    """
+    Đại diện cho một bài hát.
+
+    Chỉ giữ lại các trường bot thực sự dùng thay vì cả info dict của yt-dlp
+    (danh sách formats, headers, thumbnails, phụ đề...), vì mỗi bài trong
+    hàng đợi của mọi server đều giữ một đối tượng này.
+    """
+
+    __slots__ = (
+        "requester", "url", "title", "thumbnail", "duration", "uploader",
+        "is_live", "live_status", "filepath", "stream_url", "http_headers", "start_time",
+        "id", "extractor_key", "acodec", "cache_key", "resolved", "prefetched", "guild", "extracted",
+    )
 
     def __init__(self, data, requester: discord.Member | discord.User):
         self.requester = requester
-        self.data = data
         self.url = data.get("webpage_url") or data.get("url")
         self.title = data.get("title") or data.get("fulltitle") or "Không có tiêu đề"
         self.thumbnail = data.get("thumbnail")
         self.duration = data.get("duration")
         self.uploader = data.get("uploader") or data.get("channel") or data.get("creator") or "Không rõ"
         self.is_live = False
+        self.live_status = data.get("live_status") or ("is_live" if data.get("is_live") else None)
         self.filepath = None
+        self.stream_url = None
+        self.http_headers = data.get("http_headers")
         self.start_time = 0
         self.id = data.get("id")
+        self.extractor_key = data.get("extractor_key")
+        self.acodec = data.get("acodec")
+        self.cache_key = None
+        self.resolved = False
+        self.prefetched = False
         self.guild: GuildState = None
+        # (thời điểm, info chưa xử lý) của lần trích xuất khi xếp hàng, dùng lại khi tải về
+        self.extracted: tuple[float, dict] | None = None
+
+    def to_dict(self) -> dict:
+        """Thông tin cơ bản để tạo lại bài hát (chưa tải về), dùng khi lưu hàng đợi."""
+        return {
+            "webpage_url": self.url,
+            "title": self.title,
+            "thumbnail": self.thumbnail,
+            "duration": self.duration,
+            "uploader": self.uploader,
+            "id": self.id,
+            "extractor_key": self.extractor_key,
+            "acodec": self.acodec,
+        }
 
     def format_duration(self):
         # For live content, always return "🔴 LIVE"
-        if getattr(self, "is_live", False):
+        if self.is_live:
             return "🔴 LIVE"
-        if self.duration is None:
-            return "N/A"
 
-        m, s = divmod(self.duration, 60)
-        h, m = divmod(m, 60)
-
-        return (
-            f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
-            if h > 0
-            else f"{int(m):02d}:{int(s):02d}"
-        )
+        return format_duration(self.duration)
     
-    def get_playback_options(self):
+    def get_source(self) -> str:
+        """Trả về nguồn để FFmpeg phát: file trong cache nếu có, nếu không thì URL."""
+        if self.is_live:
+            return self.stream_url or self.url
+
+        return self.filepath or self.stream_url
+
+    async def attach_cached_file(self) -> bool:
+        """Bài đang phát từ URL có thể đã được tải xong ở nền: chuyển sang dùng file trong cache."""
+        if self.is_live or self.filepath or not self.stream_url or not self.extractor_key or not self.id:
+            return False
+
+        entry = await audio_cache.acquire(audio_cache.make_key(self.extractor_key, self.id))
+        if not entry:
+            return False
+
+        self.filepath = entry.path
+        self.cache_key = entry.key
+        return True
+
+    def stream_key(self) -> str:
+        if self.extractor_key and self.id:
+            return audio_cache.make_key(self.extractor_key, self.id)
+
+        return self.url
+
+    async def refresh_stream(self, force: bool = False) -> bool:
+        """
+        Đảm bảo URL phát trực tiếp còn hạn trước khi (phát lại) bài này: dùng URL trong
+        cache nếu còn hạn, nếu không thì phân giải lại từ trang gốc. Bài đã có file thì bỏ qua.
+        `force` bỏ qua URL trong cache (vd: luồng trực tiếp bị ngắt dù URL chưa hết hạn).
+        """
+        await self.attach_cached_file()
+        if not self.is_live and (self.filepath or not self.stream_url):
+            return True
+
+        if force:
+            stream_urls.invalidate(self.stream_key())
+
+        guild_id = _guild_id_of(self.requester)
+        bitrate = self.guild.bitrate if self.guild else None
+        try:
+            entry = await stream_urls.resolve(
+                self.stream_key(), lambda: Song._extract_stream(self.url, guild_id, bitrate)
+            )
+        except Exception as e:
+            log.error(f"Lỗi yt-dlp khi phân giải lại URL phát '{self.url}': {e}", exc_info=True)
+            return False
+
+        if not entry:
+            return False
+
+        self.stream_url = entry.url
+        self.http_headers = entry.http_headers or self.http_headers
+        if not self.is_live:
+            self.acodec = entry.acodec
+        return True
+
+    def is_opus(self) -> bool:
+        """Nguồn đã là Opus, có thể gửi thẳng cho Discord mà không cần mã hóa lại."""
+        return not self.is_live and self.acodec == "opus"
+
+    def is_endless(self) -> bool:
+        """
+        Luồng đang phát trực tiếp thật sự (theo yt-dlp), nên hết dữ liệu là do mất kết nối
+        chứ không phải hết bài. Các nguồn chỉ được phát như luồng trực tiếp (link trực tiếp,
+        không có thời lượng) thì kết thúc khi hết dữ liệu.
+        """
+        return self.is_live and self.live_status == "is_live"
+
+    def get_playback_options(self, start_time: float | None = None):
+        """Tùy chọn FFmpeg để phát bài này, từ `start_time` (mặc định là vị trí hiện tại của bài)."""
+        if start_time is None:
+            start_time = self.start_time
         options = []
 
-        if (self.start_time > 0):
-            options.append(f"-ss {self.start_time}")
+        if self.is_live:
+            options.append(LIVE_FFMPEG_OPTIONS if self.is_endless() else OPEN_ENDED_FFMPEG_OPTIONS)
+        elif not self.filepath and self.stream_url:
+            options.append("-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5")
+
+        if not self.filepath and self.stream_url:
+            if self.http_headers:
+                headers = "".join(f"{k}: {v}\r\n" for k, v in self.http_headers.items())
+                options.append(f"-headers {shlex.quote(headers)}")
+
+        if (start_time > 0):
+            options.append(f"-ss {start_time}")
 
         return {
             "before_options": " ".join(options),
@@ -81,87 +302,365 @@ class Song:
         }
 
     def cleanup(self):
-        if self.filepath and os.path.exists(self.filepath):
-            try:
-                os.remove(self.filepath)
-                log.info(f"Đã xóa file cache: {self.filepath}")
-            except OSError as e:
-                log.error(f"Lỗi khi xóa file cache {self.filepath}: {e}")
+        self.extracted = None
+        # File không bị xóa ngay, chỉ bỏ tham chiếu để cache tự quyết định khi nào xóa
+        if self.cache_key:
+            audio_cache.release(self.cache_key)
+            self.cache_key = None
+
+    async def resolve(self, priority: TaskPriority = TaskPriority.DOWNLOAD) -> bool:
+        """Tải về bài hát (nếu chưa tải) và cập nhật thông tin đầy đủ cho chính nó."""
+        if self.resolved:
+            return True
+
+        bitrate = self.guild.bitrate if self.guild else None
+        extracted, self.extracted = self.extracted, None
+        info = extracted[1] if extracted and time.time() - extracted[0] < LAZY_INFO_MAX_AGE else None
+        song = await Song.from_url_and_download(self.url, self.requester, priority, bitrate=bitrate, info=info)
+        if not song and info:
+            # Info lấy lúc xếp hàng không còn dùng được (vd: URL định dạng đã hết hạn), trích xuất lại
+            song = await Song.from_url_and_download(self.url, self.requester, priority, bitrate=bitrate)
+        if not song:
+            return False
+
+        self.url = song.url
+        self.title = song.title
+        self.thumbnail = song.thumbnail
+        self.duration = song.duration
+        self.uploader = song.uploader
+        self.is_live = song.is_live
+        self.live_status = song.live_status
+        self.filepath = song.filepath
+        self.stream_url = song.stream_url
+        self.http_headers = song.http_headers
+        self.id = song.id
+        self.extractor_key = song.extractor_key
+        self.acodec = song.acodec
+        self.cache_key = song.cache_key
+        self.resolved = True
+        return True
 
     @classmethod
     async def search_only(cls, query: str, requester: discord.Member | discord.User):
-        loop = asyncio.get_running_loop()
-        partial = functools.partial(
-            yt_dlp.YoutubeDL(YTDL_SEARCH_OPTIONS).extract_info, query, download=False
-        )
+        started = time.perf_counter()
+        await search_cache.load()
+        results = search_cache.get(query)
+        if results is not None:
+            search_cache.record(True, time.perf_counter() - started)
+            return [SearchResult(entry) for entry in results]
 
-        try:
-            data = await loop.run_in_executor(None, partial)
+        async def fetch():
+            data = await ytdl_pool.run(
+                extract_info, YTDL_SEARCH_OPTIONS, query,
+                guild_id=_guild_id_of(requester), priority=TaskPriority.SEARCH,
+            )
+            if not data or not data.get("entries"):
+                return []
+
+            # Chỉ lượt tìm kiếm thực sự mới lưu vào cache, các yêu cầu được gộp dùng chung kết quả
+            return search_cache.put(query, data["entries"])
 
-            if not data or "entries" not in data or not data["entries"]:
+        try:
+            results = await search_flight.do(search_cache.normalize(query), fetch)
+            if not results:
                 return []
 
-            return [cls(entry, requester) for entry in data["entries"]]
+            search_cache.record(False, time.perf_counter() - started)
+            return [SearchResult(entry) for entry in results]
         except Exception as e:
             log.error(f"Lỗi yt-dlp khi TÌM KIẾM '{query}': {e}", exc_info=True)
             return []
 
     @classmethod
     async def from_url_and_download(
-        cls, url: str, requester: discord.Member | discord.User
+        cls, url: str, requester: discord.Member | discord.User,
+        priority: TaskPriority = TaskPriority.DOWNLOAD,
+        progress=None,
+        bitrate: int | None = None,
+        info: dict | None = None,
     ):
+        """
+        `progress` nhận phần trăm tải về (chỉ báo cho người yêu cầu đầu tiên khi các yêu cầu trùng nhau).
+        `bitrate` là bitrate của kênh thoại sẽ phát, dùng để chọn định dạng tải về.
+        `info` là info chưa xử lý từ `extract_unprocessed`, có thì không chạy lại extractor.
+        """
         loop = asyncio.get_running_loop()
-        ytdl = yt_dlp.YoutubeDL(YTDL_DOWNLOAD_OPTIONS)
-        info_partial = functools.partial(ytdl.extract_info, url, download=False)
-        try:
-            info_data = await loop.run_in_executor(None, info_partial)
-            if not info_data:
-                return None
-            if "entries" in info_data:
-                info_data = info_data["entries"][0]
-
-            is_live = info_data.get("is_live") or info_data.get("was_live") or False
-
-            # Additional robust check for generic/icecast/streams
-            if not is_live:
-                extractor = info_data.get("extractor_key", "").lower()
-                duration = info_data.get("duration")
-                formats = info_data.get("formats", [])
-                # If generic extractor and no duration, or only one format and it's a stream type
-                stream_exts = {"ogg", "mp3", "aac", "opus", "webm"}
-                if (
-                    (extractor == "generic" and duration is None)
-                    or (
-                        len(formats) == 1 and
-                        (formats[0].get("ext") in stream_exts or formats[0].get("protocol") in ("http", "https"))
-                    )
-                ):
-                    is_live = True
-                elif any(
-                    (f.get("protocol") in ("m3u8", "m3u8_native") and f.get("preference", 0) == 0)
-                    or f.get("is_live")
-                    for f in formats
-                ):
-                    is_live = True
-
-            if is_live:
-                song = cls(info_data, requester)
-                song.is_live = True
-                song.filepath = None
-                return song
-
-            # Not live, proceed to download
-            partial = functools.partial(ytdl.extract_info, url, download=True)
-            data = await loop.run_in_executor(None, partial)
-            if not data:
-                return None
-            if "entries" in data:
-                data = data["entries"][0]
-
-            song = cls(data, requester)
-            song.is_live = False
-            song.filepath = ytdl.prepare_filename(data)
+        guild_id = _guild_id_of(requester)
+
+        # Kiểm tra cache trước, nếu có thì không cần truy cập mạng
+        key = await loop.run_in_executor(None, audio_cache.key_from_url, url)
+        song = await cls._from_cache(key, requester)
+        if song:
             return song
+
+        # Các yêu cầu trùng nhau (kể cả từ server khác) dùng chung một lần tải
+        try:
+            result = await download_flight.do(
+                key or url.strip(), lambda: cls._fetch_shared(key, url, guild_id, priority, progress, bitrate, info),
+                unclaimed=cls._release_unclaimed,
+            )
         except Exception as e:
             log.error(f"Lỗi yt-dlp khi TẢI VỀ '{url}': {e}", exc_info=True)
             return None
+
+        if not result:
+            return None
+
+        song = cls(result.data, requester)
+        song.is_live = result.is_live
+        song.filepath = result.filepath
+        song.stream_url = result.stream_url
+        song.resolved = True
+
+        if result.cache_key:
+            # Người nhận đầu tiên dùng luôn tham chiếu do lần tải giữ, những người sau tự giữ thêm
+            if not result.claimed:
+                result.claimed = True
+                song.cache_key = result.cache_key
+            elif await audio_cache.acquire(result.cache_key):
+                song.cache_key = result.cache_key
+
+        return song
+
+    @classmethod
+    async def from_url_lazy(
+        cls, url: str, requester: discord.Member | discord.User,
+    ):
+        """
+        Tạo bài hát chỉ với thông tin cơ bản để xếp vào hàng đợi, chưa tải về.
+        Bài hát sẽ được tải đúng lúc khi sắp tới lượt phát (xem GuildState.resolve_song).
+        """
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(None, audio_cache.key_from_url, url)
+        song = await cls._from_cache(key, requester)
+        if song:
+            return song
+
+        try:
+            info = await ytdl_pool.run(
+                extract_unprocessed, YTDL_DOWNLOAD_OPTIONS, url,
+                guild_id=_guild_id_of(requester), priority=TaskPriority.DOWNLOAD,
+            )
+        except Exception as e:
+            log.error(f"Lỗi yt-dlp khi lấy thông tin '{url}': {e}", exc_info=True)
+            return None
+
+        if not info:
+            return None
+
+        song = cls(info, requester)
+        song.url = song.url or url
+        # Giữ lại info để lúc tải về chỉ cần chọn định dạng, không phải chạy extractor lần nữa
+        song.extracted = (time.time(), info)
+        return song
+
+    @staticmethod
+    def is_playlist_url(url: str) -> bool:
+        """
+        Link danh sách phát. Link một video kèm `list=` (vd: mở một bài từ mix) vẫn chỉ là
+        một bài; muốn thêm cả danh sách thì dùng link /playlist?list=...
+        """
+        parts = urlsplit(url)
+        if any(part in parts.path for part in ("/playlist", "/sets/", "/album/")):
+            return True
+
+        query = parse_qs(parts.query)
+        return "list" in query and "v" not in query and not parts.netloc.endswith("youtu.be")
+
+    @classmethod
+    async def iter_playlist(
+        cls, url: str, requester: discord.Member | discord.User,
+        limit: int = PLAYLIST_MAX_ENTRIES,
+    ):
+        """Trả về lần lượt các bài (chưa tải về) trong danh sách phát, ngay khi từng trang được tải."""
+        entries = ytdl_pool.iterate(
+            iter_playlist, YTDL_PLAYLIST_OPTIONS, url, CACHED_INFO_FIELDS, limit,
+            guild_id=_guild_id_of(requester), priority=TaskPriority.DOWNLOAD,
+        )
+
+        async with contextlib.aclosing(entries):
+            async for data in entries:
+                if data.get("url") or data.get("webpage_url"):
+                    yield cls(data, requester)
+
+    @classmethod
+    async def _from_cache(cls, key: str | None, requester: discord.Member | discord.User):
+        entry = await audio_cache.acquire(key) if key else None
+        if not entry:
+            return None
+
+        song = cls(entry.info, requester)
+        song.filepath = entry.path
+        song.cache_key = entry.key
+        song.resolved = True
+        return song
+
+    @classmethod
+    async def _fetch_shared(
+        cls, key: str | None, url: str, guild_id: int | None, priority: TaskPriority,
+        progress=None, bitrate: int | None = None, info: dict | None = None,
+    ):
+        """
+        Như `_fetch`, nhưng nếu một tiến trình bot khác trên cùng máy đang tải bài này
+        thì chờ nó tải xong rồi dùng file trong cache thay vì tải thêm một lần nữa.
+        """
+        if not key:
+            return await cls._fetch(url, guild_id, priority, progress, bitrate, info)
+
+        while not await audio_cache.claim_download(key):
+            log.info(f"Tiến trình khác đang tải '{key}', chờ dùng chung file...")
+            await audio_cache.wait_download(key)
+            entry = await audio_cache.acquire(key)
+            if entry:
+                result = FetchResult(entry.info, filepath=entry.path)
+                result.cache_key = entry.key
+                return result
+
+        try:
+            return await cls._fetch(url, guild_id, priority, progress, bitrate, info)
+        finally:
+            audio_cache.finish_download(key)
+
+    @classmethod
+    async def _fetch(
+        cls, url: str, guild_id: int | None, priority: TaskPriority, progress=None,
+        bitrate: int | None = None, info: dict | None = None,
+    ):
+        options = download_options(bitrate)
+        info_data = await ytdl_pool.run(
+            *((process_info, options, info) if info else (extract_info, options, url)),
+            guild_id=guild_id, priority=priority,
+        )
+        if not info_data:
+            return None
+        if "entries" in info_data:
+            info_data = info_data["entries"][0]
+
+        is_live = info_data.get("is_live") or info_data.get("was_live") or False
+
+        # Additional robust check for generic/icecast/streams
+        if not is_live:
+            extractor = info_data.get("extractor_key", "").lower()
+            duration = info_data.get("duration")
+            formats = info_data.get("formats", [])
+            # If generic extractor and no duration, or only one format and it's a stream type
+            stream_exts = {"ogg", "mp3", "aac", "opus", "webm"}
+            if (
+                (extractor == "generic" and duration is None)
+                or (
+                    len(formats) == 1 and
+                    (formats[0].get("ext") in stream_exts or formats[0].get("protocol") in ("http", "https"))
+                )
+            ):
+                is_live = True
+            elif any(
+                (f.get("protocol") in ("m3u8", "m3u8_native") and f.get("preference", 0) == 0)
+                or f.get("is_live")
+                for f in formats
+            ):
+                is_live = True
+
+        if is_live or 0 <= STREAM_MIN_DURATION <= (info_data.get("duration") or -1):
+            # Phát từ URL: lưu lại URL đã phân giải để phát lại/tua không cần gọi extractor
+            page_url = info_data.get("webpage_url") or url
+            stream_urls.put(
+                audio_cache.key_from_info(info_data) or page_url, info_data,
+                lambda: cls._extract_stream(page_url, guild_id, bitrate),
+            )
+
+        if is_live:
+            return FetchResult(info_data, is_live=True, stream_url=info_data.get("url"))
+
+        size = info_data.get("filesize") or info_data.get("filesize_approx")
+        log.info(
+            f"Định dạng cho '{info_data.get('title')}': {info_data.get('format_id')} "
+            f"({info_data.get('acodec')}, {info_data.get('abr') or '?'} kbps"
+            f"{f', {size / 1024 / 1024:.1f} MB' if size else ''}) • kênh {(bitrate or DEFAULT_VOICE_BITRATE) // 1000} kbps"
+        )
+
+        # Bài dài: phát ngay từ URL đã phân giải, file được ghi vào cache ở nền
+        duration = info_data.get("duration")
+        if 0 <= STREAM_MIN_DURATION <= (duration or -1) and info_data.get("url"):
+            task = asyncio.create_task(cls._download_in_background(info_data, guild_id, options))
+            background_downloads.add(task)
+            task.add_done_callback(background_downloads.discard)
+            return FetchResult(info_data, stream_url=info_data["url"])
+
+        # Not live, proceed to download. Reuse the info we already extracted
+        # so the page/player is not fetched and deciphered a second time.
+        data, filepath = await ytdl_pool.run(
+            download, options, info_data,
+            # Callback không gửi được sang tiến trình khác
+            progress if ytdl_pool.mode == "thread" else None,
+            guild_id=guild_id, priority=priority,
+            abandoned=lambda result: cls._cache_unclaimed(*result),
+        )
+        if not data:
+            return None
+
+        result = FetchResult(data, filepath=filepath)
+        key = audio_cache.key_from_info(data)
+        if key:
+            info = {k: data[k] for k in CACHED_INFO_FIELDS if data.get(k) is not None}
+            if await audio_cache.add(key, filepath, info):
+                result.cache_key = key
+
+        return result
+
+    @classmethod
+    async def _extract_stream(cls, url: str, guild_id: int | None, bitrate: int | None) -> dict | None:
+        info = await ytdl_pool.run(
+            extract_info, download_options(bitrate), url,
+            guild_id=guild_id, priority=TaskPriority.DOWNLOAD,
+        )
+        if info and "entries" in info:
+            info = next(iter(info["entries"]), None)
+
+        return info
+
+    @staticmethod
+    def _release_unclaimed(result: FetchResult | None):
+        """Mọi người chờ lượt tải đều bị hủy đúng lúc nó xong: thả tham chiếu mà lượt tải đang giữ."""
+        if result and result.cache_key and not result.claimed:
+            result.claimed = True
+            audio_cache.release(result.cache_key)
+
+    @staticmethod
+    def _cache_unclaimed(data: dict | None, filepath: str | None):
+        """
+        Đưa một file vừa tải mà không ai giữ (tải nền, hoặc lượt tải đã bị hủy nhưng vẫn
+        chạy xong) vào cache để nó nằm trong giới hạn dung lượng; không có khóa thì xóa đi.
+        """
+        if not filepath:
+            return
+
+        key = audio_cache.key_from_info(data) if data else None
+        info = {k: data[k] for k in CACHED_INFO_FIELDS if data.get(k) is not None} if key else {}
+        audio_cache.adopt(key, filepath, info)
+
+    @classmethod
+    async def _download_in_background(cls, info_data: dict, guild_id: int | None, options: dict = YTDL_DOWNLOAD_OPTIONS):
+        key = audio_cache.key_from_info(info_data)
+
+        async def run():
+            # Tiến trình khác đang tải file này thì để nó tải, bài sẽ tự chuyển sang file khi xong
+            marker = f"{key}:file"
+            if key and not await audio_cache.claim_download(marker):
+                return
+
+            try:
+                data, filepath = await ytdl_pool.run(
+                    download, options, dict(info_data),
+                    guild_id=guild_id, priority=TaskPriority.PREFETCH,
+                    abandoned=lambda result: cls._cache_unclaimed(*result),
+                )
+                cls._cache_unclaimed(data, filepath)
+            finally:
+                if key:
+                    audio_cache.finish_download(marker)
+
+        try:
+            # Dùng chung khóa để nhiều lượt phát cùng lúc không ghi đè cùng một file
+            await download_flight.do(f"{key or info_data.get('url')}:file", run)
+        except Exception as e:
+            log.error(f"Lỗi khi tải nền '{info_data.get('title')}': {e}", exc_info=True)
@@ -0,0 +1,169 @@
+import re
+import time
+import asyncio
+import calendar
+import logging
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from typing import Awaitable, Callable
+from classes.SingleFlight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# Thời hạn mặc định cho URL không ghi thời điểm hết hạn (giây)
+STREAM_URL_TTL = 1800
+# Coi URL là cần làm mới khi chỉ còn bấy nhiêu giây là hết hạn
+STREAM_URL_REFRESH_MARGIN = 300
+# Chỉ làm mới ở nền các URL được dùng trong khoảng thời gian này (giây)
+STREAM_URL_KEEPALIVE = 3600
+# Chu kỳ kiểm tra các URL sắp hết hạn (giây)
+STREAM_URL_SWEEP_INTERVAL = 60
+STREAM_URL_MAX_ENTRIES = 512
+
+# Manifest HLS của YouTube ghi thời điểm hết hạn trong đường dẫn thay vì query
+_EXPIRE_PATH = re.compile(r"/expire/(\d+)")
+
+Resolver = Callable[[], Awaitable[dict | None]]
+
+def url_expiry(url: str) -> float | None:
+    """Đọc thời điểm hết hạn (unix time) được ký trong URL, nếu có."""
+    parts = urlsplit(url)
+    query = {name.lower(): values[0] for name, values in parse_qs(parts.query).items()}
+
+    try:
+        # Googlevideo (expire), CloudFront và S3 chữ ký v2 (Expires)
+        for name in ("expire", "expires"):
+            # Một số dịch vụ dùng cùng tên cho số giây hiệu lực, bỏ qua các giá trị đó
+            if name in query and float(query[name]) > 1_000_000_000:
+                return float(query[name])
+
+        # S3 chữ ký v4: thời điểm ký + số giây hiệu lực
+        if "x-amz-date" in query and "x-amz-expires" in query:
+            signed = calendar.timegm(time.strptime(query["x-amz-date"], "%Y%m%dT%H%M%SZ"))
+            return signed + float(query["x-amz-expires"])
+    except ValueError:
+        return None
+
+    match = _EXPIRE_PATH.search(parts.path)
+    return float(match.group(1)) if match else None
+
+class ResolvedURL:
+    """URL media trực tiếp đã được phân giải từ trang gốc, kèm header cần gửi và hạn dùng."""
+
+    __slots__ = ("url", "http_headers", "acodec", "expires", "last_used", "resolver")
+
+    def __init__(self, url: str, http_headers: dict | None, acodec: str | None, expires: float, resolver: Resolver):
+        self.url = url
+        self.http_headers = http_headers
+        self.acodec = acodec
+        self.expires = expires
+        self.last_used = time.time()
+        self.resolver = resolver
+
+class StreamURLCache:
+    """
+    Cache các URL media trực tiếp (luồng live, bài dài phát từ URL), khóa theo extractor + id.
+
+    URL đã ký chỉ dùng được tới thời điểm hết hạn ghi trong chính nó, nên mỗi URL được
+    dùng lại cho tới khi sắp hết hạn; một tác vụ nền phân giải lại trước các URL vừa
+    được dùng gần đây, để phát lại, tua hay kết nối lại kênh thoại không phải chờ
+    extractor. Các lần phân giải trùng khóa đang diễn ra được gộp làm một.
+    """
+
+    def __init__(self, ttl: int = STREAM_URL_TTL, margin: int = STREAM_URL_REFRESH_MARGIN, max_entries: int = STREAM_URL_MAX_ENTRIES):
+        self.ttl = ttl
+        self.margin = margin
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, ResolvedURL] = OrderedDict()
+        self.flight = SingleFlight("stream-url")
+        self.task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def put(self, key: str, info: dict, resolver: Resolver) -> ResolvedURL | None:
+        """Lưu URL từ info của yt-dlp; `resolver` phân giải lại và trả về info mới."""
+        url = info.get("url")
+        if not url:
+            return None
+
+        expires = url_expiry(url) or time.time() + self.ttl
+        entry = ResolvedURL(url, info.get("http_headers"), info.get("acodec"), expires, resolver)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        self._ensure_running()
+        return entry
+
+    def get(self, key: str) -> ResolvedURL | None:
+        """Trả về URL còn hạn dùng (không tính khoảng làm mới), hoặc None."""
+        entry = self.entries.get(key)
+        if not entry or entry.expires - time.time() <= self.margin:
+            return None
+
+        entry.last_used = time.time()
+        self.entries.move_to_end(key)
+        return entry
+
+    def invalidate(self, key: str):
+        """Bỏ URL không còn dùng được (vd: luồng trực tiếp bị ngắt), lần sau sẽ phân giải lại."""
+        self.entries.pop(key, None)
+
+    async def resolve(self, key: str, resolver: Resolver) -> ResolvedURL | None:
+        """Lấy URL từ cache, hoặc phân giải lại nếu không có/sắp hết hạn."""
+        entry = self.get(key)
+        if entry:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        info = await self.flight.do(key, resolver)
+        return self.put(key, info, resolver) if info else None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
+
+    def _ensure_running(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.entries:
+            await asyncio.sleep(STREAM_URL_SWEEP_INTERVAL)
+
+            now = time.time()
+            for key, entry in list(self.entries.items()):
+                if self.entries.get(key) is not entry:
+                    continue
+
+                # Làm mới trước lần kiểm tra kế tiếp để URL không bao giờ rơi vào khoảng làm mới
+                if entry.expires - now > self.margin + STREAM_URL_SWEEP_INTERVAL:
+                    continue
+
+                if now - entry.last_used > STREAM_URL_KEEPALIVE:
+                    if entry.expires <= now:
+                        del self.entries[key]
+                    continue
+
+                await self._refresh(key, entry)
+
+    async def _refresh(self, key: str, entry: ResolvedURL):
+        try:
+            info = await self.flight.do(key, entry.resolver)
+        except Exception as e:
+            log.warning(f"Không thể làm mới URL phát của {key}: {e}")
+            return
+
+        if info and self.entries.get(key) is entry:
+            refreshed = self.put(key, info, entry.resolver)
+            if refreshed:
+                refreshed.last_used = entry.last_used
+                self.refreshes += 1
+                log.info(f"Đã làm mới URL phát của {key} (hết hạn sau {refreshed.expires - time.time():.0f}s)")
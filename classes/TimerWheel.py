@@ -0,0 +1,100 @@
+import asyncio
+import inspect
+import logging
+import math
+from typing import Any, Callable, Hashable
+
+log = logging.getLogger(__name__)
+
+class Timer:
+    __slots__ = ("key", "callback", "slot", "rounds")
+
+    def __init__(self, key: Hashable, callback: Callable[[], Any], slot: int, rounds: int):
+        self.key = key
+        self.callback = callback
+        self.slot = slot
+        self.rounds = rounds
+
+class TimerWheel:
+    """
+    Bộ hẹn giờ dùng chung cho toàn bộ bot (hashed timing wheel).
+
+    Mỗi hẹn giờ được định danh bằng một khóa (vd: `("idle", guild_id)`), nằm trong
+    một ô của vòng quay; một tác vụ duy nhất quay vòng mỗi `tick` giây và gọi các
+    hẹn giờ đã tới hạn. Đặt lại hay hủy một hẹn giờ chỉ là thao tác trên dict (O(1)),
+    nên hàng nghìn server không cần hàng nghìn coroutine đang ngủ.
+    """
+
+    def __init__(self, tick: float = 1.0, size: int = 512):
+        self.tick = tick
+        self.slots: list[dict[Hashable, Timer]] = [{} for _ in range(size)]
+        self.timers: dict[Hashable, Timer] = {}
+        self.position = 0
+        self.task: asyncio.Task | None = None
+        self.callbacks: set[asyncio.Task] = set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.timers
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], Any]):
+        """Hẹn gọi `callback` sau `delay` giây, thay thế hẹn giờ cũ cùng khóa (nếu có)."""
+        self.cancel(key)
+
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self.position + ticks) % len(self.slots)
+        timer = Timer(key, callback, slot, (ticks - 1) // len(self.slots))
+        self.slots[slot][key] = timer
+        self.timers[key] = timer
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self.timers.pop(key, None)
+        if not timer:
+            return False
+
+        del self.slots[timer.slot][key]
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+
+        while self.timers:
+            next_tick += self.tick
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+            self.position = (self.position + 1) % len(self.slots)
+            slot = self.slots[self.position]
+            expired = []
+            for timer in slot.values():
+                if timer.rounds:
+                    timer.rounds -= 1
+                else:
+                    expired.append(timer)
+
+            for timer in expired:
+                del slot[timer.key]
+                del self.timers[timer.key]
+                self._fire(timer)
+
+    def _fire(self, timer: Timer):
+        try:
+            result = timer.callback()
+        except Exception as e:
+            log.error(f"Lỗi khi chạy hẹn giờ {timer.key}:", exc_info=e)
+            return
+
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self.callbacks.add(task)
+            task.add_done_callback(self._on_callback_done)
+
+    def _on_callback_done(self, task: asyncio.Task):
+        self.callbacks.discard(task)
+        if not task.cancelled() and task.exception():
+            log.error("Lỗi khi chạy hẹn giờ:", exc_info=task.exception())
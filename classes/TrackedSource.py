@@ -0,0 +1,36 @@
+import discord
+from classes.OggOpusSource import packet_samples, OPUS_SAMPLE_RATE
+
+# Số mẫu trong một khung PCM 20ms mà discord.py mã hóa
+PCM_FRAME_SAMPLES = OPUS_SAMPLE_RATE * discord.opus.Encoder.FRAME_LENGTH // 1000
+
+class TrackedSource(discord.AudioSource):
+    """
+    Bọc nguồn phát của bài hiện tại và đếm số mẫu âm thanh đã thực sự gửi đi.
+
+    Trình phát chỉ gọi `read()` khi đang phát, nên khi tạm dừng hay đang chờ kết nối
+    lại thì vị trí cũng đứng yên. Với gói Opus chuyển thẳng, độ dài mỗi gói được đọc
+    từ byte TOC nên vị trí vẫn chính xác khi gói không phải 20ms.
+    """
+
+    def __init__(self, original: discord.AudioSource, song):
+        self.original = original
+        self.song = song
+        self.opus = original.is_opus()
+        self.samples = 0
+
+    def read(self) -> bytes:
+        data = self.original.read()
+        if data:
+            self.samples += packet_samples(data) if self.opus else PCM_FRAME_SAMPLES
+
+        return data
+
+    def elapsed(self) -> float:
+        return self.samples / OPUS_SAMPLE_RATE
+
+    def is_opus(self) -> bool:
+        return self.opus
+
+    def cleanup(self):
+        self.original.cleanup()
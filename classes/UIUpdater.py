@@ -0,0 +1,96 @@
+import discord
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Khoảng thời gian tối thiểu giữa hai lần cập nhật giao diện của một server (giây)
+UI_UPDATE_INTERVAL = 1.5
+
+class UIUpdater:
+    """
+    Cập nhật bảng điều khiển và trạng thái kênh thoại của một server ở nền.
+
+    Các yêu cầu cập nhật chỉ đánh dấu là "cần cập nhật"; một tác vụ riêng gom
+    chúng lại thành tối đa một lượt gửi mỗi `UI_UPDATE_INTERVAL` giây và bỏ qua
+    những lượt mà nội dung hiển thị không thay đổi. Nhờ vậy chuyển bài liên tục
+    hay kéo âm lượng liên tục không tạo ra hàng loạt request tới Discord, và
+    trình phát nhạc không bao giờ phải chờ các request này.
+    """
+
+    def __init__(self, state, interval: float = UI_UPDATE_INTERVAL):
+        self.state = state
+        self.interval = interval
+        self.pending = asyncio.Event()
+        self.new_song = False
+        self.task: asyncio.Task | None = None
+        self.last_run = 0.0
+        self.last_status: str | None = None
+        self.last_embed: dict | None = None
+        self.requests = 0
+        self.edits = 0
+        self.skipped = 0
+
+    def request(self, new_song: bool = False):
+        """Yêu cầu cập nhật; `new_song` buộc gửi lại bảng điều khiển thành tin nhắn mới."""
+        self.requests += 1
+        self.new_song = self.new_song or new_song
+        self.pending.set()
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+        self.pending.clear()
+        self.new_song = False
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "edits": self.edits, "skipped": self.skipped}
+
+    async def _run(self):
+        while True:
+            await self.pending.wait()
+
+            delay = self.last_run + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            self.pending.clear()
+            new_song, self.new_song = self.new_song, False
+            self.last_run = time.monotonic()
+
+            try:
+                await self._apply(new_song)
+            except discord.RateLimited as e:
+                # Bị giới hạn thì lùi lại và thử lại sau với trạng thái mới nhất
+                log.warning(f"Guild {self.state.guild_id}: Cập nhật giao diện bị giới hạn, thử lại sau {e.retry_after:.1f}s")
+                self.last_run = time.monotonic() + e.retry_after
+                self.new_song = self.new_song or new_song
+                self.pending.set()
+            except Exception as e:
+                log.warning(f"Guild {self.state.guild_id}: Không thể cập nhật trạng thái phát nhạc: {e}")
+
+    async def _apply(self, new_song: bool):
+        status = self.state.voice_status()
+        if status != self.last_status and self.state.voice_client:
+            await self.state.update_voice_channel_status()
+            self.last_status = status
+            self.edits += 1
+        else:
+            self.skipped += 1
+
+        # Vị trí phát thay đổi liên tục nên không tính vào việc so sánh,
+        # nó chỉ được cập nhật kèm khi có thay đổi khác
+        song = self.state.current_song
+        embed = self.state.create_now_playing_embed(show_position=False).to_dict() if song else None
+        if new_song or embed != self.last_embed:
+            await self.state.update_now_playing_message(new_song=new_song)
+            self.last_embed = embed
+            self.edits += 1
+        else:
+            self.skipped += 1
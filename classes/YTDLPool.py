@@ -0,0 +1,260 @@
+import os
+import json
+import asyncio
+import logging
+import contextlib
+import itertools
+import threading
+import yt_dlp
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from enums import TaskPriority
+
+log = logging.getLogger(__name__)
+
+YTDL_WORKERS = int(os.getenv("YTDL_WORKERS", "4"))
+YTDL_POOL_MODE = os.getenv("YTDL_POOL_MODE", "thread").lower()
+
+# Mỗi worker (thread hoặc process) giữ sẵn các YoutubeDL đã cấu hình để dùng lại
+_local = threading.local()
+
+def _get_ytdl(options: dict) -> yt_dlp.YoutubeDL:
+    instances = getattr(_local, "instances", None)
+    if instances is None:
+        instances = _local.instances = {}
+
+    key = json.dumps(options, sort_keys=True)
+    ytdl = instances.get(key)
+    if ytdl is None:
+        ytdl = instances[key] = yt_dlp.YoutubeDL(options)
+        ytdl.add_progress_hook(_on_progress)
+
+    return ytdl
+
+def _on_progress(d: dict):
+    callback = getattr(_local, "progress", None)
+    if not callback or d.get("status") != "downloading":
+        return
+
+    total = d.get("total_bytes") or d.get("total_bytes_estimate")
+    if total:
+        callback(min(100.0, d.get("downloaded_bytes", 0) / total * 100))
+
+def extract_info(options: dict, url: str) -> dict | None:
+    return _get_ytdl(options).extract_info(url, download=False)
+
+def extract_unprocessed(options: dict, url: str) -> dict | None:
+    """Chạy extractor nhưng chưa chọn định dạng/tải về; xử lý tiếp bằng `process_info`."""
+    info = _get_ytdl(options).extract_info(url, download=False, process=False)
+    if info and info.get("_type") == "playlist":
+        info = next(iter(info.get("entries") or ()), None)
+
+    return info or None
+
+def process_info(options: dict, info: dict) -> dict | None:
+    """Chọn định dạng cho info từ `extract_unprocessed`, không chạy lại extractor."""
+    return _get_ytdl(options).process_ie_result(info, download=False)
+
+def iter_playlist(options: dict, url: str, fields: tuple[str, ...], limit: int):
+    """Duyệt danh sách phát theo từng trang (yt-dlp tự tải trang kế tiếp khi cần)."""
+    info = _get_ytdl(options).extract_info(url, download=False, process=False)
+    if not info:
+        return
+
+    if info.get("_type") != "playlist":
+        yield _compact(info, fields)
+        return
+
+    for entry in itertools.islice(info.get("entries") or (), limit):
+        if entry:
+            yield _compact(entry, fields)
+
+def _compact(info: dict, fields: tuple[str, ...]) -> dict:
+    data = {k: info[k] for k in fields if info.get(k) is not None}
+    data.setdefault("extractor_key", info.get("ie_key"))
+    return data
+
+def download(options: dict, info: dict, progress=None) -> tuple[dict | None, str | None]:
+    """
+    Tải về từ info đã trích xuất, trả về info sau xử lý và đường dẫn file.
+    `progress` (nếu có) được gọi với phần trăm đã tải, chỉ dùng được ở chế độ thread.
+    """
+    ytdl = _get_ytdl(options)
+    _local.progress = progress
+    try:
+        data = ytdl.process_ie_result(info, download=True)
+    finally:
+        _local.progress = None
+
+    if not data:
+        return None, None
+
+    # Hậu xử lý có thể đổi đuôi file (vd: webm -> opus), lấy đường dẫn cuối cùng nếu có
+    downloads = data.get("requested_downloads") or [{}]
+    return data, downloads[-1].get("filepath") or ytdl.prepare_filename(data)
+
+class _InThread:
+    """Đánh dấu một hàm cần chạy trên luồng thay vì tiến trình (vd: closure không pickle được)."""
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+class YTDLPool:
+    """
+    Bộ thực thi riêng cho yt-dlp với giới hạn số tác vụ chạy đồng thời.
+
+    Các tác vụ được xếp theo độ ưu tiên (tìm kiếm > tải bài sắp phát > tải trước),
+    và trong cùng một mức ưu tiên thì các server được phục vụ lần lượt, để một
+    server thêm hàng chục bài cùng lúc không làm các server khác phải chờ.
+    """
+
+    def __init__(self, workers: int = YTDL_WORKERS, mode: str = YTDL_POOL_MODE):
+        self.workers = max(1, workers)
+        self.mode = mode if mode in ("thread", "process") else "thread"
+        self.executor: Executor | None = None
+        self.thread_executor: ThreadPoolExecutor | None = None
+        self.active = 0
+        # Tác vụ đang chạy trên executor (future của người gọi -> future của executor)
+        self.running: dict[asyncio.Future, asyncio.Future] = {}
+        self.queues: dict[TaskPriority, OrderedDict[int, deque]] = {
+            priority: OrderedDict() for priority in TaskPriority
+        }
+
+    async def run(
+        self, func, *args, guild_id: int | None = None, priority: TaskPriority = TaskPriority.DOWNLOAD,
+        abandoned=None,
+    ):
+        """
+        Chạy `func(*args)` trong pool. Tác vụ chưa bắt đầu thì bị bỏ khi người gọi hủy;
+        tác vụ đang chạy trên luồng/tiến trình khác thì không dừng được, nên người gọi bị
+        hủy vẫn chờ nó chạy xong (để các khóa như SingleFlight chỉ được thả khi file không
+        còn bị ghi) rồi mới nhận CancelledError. Kết quả khi đó được chuyển cho `abandoned`.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.queues[priority].setdefault(guild_id, deque()).append((future, func, args))
+        self._dispatch()
+
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future not in self.running:
+                future.cancel()
+                raise
+
+            with contextlib.suppress(Exception):
+                result = await future
+                if abandoned:
+                    abandoned(result)
+            raise
+
+    async def iterate(self, func, *args, guild_id: int | None = None, priority: TaskPriority = TaskPriority.DOWNLOAD):
+        """
+        Chạy một hàm sinh (generator) trong pool và trả về từng phần tử ngay khi có.
+        Hàm luôn chạy trên luồng (kể cả ở chế độ process) và giữ một chỗ trong pool
+        cho tới khi duyệt xong hoặc người gọi dừng lại.
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for item in func(*args):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, (item, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, (done, e))
+            else:
+                loop.call_soon_threadsafe(items.put_nowait, (done, None))
+
+        task = asyncio.create_task(self.run(_InThread(produce), guild_id=guild_id, priority=priority))
+        try:
+            while True:
+                item, error = await items.get()
+                if item is done:
+                    if error:
+                        raise error
+                    break
+
+                yield item
+        finally:
+            stop.set()
+            task.cancel()
+
+    def pending(self) -> int:
+        return sum(len(jobs) for guilds in self.queues.values() for jobs in guilds.values())
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.mode == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ytdl")
+
+            log.info(f"Đã khởi tạo yt-dlp pool ({self.mode}, {self.workers} worker)")
+
+        return self.executor
+
+    def _get_thread_executor(self) -> Executor:
+        if self.mode == "thread":
+            return self._get_executor()
+
+        if self.thread_executor is None:
+            self.thread_executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ytdl")
+
+        return self.thread_executor
+
+    def _next_job(self):
+        for priority in sorted(TaskPriority):
+            guilds = self.queues[priority]
+
+            while guilds:
+                guild_id, jobs = next(iter(guilds.items()))
+                job = jobs.popleft()
+
+                # Đưa server xuống cuối hàng để các server khác được lượt tiếp theo
+                del guilds[guild_id]
+                if jobs:
+                    guilds[guild_id] = jobs
+
+                if not job[0].cancelled():
+                    return job
+
+        return None
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+
+        while self.active < self.workers:
+            job = self._next_job()
+            if not job:
+                break
+
+            future, func, args = job
+            self.active += 1
+            executor = self._get_thread_executor() if isinstance(func, _InThread) else self._get_executor()
+            exec_future = loop.run_in_executor(executor, func, *args)
+            self.running[future] = exec_future
+            exec_future.add_done_callback(
+                lambda f, future=future: self._on_done(future, f)
+            )
+
+    def _on_done(self, future: asyncio.Future, exec_future: asyncio.Future):
+        self.active -= 1
+        self.running.pop(future, None)
+
+        if not future.done():
+            if exec_future.cancelled():
+                future.cancel()
+            elif exec_future.exception():
+                future.set_exception(exec_future.exception())
+            else:
+                future.set_result(exec_future.result())
+
+        self._dispatch()
@@ -1,3 +1,19 @@
-
+from .AudioCache import AudioCache
+from .SearchCache import SearchCache
+from .YTDLPool import YTDLPool
+from .SingleFlight import SingleFlight
+from .StreamURLCache import StreamURLCache
+from .PlaybackQueue import PlaybackQueue
+from .OggOpusSource import OggOpusSource
+from .PrebufferedSource import PrebufferedSource
+from .LiveSource import LiveSource
+from .TrackedSource import TrackedSource
+from .EnqueueJob import EnqueueJob
+from .UIUpdater import UIUpdater
+from .TimerWheel import TimerWheel
+from .QueueJournal import QueueJournal
+from .CommandSync import CommandSync
+from .ShardSupervisor import ShardSupervisor
+from .SearchResult import SearchResult
 from .Song import Song
 from .GuildState import GuildState
@@ -0,0 +1,12 @@
+def format_duration(duration: float | None) -> str:
+    if duration is None:
+        return "N/A"
+
+    m, s = divmod(duration, 60)
+    h, m = divmod(m, 60)
+
+    return (
+        f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
+        if h > 0
+        else f"{int(m):02d}:{int(s):02d}"
+    )
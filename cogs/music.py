@@ -4,14 +4,18 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import asyncio
+import contextlib
 import logging
 import os
-import random
 import aiohttp
 import re
 from typing import Union, Optional
 import google.generativeai as genai
-from classes import Song, GuildState
+from classes import Song, GuildState, EnqueueJob
+from classes.Song import audio_cache, search_cache, stream_urls, PLAYLIST_MAX_ENTRIES
+from classes.utils import format_duration
+from classes.GuildState import timers, journal, ALONE_TIMEOUT
+from enums import LoopMode
 from views import SearchView
 
 # === CONSTANTS & HELPERS ===
@@ -29,6 +33,7 @@ class MusicCog(commands.Cog, name="Miku"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.states = {}
+        self.resumed = False
         self.session = aiohttp.ClientSession()
         self.miku_persona = "You are Hatsune Miku, the world-famous virtual singer. You always answer in Vietnamese. Your personality is cheerful, energetic, a bit quirky, and always helpful. Keep your answers very short and cute, like a real person chatting. Use kaomoji like (´• ω •`) ♡, ( ´ ▽ ` )ﾉ, (b ᵔ▽ᵔ)b frequently. Your favorite food is leeks. You are part of Project Galaxy by imnhyneko.dev."
         gemini_key = os.getenv("GEMINI_API_KEY")
@@ -61,11 +66,79 @@ class MusicCog(commands.Cog, name="Miku"):
             f"Đã tham gia server mới: {guild.name} ({guild.id}). Bắt đầu đồng bộ lệnh..."
         )
         try:
-            await self.bot.tree.sync(guild=guild)
-            log.info(f"Đã đồng bộ lệnh thành công cho {guild.name}.")
+            if await self.bot.command_sync.sync(guild):
+                log.info(f"Đã đồng bộ lệnh thành công cho {guild.name}.")
+            else:
+                log.info(f"Lệnh của {guild.name} không thay đổi, bỏ qua đồng bộ.")
         except Exception as e:
             log.error(f"Lỗi khi đồng bộ lệnh cho server mới {guild.name}:", exc_info=e)
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready được gọi lại mỗi lần kết nối lại gateway, chỉ khôi phục một lần
+        if self.resumed:
+            return
+
+        self.resumed = True
+        snapshots = await asyncio.get_running_loop().run_in_executor(None, journal.load)
+        for guild_id, snapshot in snapshots.items():
+            try:
+                await self._resume_session(guild_id, snapshot)
+            except Exception as e:
+                log.error(f"Không thể khôi phục phiên phát nhạc của guild {guild_id}:", exc_info=e)
+
+    async def _resume_session(self, guild_id: int, snapshot: dict):
+        """Vào lại kênh thoại và dựng lại hàng đợi từ ảnh chụp; bài hát chỉ được tải khi tới lượt."""
+        # Phiên mới đã được bắt đầu trước khi kịp khôi phục
+        if guild_id in self.states:
+            return
+
+        guild = self.bot.get_guild(guild_id)
+        voice_channel = guild and guild.get_channel(snapshot["voice_channel_id"])
+        text_channel = guild and guild.get_channel(snapshot["text_channel_id"])
+        entries = ([snapshot["current"]] if snapshot.get("current") else []) + snapshot["queue"]
+
+        # Không còn ai nghe thì không vào lại kênh
+        if not voice_channel or not text_channel or not entries or all(m.bot for m in voice_channel.members):
+            journal.forget(guild_id)
+            return
+
+        requesters = {}
+        async def get_requester(member_id: int | None):
+            if member_id not in requesters:
+                member = guild.get_member(member_id) if member_id else None
+                if not member and member_id:
+                    with contextlib.suppress(discord.HTTPException):
+                        member = await guild.fetch_member(member_id)
+                requesters[member_id] = member or guild.me
+
+            return requesters[member_id]
+
+        state = self.get_guild_state(guild_id)
+        state.restored_channel = text_channel
+        state.volume = snapshot["volume"]
+        state.loop_mode = LoopMode(snapshot["loop_mode"])
+
+        songs = []
+        for data in entries:
+            song = Song(data, await get_requester(data.get("requester_id")))
+            song.guild = state
+            songs.append(song)
+
+        if snapshot.get("current"):
+            songs[0].start_time = snapshot.get("position", 0)
+
+        state.queue.extend(songs)
+        await state.connect_voice(voice_channel)
+        state.schedule_prefetch()
+        state.start_player_loop()
+        log.info(f"Đã khôi phục phiên phát nhạc của guild {guild_id} ({len(songs)} bài)")
+
+        with contextlib.suppress(discord.HTTPException):
+            await text_channel.send(
+                f"🔄 Miku đã quay lại! Tiếp tục phát **{len(songs)}** bài trong hàng đợi."
+            )
+
     @commands.Cog.listener()
     async def on_session_end(self, guild_id: int):
         if guild_id in self.states:
@@ -77,25 +150,34 @@ class MusicCog(commands.Cog, name="Miku"):
         if not member.guild.voice_client or member.bot:
             return
         vc = member.guild.voice_client
-        if len(vc.channel.members) == 1:
+        key = ("alone", member.guild.id)
+        if len(vc.channel.members) > 1:
+            timers.cancel(key)
+        elif key not in timers:
             log.info(
-                f"Bot ở một mình trong kênh {vc.channel.name}, sẽ tự ngắt kết nối sau 5m."
+                f"Bot ở một mình trong kênh {vc.channel.name}, sẽ tự ngắt kết nối sau {ALONE_TIMEOUT // 60}m."
             )
+            timers.schedule(key, ALONE_TIMEOUT, lambda: self._leave_if_alone(member.guild))
 
-            await asyncio.sleep(900)
+    async def _leave_if_alone(self, guild: discord.Guild):
+        vc = guild.voice_client
+        if not vc or len(vc.channel.members) > 1:
+            return
 
-            if vc and len(vc.channel.members) == 1:
-                log.info(f"Vẫn chỉ có một mình, đang ngắt kết nối...")
-                state = self.get_guild_state(member.guild.id)
-                if state.last_ctx:
-                    try:
-                        await state.last_ctx.channel.send(
-                            "👋 Tạm biệt! Miku sẽ rời đi vì không có ai nghe cùng."
-                        )
-                    except discord.Forbidden:
-                        pass
+        log.info(f"Vẫn chỉ có một mình, đang ngắt kết nối...")
+        state = self.states.get(guild.id)
+        if not state:
+            return await vc.disconnect(force=True)
 
-                await state.cleanup()
+        if state.text_channel:
+            try:
+                await state.text_channel.send(
+                    "👋 Tạm biệt! Miku sẽ rời đi vì không có ai nghe cùng."
+                )
+            except discord.Forbidden:
+                pass
+
+        await state.cleanup()
 
     async def _send_response(self, ctx: AnyContext, *args, **kwargs):
         ephemeral = kwargs.get("ephemeral", False)
@@ -128,17 +210,17 @@ class MusicCog(commands.Cog, name="Miku"):
         )
         embed.add_field(
             name="📜 Lệnh Hàng đợi",
-            value=f"`queue`: Xem hàng đợi hiện tại.\n`shuffle`: Xáo trộn thứ tự hàng đợi.\n`remove <số>`: Xóa bài hát khỏi hàng đợi.\n`clear`: Xóa sạch hàng đợi.",
+            value=f"`queue`: Xem hàng đợi hiện tại.\n`shuffle`: Xáo trộn thứ tự hàng đợi.\n`remove <số>`: Xóa bài hát khỏi hàng đợi.\n`move <từ> <đến>`: Di chuyển bài hát trong hàng đợi.\n`clear`: Xóa sạch hàng đợi.\n`jobs`: Xem các tác vụ thêm bài đang chạy.\n`canceljob <mã>`: Hủy một tác vụ thêm bài.",
             inline=False,
         )
         embed.add_field(
             name="⚙️ Lệnh Tiện ích",
-            value=f"`nowplaying`: Hiển thị lại bảng điều khiển.\n`volume <0-200>`: Chỉnh âm lượng.\n`seek <thời gian>`: Tua nhạc (vd: `1:23`).\n`lyrics`: Tìm lời bài hát đang phát.",
+            value=f"`nowplaying`: Hiển thị lại bảng điều khiển.\n`volume <0-200>`: Chỉnh âm lượng.\n`seek <thời gian>`: Tua nhạc (vd: `1:23`, `+30`, `-10`).\n`lyrics`: Tìm lời bài hát đang phát.\n`prefetch [số]`: Xem/chỉnh số bài được tải trước.",
             inline=False,
         )
         embed.add_field(
             name="💬 Lệnh AI & Chung",
-            value=f"`chat <tin nhắn>`: Trò chuyện với Miku!\n`help`: Hiển thị bảng trợ giúp này.\n`ping`: Kiểm tra độ trễ của Miku.",
+            value=f"`chat <tin nhắn>`: Trò chuyện với Miku!\n`help`: Hiển thị bảng trợ giúp này.\n`ping`: Kiểm tra độ trễ của Miku.\n`stats`: Xem thống kê bộ nhớ đệm.",
             inline=False,
         )
         embed.set_footer(
@@ -180,20 +262,17 @@ class MusicCog(commands.Cog, name="Miku"):
         await state.connect_voice(author.voice.channel)
 
         if query.startswith(("http://", "https://")):
-            song = await Song.from_url_and_download(query, author)
-
-            if song:
-                await state.queue.put(song)
-                response_message = f"✅ Đã thêm **{song.title}** vào hàng đợi."
-
-                if isinstance(ctx, discord.Interaction) and ctx.response.is_done():
-                    await ctx.followup.send(response_message)
-                else:
-                    await self._send_response(ctx, response_message)
-
-                state.start_player_loop()
+            # Trả lời ngay, việc phân giải và tải về chạy nền và báo tiến độ qua tin nhắn này
+            if Song.is_playlist_url(query):
+                message = await self._send_progress_message(ctx, "📥 Đang đọc danh sách phát...")
+                EnqueueJob(state.jobs, f"Danh sách phát `{query}`", message).start(
+                    lambda job: self._enqueue_playlist(job, state, query, author)
+                )
             else:
-                await self._send_response(ctx, f"❌ Không thể tải về từ URL: `{query}`")
+                message = await self._send_progress_message(ctx, "🔎 Đang xử lý liên kết...")
+                EnqueueJob(state.jobs, f"`{query}`", message).start(
+                    lambda job: self._enqueue_song(job, state, query, author)
+                )
         else:
             search_results = await Song.search_only(query, author)
 
@@ -210,6 +289,91 @@ class MusicCog(commands.Cog, name="Miku"):
         if isinstance(ctx, commands.Context):
             await ctx.message.remove_reaction("⏳", self.bot.user)
 
+    async def _send_progress_message(self, ctx: AnyContext, content: str) -> discord.Message:
+        if isinstance(ctx, discord.Interaction):
+            return await ctx.followup.send(content, wait=True)
+
+        return await ctx.send(content)
+
+    async def _enqueue_song(
+        self, job: EnqueueJob, state: GuildState, url: str, author, song: Optional[Song] = None
+    ):
+        """Phân giải (và tải về nếu sẽ phát ngay) một bài hát rồi thêm vào hàng đợi."""
+        if state.current_song or not state.queue.empty():
+            # Chỉ tải ngay khi bài hát sẽ được phát luôn, còn lại để tải đúng lúc tới lượt
+            song = song or await Song.from_url_lazy(url, author)
+        else:
+            await job.update("⏳ Đang tải về...")
+            song = await Song.from_url_and_download(
+                url, author, progress=job.progress_hook(), bitrate=state.bitrate
+            )
+
+        if not song:
+            return await job.finish(f"❌ Không thể tải về từ URL: `{url}`")
+
+        # Người dùng đã dừng phát nhạc trong lúc đang tải
+        if self.states.get(state.guild_id) is not state:
+            song.cleanup()
+            return await job.finish(f"🚫 Đã hủy: {job.description}")
+
+        await state.add_song(song)
+        state.start_player_loop()
+        await job.finish(f"✅ Đã thêm **{song.title}** vào hàng đợi.")
+
+    async def _enqueue_playlist(self, job: EnqueueJob, state: GuildState, url: str, author):
+        """Thêm dần các bài trong danh sách phát, cập nhật tiến độ trên một tin nhắn duy nhất."""
+        count = 0
+
+        songs = Song.iter_playlist(url, author)
+        try:
+            async with contextlib.aclosing(songs):
+                async for song in songs:
+                    # Người dùng đã dừng phát nhạc trong lúc đang thêm
+                    if self.states.get(state.guild_id) is not state:
+                        break
+
+                    await state.add_song(song)
+                    count += 1
+                    if count == 1:
+                        state.start_player_loop()
+
+                    await job.update(f"📥 Đang thêm danh sách phát... `{count}` bài")
+        except Exception as e:
+            log.error(f"Lỗi khi đọc danh sách phát '{url}': {e}", exc_info=True)
+
+        if count:
+            content = f"✅ Đã thêm **{count}** bài từ danh sách phát vào hàng đợi."
+            if count >= PLAYLIST_MAX_ENTRIES:
+                content += f" (giới hạn {PLAYLIST_MAX_ENTRIES} bài mỗi lần)"
+        else:
+            content = f"❌ Không thể đọc danh sách phát: `{url}`"
+
+        await job.finish(content)
+
+    async def _jobs_logic(self, ctx: AnyContext):
+        state = self.states.get(ctx.guild.id)
+        jobs = list(state.jobs.values()) if state else []
+        if not jobs:
+            return await self._send_response(
+                ctx, "Không có tác vụ thêm bài nào đang chạy.", ephemeral=True
+            )
+
+        lines = [f"`#{job.id}` {job.description} • {job.describe()}" for job in jobs]
+        await self._send_response(
+            ctx, "📋 **Các tác vụ đang chạy:**\n" + "\n".join(lines), ephemeral=True
+        )
+
+    async def _cancel_job_logic(self, ctx: AnyContext, job_id: int):
+        state = self.states.get(ctx.guild.id)
+        job = state.jobs.get(job_id) if state else None
+        if not job:
+            return await self._send_response(
+                ctx, f"Không tìm thấy tác vụ `#{job_id}`.", ephemeral=True
+            )
+
+        job.cancel()
+        await self._send_response(ctx, f"🚫 Đã hủy tác vụ `#{job_id}`.", ephemeral=True)
+
     async def _lyrics_logic(self, ctx: AnyContext):
         if not self.genai_model:
             return await self._send_response(
@@ -352,10 +516,10 @@ class MusicCog(commands.Cog, name="Miku"):
                 ctx, "Âm lượng phải trong khoảng từ 0 đến 200.", ephemeral=True
             )
         state.volume = value / 100
-        if state.voice_client.source:
-            state.voice_client.source.volume = state.volume
+        state.apply_volume()
         await self._send_response(ctx, f"🔊 Đã đặt âm lượng thành **{value}%**.")
-        await state.update_now_playing_message()
+        state.ui.request()
+        state.save()
 
     async def _seek_logic(self, ctx: AnyContext, timestamp: str):
         state = self.get_guild_state(ctx.guild.id)
@@ -371,8 +535,14 @@ class MusicCog(commands.Cog, name="Miku"):
                 ctx, "Không thể tua đối với nội dung phát trực tiếp (LIVE).", ephemeral=True
             )
 
+        relative = re.fullmatch(r"([+-])(\d+)", timestamp.strip())
         match = re.match(r"(?:(\d+):)?(\d+)", timestamp)
-        if not match:
+        if relative:
+            # Tua tương đối so với vị trí hiện tại (vd: `+30`, `-10`)
+            offset = int(relative.group(2))
+            seconds = state.get_position() + (offset if relative.group(1) == "+" else -offset)
+            seconds = max(0, seconds)
+        elif not match:
             try:
                 seconds = int(timestamp)
             except ValueError:
@@ -391,60 +561,135 @@ class MusicCog(commands.Cog, name="Miku"):
                 ctx, "Không thể tua đến thời điểm không hợp lệ.", ephemeral=True
             )
 
-        state.current_song.start_time = seconds
-        state.restart_current_song()
+        state.seek(seconds)
+        state.ui.request()
 
-        await self._send_response(ctx, f"⏩ Đã tua đến `{seconds}` giây.")
+        await self._send_response(ctx, f"⏩ Đã tua đến `{format_duration(seconds)}`.")
 
     async def _shuffle_logic(self, ctx: AnyContext):
         state = self.get_guild_state(ctx.guild.id)
-        if state.queue.qsize() < 2:
+        if len(state.queue) < 2:
             return await self._send_response(
                 ctx, "Không đủ bài hát để xáo trộn.", ephemeral=True
             )
-        queue_list = list(state.queue._queue)
-        random.shuffle(queue_list)
-
-        while not state.queue.empty():
-            state.queue.get_nowait()
-
-        for song in queue_list:
-            await state.queue.put(song)
 
+        state.queue.shuffle()
+        state.schedule_prefetch()
+        state.save()
         await self._send_response(ctx, "🔀 Đã xáo trộn hàng đợi!")
 
     async def _remove_logic(self, ctx: AnyContext, index: int):
         state = self.get_guild_state(ctx.guild.id)
-        if index <= 0 or index > state.queue.qsize():
+        if index <= 0 or index > len(state.queue):
             return await self._send_response(
                 ctx, "Số thứ tự không hợp lệ.", ephemeral=True
             )
 
-        queue_list = list(state.queue._queue)
-        removed_song = queue_list.pop(index - 1)
+        removed_song = state.queue.pop(index - 1)
+        state.schedule_prefetch()
+        state.save()
         removed_song.cleanup()
 
-        while not state.queue.empty():
-            state.queue.get_nowait()
-        for song in queue_list:
-            await state.queue.put(song)
-
         await self._send_response(
             ctx, f"🗑️ Đã xóa **{removed_song.title}** khỏi hàng đợi."
         )
 
     async def _clear_logic(self, ctx: AnyContext):
         state = self.get_guild_state(ctx.guild.id)
-        count = 0
-        while not state.queue.empty():
-            try:
-                song = state.queue.get_nowait()
-                song.cleanup()
-                count += 1
-            except asyncio.QueueEmpty:
-                break
+        state.cancel_prefetch()
+        songs = state.queue.clear()
+        state.save()
+        for song in songs:
+            song.cleanup()
+        count = len(songs)
         await self._send_response(ctx, f"💥 Đã xóa sạch {count} bài hát khỏi hàng đợi.")
 
+    async def _move_logic(self, ctx: AnyContext, source: int, destination: int):
+        state = self.get_guild_state(ctx.guild.id)
+        size = len(state.queue)
+        if not 0 < source <= size or not 0 < destination <= size:
+            return await self._send_response(
+                ctx, "Số thứ tự không hợp lệ.", ephemeral=True
+            )
+
+        song = state.queue[source - 1]
+        state.queue.move(source - 1, destination - 1)
+        state.schedule_prefetch()
+        state.save()
+        await self._send_response(
+            ctx, f"↕️ Đã chuyển **{song.title}** tới vị trí `{destination}`."
+        )
+
+    async def _prefetch_logic(self, ctx: AnyContext, count: Optional[int]):
+        state = self.get_guild_state(ctx.guild.id)
+
+        if count is not None:
+            if not 0 <= count <= 10:
+                return await self._send_response(
+                    ctx, "Số bài tải trước phải trong khoảng từ 0 đến 10.", ephemeral=True
+                )
+
+            state.prefetch_count = count
+            state.schedule_prefetch()
+
+        total = state.prefetch_hits + state.prefetch_misses
+        hit_rate = f"{state.prefetch_hits / total * 100:.0f}%" if total else "N/A"
+        await self._send_response(
+            ctx,
+            f"📥 Tải trước **{state.prefetch_count}** bài tiếp theo. "
+            f"Hit: `{state.prefetch_hits}` • Miss: `{state.prefetch_misses}` • Tỉ lệ hit: `{hit_rate}`",
+            ephemeral=True,
+        )
+
+    async def _create_stats_embed(self, state: Optional[GuildState] = None) -> discord.Embed:
+        embed = discord.Embed(title="📊 Thống kê bộ nhớ đệm", color=0x39D0D6)
+
+        audio = await audio_cache.stats()
+        audio_total = audio["hits"] + audio["misses"]
+        embed.add_field(
+            name="🎵 Cache âm thanh",
+            value=(
+                f"File: `{audio['entries']}` • Dung lượng: `{audio['size'] / 1024 / 1024:.1f}/{audio['max_size'] / 1024 / 1024:.0f} MB`\n"
+                f"Hit: `{audio['hits']}` • Miss: `{audio['misses']}` • "
+                f"Tỉ lệ hit: `{audio['hits'] / audio_total * 100 if audio_total else 0:.0f}%`"
+            ),
+            inline=False,
+        )
+
+        search = search_cache.stats()
+        embed.add_field(
+            name="🔎 Cache tìm kiếm",
+            value=(
+                f"Truy vấn: `{search['entries']}` • Hit: `{search['hits']}` • Miss: `{search['misses']}` • "
+                f"Tỉ lệ hit: `{search['hit_rate'] * 100:.0f}%`\n"
+                f"Độ trễ TB: hit `{search['avg_hit_ms']:.1f}ms` • miss `{search['avg_miss_ms']:.0f}ms`"
+            ),
+            inline=False,
+        )
+
+        streams = stream_urls.stats()
+        embed.add_field(
+            name="📡 URL phát trực tiếp",
+            value=(
+                f"URL: `{streams['entries']}` • Hit: `{streams['hits']}` • Miss: `{streams['misses']}` • "
+                f"Làm mới nền: `{streams['refreshes']}`"
+            ),
+            inline=False,
+        )
+
+        if state:
+            ui = state.ui.stats()
+            gap = f"{state.last_gap * 1000:.0f}ms" if state.last_gap is not None else "N/A"
+            embed.add_field(
+                name="🖥️ Server này",
+                value=(
+                    f"Yêu cầu cập nhật giao diện: `{ui['requests']}` • Đã gửi: `{ui['edits']}` • Bỏ qua: `{ui['skipped']}`\n"
+                    f"Khoảng lặng khi chuyển bài gần nhất: `{gap}`"
+                ),
+                inline=False,
+            )
+        return embed
+
     @commands.command(name="ping")
     async def prefix_ping(self, ctx: commands.Context):
         await self._send_response(
@@ -488,7 +733,7 @@ class MusicCog(commands.Cog, name="Miku"):
     async def prefix_nowplaying(self, ctx: commands.Context):
         state = self.get_guild_state(ctx.guild.id)
         state.last_ctx = ctx
-        await state.update_now_playing_message(new_song=True)
+        state.ui.request(new_song=True)
 
     @commands.command(name="volume", aliases=["vol"])
     async def prefix_volume(self, ctx: commands.Context, value: int):
@@ -502,6 +747,10 @@ class MusicCog(commands.Cog, name="Miku"):
     async def prefix_remove(self, ctx: commands.Context, index: int):
         await self._remove_logic(ctx, index)
 
+    @commands.command(name="move", aliases=["mv"])
+    async def prefix_move(self, ctx: commands.Context, source: int, destination: int):
+        await self._move_logic(ctx, source, destination)
+
     @commands.command(name="clear")
     async def prefix_clear(self, ctx: commands.Context):
         await self._clear_logic(ctx)
@@ -514,6 +763,22 @@ class MusicCog(commands.Cog, name="Miku"):
     async def prefix_lyrics(self, ctx: commands.Context):
         await self._lyrics_logic(ctx)
 
+    @commands.command(name="stats")
+    async def prefix_stats(self, ctx: commands.Context):
+        await self._send_response(ctx, embed=await self._create_stats_embed(self.states.get(ctx.guild.id)))
+
+    @commands.command(name="prefetch")
+    async def prefix_prefetch(self, ctx: commands.Context, count: int = None):
+        await self._prefetch_logic(ctx, count)
+
+    @commands.command(name="jobs")
+    async def prefix_jobs(self, ctx: commands.Context):
+        await self._jobs_logic(ctx)
+
+    @commands.command(name="canceljob")
+    async def prefix_canceljob(self, ctx: commands.Context, job_id: int):
+        await self._cancel_job_logic(ctx, job_id)
+
     @app_commands.command(name="ping", description="Kiểm tra độ trễ của Miku.")
     async def slash_ping(self, interaction: discord.Interaction):
         await self._send_response(
@@ -528,6 +793,12 @@ class MusicCog(commands.Cog, name="Miku"):
             embed=self._create_help_embed(), ephemeral=True
         )
 
+    @app_commands.command(name="stats", description="Xem thống kê bộ nhớ đệm của Miku.")
+    async def slash_stats(self, interaction: discord.Interaction):
+        await self._send_response(
+            interaction, embed=await self._create_stats_embed(self.states.get(interaction.guild.id)), ephemeral=True
+        )
+
     @app_commands.command(name="chat", description="Trò chuyện với Miku!")
     @app_commands.describe(message="Điều bạn muốn nói với Miku")
     async def slash_chat(self, interaction: discord.Interaction, message: str):
@@ -570,7 +841,7 @@ class MusicCog(commands.Cog, name="Miku"):
     async def slash_nowplaying(self, interaction: discord.Interaction):
         state = self.get_guild_state(interaction.guild.id)
         state.last_ctx = interaction
-        await state.update_now_playing_message(new_song=True)
+        state.ui.request(new_song=True)
         await interaction.response.send_message(
             "Đã hiển thị lại bảng điều khiển.", ephemeral=True
         )
@@ -595,6 +866,14 @@ class MusicCog(commands.Cog, name="Miku"):
     async def slash_remove(self, interaction: discord.Interaction, index: int):
         await self._remove_logic(interaction, index)
 
+    @music_group.command(name="move", description="Di chuyển một bài hát tới vị trí khác trong hàng đợi.")
+    @app_commands.describe(
+        source="Số thứ tự hiện tại của bài hát.",
+        destination="Vị trí mới trong hàng đợi.",
+    )
+    async def slash_move(self, interaction: discord.Interaction, source: int, destination: int):
+        await self._move_logic(interaction, source, destination)
+
     @music_group.command(name="clear", description="Xóa tất cả bài hát trong hàng đợi.")
     async def slash_clear(self, interaction: discord.Interaction):
         await self._clear_logic(interaction)
@@ -602,7 +881,7 @@ class MusicCog(commands.Cog, name="Miku"):
     @music_group.command(
         name="seek", description="Tua đến một thời điểm trong bài hát."
     )
-    @app_commands.describe(timestamp="Thời gian để tua đến (vd: 1:23 hoặc 83).")
+    @app_commands.describe(timestamp="Thời gian để tua đến (vd: 1:23 hoặc 83), hoặc tua tương đối (vd: +30, -10).")
     async def slash_seek(self, interaction: discord.Interaction, timestamp: str):
         await self._seek_logic(interaction, timestamp)
 
@@ -610,6 +889,24 @@ class MusicCog(commands.Cog, name="Miku"):
     async def slash_lyrics(self, interaction: discord.Interaction):
         await self._lyrics_logic(interaction)
 
+    @music_group.command(
+        name="prefetch", description="Xem hoặc chỉnh số bài hát được tải trước."
+    )
+    @app_commands.describe(count="Số bài tiếp theo sẽ được tải trước (0-10).")
+    async def slash_prefetch(
+        self, interaction: discord.Interaction, count: Optional[app_commands.Range[int, 0, 10]] = None
+    ):
+        await self._prefetch_logic(interaction, count)
+
+    @music_group.command(name="jobs", description="Xem các tác vụ thêm bài đang chạy.")
+    async def slash_jobs(self, interaction: discord.Interaction):
+        await self._jobs_logic(interaction)
+
+    @music_group.command(name="canceljob", description="Hủy một tác vụ thêm bài đang chạy.")
+    @app_commands.describe(job_id="Mã tác vụ (xem bằng lệnh jobs).")
+    async def slash_canceljob(self, interaction: discord.Interaction, job_id: int):
+        await self._cancel_job_logic(interaction, job_id)
+
 async def setup(bot: commands.Bot):
     """Thiết lập và đăng ký các cogs vào bot."""
     await bot.add_cog(MusicCog(bot))
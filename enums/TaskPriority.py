@@ -0,0 +1,6 @@
+from enum import IntEnum
+
+class TaskPriority(IntEnum):
+    SEARCH = 0
+    DOWNLOAD = 1
+    PREFETCH = 2
@@ -1,2 +1,2 @@
-
 from .LoopMode import LoopMode
+from .TaskPriority import TaskPriority
@@ -6,14 +6,22 @@ if sys.platform == 'win32':
 import discord
 from discord.ext import commands
 import os
+import time
 from dotenv import load_dotenv
 import logging
 
+load_dotenv()
+
+# Chạy nhiều tiến trình, mỗi tiến trình giữ một nhóm shard (1 = chạy như cũ trong một tiến trình)
+SHARD_WORKERS = max(1, int(os.getenv("SHARD_WORKERS", "1")))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or SHARD_WORKERS
+
 def setup_logging():
     """Thiết lập logging để ghi ra file và console."""
+    process = " [%(processName)s]" if SHARD_WORKERS > 1 else ""
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+        format=f'%(asctime)s [%(levelname)s]{process} %(name)s: %(message)s',
         handlers=[
             logging.FileHandler("miku.log", encoding='utf-8'),
             logging.StreamHandler(sys.stdout)
@@ -21,12 +29,14 @@ def setup_logging():
     )
 
 setup_logging()
-load_dotenv()
 
 sys.path.append("./classes")
 sys.path.append("./views")
 sys.path.append("./enums")
 
+from classes import CommandSync, ShardSupervisor
+from classes.ShardSupervisor import HEALTH_INTERVAL
+
 TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 if not TOKEN:
     logging.critical("LỖI: Vui lòng thiết lập biến DISCORD_BOT_TOKEN trong file .env")
@@ -36,18 +46,22 @@ intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
 
-class MikuBot(commands.Bot):
-    def __init__(self):
+class MikuBot(commands.AutoShardedBot):
+    def __init__(self, shard_ids: list[int] | None = None, shard_count: int | None = None, health=None):
         super().__init__(
             command_prefix="miku!",
             help_command=None,
-            intents=intents
+            intents=intents,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
         )
         self.initial_cogs = ['cogs.music']
         self.synced = False
+        self.command_sync = CommandSync(self.tree)
+        self.health = health
 
     async def setup_hook(self):
-        """Chỉ tải cogs, không làm gì khác."""
+        """Tải cogs, và bắt đầu gửi tình trạng về tiến trình giám sát nếu chạy dạng worker."""
         for extension in self.initial_cogs:
             try:
                 await self.load_extension(extension)
@@ -55,6 +69,23 @@ class MikuBot(commands.Bot):
             except Exception as e:
                 logging.error(f"Lỗi khi tải extension {extension}:", exc_info=e)
 
+        if self.health is not None:
+            self.loop.create_task(self.report_health())
+
+    async def report_health(self):
+        await self.wait_until_ready()
+        while not self.is_closed():
+            cog = self.get_cog("Miku")
+            self.health.put({
+                "pid": os.getpid(),
+                "shards": list(self.shard_ids or []),
+                "guilds": len(self.guilds),
+                "sessions": len(cog.states) if cog else 0,
+                "latency": self.latency,
+                "time": time.time(),
+            })
+            await asyncio.sleep(HEALTH_INTERVAL)
+
     async def on_ready(self):
         """
         Sự kiện sau khi bot kết nối.
@@ -62,18 +93,16 @@ class MikuBot(commands.Bot):
         """
         await self.wait_until_ready()
         if not self.synced:
-            logging.info("Bắt đầu đồng bộ lệnh lần đầu cho các server hiện có...")
-            synced_count = 0
-            for guild in self.guilds:
-                try:
-                    await self.tree.sync(guild=guild)
-                    synced_count += 1
-                except discord.errors.Forbidden:
-                    logging.warning(f"Không có quyền đồng bộ lệnh cho server: {guild.name} ({guild.id})")
-                except Exception as e:
-                    logging.error(f"Lỗi khi đồng bộ lệnh cho guild {guild.id}:", exc_info=e)
-
-            logging.info(f"Đã đồng bộ lệnh cho {synced_count}/{len(self.guilds)} server.")
+            logging.info("Bắt đầu đồng bộ lệnh (bỏ qua các phạm vi không thay đổi)...")
+            started = time.perf_counter()
+            # Lệnh toàn cục chỉ cần một worker (worker giữ shard 0) đồng bộ
+            include_global = not self.shard_ids or 0 in self.shard_ids
+            synced_count = await self.command_sync.sync_all(self.guilds, include_global)
+
+            logging.info(
+                f"Đã đồng bộ {synced_count}/{len(self.guilds) + 1} phạm vi lệnh "
+                f"trong {time.perf_counter() - started:.2f}s."
+            )
             self.synced = True
 
         logging.info(f'Đăng nhập thành công với tên {self.user} (ID: {self.user.id})')
@@ -82,16 +111,26 @@ class MikuBot(commands.Bot):
         activity = discord.Activity(type=discord.ActivityType.listening, name=f"{self.command_prefix}help | /help")
         await self.change_presence(activity=activity)
 
-async def main():
+async def main(shard_ids: list[int] | None = None, shard_count: int | None = None, health=None):
     if not os.path.exists('./cache'):
         os.makedirs('./cache')
         logging.info("Đã tạo thư mục './cache")
     
-    async with MikuBot() as bot:
+    async with MikuBot(shard_ids, shard_count, health) as bot:
         await bot.start(TOKEN)
 
+def run_worker(shard_ids: list[int], shard_count: int, health):
+    """Điểm vào của một tiến trình worker: một AutoShardedBot giữ các shard được giao."""
+    try:
+        asyncio.run(main(shard_ids, shard_count, health))
+    except KeyboardInterrupt:
+        pass
+
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        if SHARD_WORKERS > 1:
+            ShardSupervisor(run_worker, SHARD_WORKERS, SHARD_COUNT).run()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logging.info("Bot đã tắt theo yêu cầu của người dùng.")
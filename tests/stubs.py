@@ -0,0 +1,176 @@
+"""Các thành phần giả dùng chung cho tests: extractor yt-dlp giả và máy chủ HTTP cục bộ."""
+import time
+import shutil
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="cần FFmpeg")
+
+class StubIE(InfoExtractor):
+    """
+    Extractor giả cho URL https://stub.test/watch/<id>: đếm số lần được gọi và trả về
+    hai định dạng âm thanh (Opus/WebM và AAC/M4A) nằm trên máy chủ cục bộ `base_url`.
+    """
+
+    _VALID_URL = r"https?://stub\.test/watch/(?P<id>\w+)"
+    base_url = ""
+    calls = 0
+    # Thời gian giả lập cho một lần tải trang/giải mã chữ ký của extractor thật
+    cost = 0.0
+    durations: dict[str, float] = {}
+
+    def _real_extract(self, url):
+        StubIE.calls += 1
+        time.sleep(self.cost)
+        video_id = self._match_id(url)
+        return {
+            "id": video_id,
+            "title": f"Stub {video_id}",
+            "duration": self.durations.get(video_id, 10),
+            "webpage_url": url,
+            "formats": [
+                {
+                    "format_id": "opus", "url": f"{self.base_url}/{video_id}.webm", "ext": "webm",
+                    "acodec": "opus", "vcodec": "none", "abr": 70,
+                },
+                {
+                    "format_id": "aac", "url": f"{self.base_url}/{video_id}.m4a", "ext": "m4a",
+                    "acodec": "mp4a.40.2", "vcodec": "none", "abr": 128,
+                },
+            ],
+        }
+
+    @classmethod
+    def reset(cls, base_url: str, cost: float = 0.0, durations: dict[str, float] | None = None):
+        cls.base_url = base_url
+        cls.calls = 0
+        cls.cost = cost
+        cls.durations = durations or {}
+
+def stub_ytdl(options: dict) -> yt_dlp.YoutubeDL:
+    """Thay cho YTDLPool._get_ytdl: YoutubeDL chỉ có extractor giả."""
+    import importlib
+    pool_module = importlib.import_module("classes.YTDLPool")
+
+    ytdl = yt_dlp.YoutubeDL(options, auto_init=False)
+    ytdl.add_info_extractor(StubIE())
+    ytdl.add_progress_hook(pool_module._on_progress)
+    return ytdl
+
+class LocalServer:
+    """
+    Máy chủ HTTP cục bộ phục vụ `files` (đường dẫn -> bytes).
+
+    `rate` giới hạn tốc độ gửi (byte/giây) để giả lập mạng chậm; `drop_after` cắt
+    mỗi kết nối sau khi gửi bấy nhiêu byte (không có Content-Length, như luồng trực tiếp).
+    """
+
+    def __init__(self, files: dict[str, bytes] | None = None, rate: float | None = None, drop_after: int | None = None):
+        self.files = files if files is not None else {}
+        self.rate = rate
+        self.drop_after = drop_after
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                body = server.files.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+
+                # Hỗ trợ "Range: bytes=N-" để FFmpeg nối tiếp được sau khi mất kết nối
+                start = 0
+                requested = self.headers.get("Range", "")
+                if requested.startswith("bytes="):
+                    start = int(requested[6:].split("-")[0] or 0)
+                    if start >= len(body):
+                        self.send_error(416)
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+
+                body = body[start:]
+                if server.drop_after is None:
+                    self.send_header("Content-Length", str(len(body)))
+                else:
+                    body = body[:server.drop_after]
+                self.end_headers()
+
+                chunk = 16 * 1024
+                try:
+                    for i in range(0, len(body), chunk):
+                        self.wfile.write(body[i:i + chunk])
+                        if server.rate:
+                            time.sleep(chunk / server.rate)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def make_audio(seconds: float, fmt: str = "webm", codec: str = "libopus") -> bytes:
+    """Tạo một file âm thanh (sóng sin) bằng FFmpeg và trả về nội dung."""
+    result = subprocess.run(
+        [
+            "ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+            "-ac", "2", "-ar", "48000", "-c:a", codec, "-b:a", "64k", "-f", fmt, "pipe:1",
+        ],
+        check=True, capture_output=True,
+    )
+    return result.stdout
+
+def fake_gateway_worker(shard_ids: list[int], shard_count: int, health):
+    """
+    Worker giả cho ShardSupervisor: thay vì kết nối gateway Discord, ghi một dòng
+    IDENTIFY cho mỗi shard vào `FAKE_GATEWAY_DIR/identify.jsonl` rồi gửi tình trạng
+    mỗi 0.1s. File `crash-<shard đầu>` làm worker thoát lỗi, `hang-<shard đầu>` làm nó
+    ngừng gửi tình trạng (mỗi file chỉ có tác dụng một lần).
+    """
+    import os
+    import sys
+    import json
+
+    folder = os.environ["FAKE_GATEWAY_DIR"]
+    files = {name: os.environ.get(name) for name in ("QUEUE_JOURNAL_FILE", "COMMAND_SYNC_FILE", "SEARCH_CACHE_FILE")}
+    with open(os.path.join(folder, "identify.jsonl"), "a", encoding="utf-8") as f:
+        for shard in shard_ids:
+            f.write(json.dumps({"shard": shard, "shard_count": shard_count, "pid": os.getpid(), "files": files}) + "\n")
+
+    def take(name: str) -> bool:
+        try:
+            os.remove(os.path.join(folder, f"{name}-{shard_ids[0]}"))
+            return True
+        except FileNotFoundError:
+            return False
+
+    crash, hang = take("crash"), take("hang")
+    report = {"pid": os.getpid(), "shards": shard_ids, "guilds": len(shard_ids), "sessions": 0, "latency": 0.0}
+    health.put({**report, "time": time.time()})
+    if crash:
+        sys.exit(1)
+    while True:
+        time.sleep(0.1)
+        if not hang:
+            health.put({**report, "time": time.time()})
@@ -0,0 +1,185 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import importlib
+import threading
+import multiprocessing
+
+from classes import AudioCache
+from enums import TaskPriority
+
+song_module = importlib.import_module("classes.Song")
+
+PROCESSES = 4
+
+def test_waiting_for_the_write_lock_does_not_block_the_loop(tmp_path):
+    cache = AudioCache(str(tmp_path))
+    path = tmp_path / "a.webm"
+    path.write_bytes(b"x" * 100)
+
+    async def main():
+        await cache.add("a", str(path), {"title": "A"})
+        cache.release("a")
+
+        # Một "tiến trình khác" giữ khóa ghi của index trong 0.5s
+        locked = threading.Event()
+
+        def hold_lock():
+            db = sqlite3.connect(cache.index_path, isolation_level=None)
+            db.execute("BEGIN IMMEDIATE")
+            locked.set()
+            time.sleep(0.5)
+            db.execute("COMMIT")
+            db.close()
+
+        threading.Thread(target=hold_lock).start()
+        locked.wait()
+
+        lag = 0.0
+
+        async def ticker():
+            nonlocal lag
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lag = max(lag, time.perf_counter() - started - 0.01)
+
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        entry = await cache.acquire("a")
+        waited = time.perf_counter() - started
+        task.cancel()
+        return entry, waited, lag
+
+    entry, waited, lag = asyncio.run(main())
+    assert entry and entry.path == str(path)
+    assert waited >= 0.4
+    assert lag < 0.05
+
+def test_misses_do_not_wait_for_the_write_lock(tmp_path):
+    cache = AudioCache(str(tmp_path))
+
+    async def main():
+        await cache.stats()
+        db = sqlite3.connect(cache.index_path, isolation_level=None)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.perf_counter()
+            entry = await cache.acquire("missing")
+            return entry, time.perf_counter() - started
+        finally:
+            db.execute("COMMIT")
+            db.close()
+
+    entry, waited = asyncio.run(main())
+    assert entry is None
+    assert waited < 0.1
+
+def _churn_worker(directory: str, seed: int, errors):
+    """Thêm/lấy/bỏ ngẫu nhiên các file với giới hạn dung lượng nhỏ để liên tục phải xóa bớt."""
+    async def main():
+        cache = AudioCache(directory, max_size=10 * 1000)
+        rng = random.Random(seed)
+        held = []
+        for _ in range(300):
+            key = f"k{rng.randrange(40)}"
+            entry = await cache.acquire(key)
+            if not entry and await cache.claim_download(key):
+                try:
+                    path = os.path.join(directory, f"{key}.{os.getpid()}.webm")
+                    with open(path, "wb") as f:
+                        f.write(b"x" * 1000)
+                    entry = await cache.add(key, path, {"title": key})
+                finally:
+                    cache.finish_download(key)
+
+            if entry:
+                held.append(entry)
+            # File đang được giữ không bao giờ bị tiến trình khác xóa
+            for item in held:
+                if not os.path.exists(item.path):
+                    errors.put(f"{item.key}: {item.path} bị xóa khi đang dùng")
+            if len(held) > 3 or (held and rng.random() < 0.5):
+                cache.release(held.pop(rng.randrange(len(held))).key)
+
+        for item in held:
+            cache.release(item.key)
+        await cache._run(lambda: None)
+
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        errors.put(repr(e))
+
+def test_processes_share_index_under_churn(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    errors = context.Queue()
+    processes = [
+        context.Process(target=_churn_worker, args=(str(tmp_path), seed, errors))
+        for seed in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+
+    problems = []
+    while not errors.empty():
+        problems.append(errors.get())
+    assert not problems
+    assert all(process.exitcode == 0 for process in processes)
+
+    db = sqlite3.connect(os.path.join(tmp_path, "index.db"))
+    rows = db.execute("SELECT path, size FROM entries").fetchall()
+    assert all(os.path.exists(path) for path, _ in rows)
+    assert sum(size for _, size in rows) <= 10 * 1000
+    assert db.execute("SELECT COUNT(*) FROM leases").fetchone()[0] == 0
+    assert db.execute("SELECT COUNT(*) FROM downloads").fetchone()[0] == 0
+
+def _shared_download_worker(directory: str, start_at: float, results):
+    """Yêu cầu cùng một bài qua Song._fetch_shared; lượt tải giả mất 0.5s."""
+    cache = song_module.audio_cache = AudioCache(directory)
+
+    async def fake_fetch(url, guild_id, priority, progress=None, bitrate=None, info=None):
+        with open(os.path.join(directory, "downloads.log"), "a") as f:
+            f.write(f"{os.getpid()}\n")
+        await asyncio.sleep(0.5)
+        path = os.path.join(directory, "Youtube-abc.webm")
+        with open(path, "wb") as f:
+            f.write(b"x" * 1000)
+        result = song_module.FetchResult({"title": "ABC"}, filepath=path)
+        if await cache.add("Youtube-abc", path, {"title": "ABC"}):
+            result.cache_key = "Youtube-abc"
+        return result
+
+    song_module.Song._fetch = staticmethod(fake_fetch)
+
+    async def main():
+        time.sleep(max(0, start_at - time.time()))
+        result = await song_module.Song._fetch_shared(
+            "Youtube-abc", "https://www.youtube.com/watch?v=abc", None, TaskPriority.DOWNLOAD
+        )
+        return result.filepath, result.cache_key
+
+    results.put(asyncio.run(main()))
+
+def test_concurrent_processes_download_a_song_once(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Các tiến trình cùng bắt đầu sau khi đã khởi động xong
+    start_at = time.time() + 3
+    processes = [
+        context.Process(target=_shared_download_worker, args=(str(tmp_path), start_at, results))
+        for _ in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+
+    assert all(process.exitcode == 0 for process in processes)
+    outcomes = [results.get(timeout=1) for _ in processes]
+    assert outcomes == [(str(tmp_path / "Youtube-abc.webm"), "Youtube-abc")] * PROCESSES
+    assert len((tmp_path / "downloads.log").read_text().split()) == 1
@@ -0,0 +1,86 @@
+import time
+import types
+import asyncio
+
+import discord
+from discord import app_commands
+
+from classes import CommandSync
+
+GUILDS = 50
+# Độ trễ giả lập của một request đồng bộ lệnh tới Discord (giây)
+LATENCY = 0.05
+
+class FakeHTTP:
+    """Thay cho client.http: đếm số request đồng bộ lệnh và giả lập độ trễ, giới hạn tốc độ."""
+
+    def __init__(self, rate_limit_once: set[int] = frozenset()):
+        self.calls: list[int | None] = []
+        self.rate_limit_once = set(rate_limit_once)
+
+    async def bulk_upsert_global_commands(self, application_id, payload):
+        self.calls.append(None)
+        await asyncio.sleep(LATENCY)
+        return []
+
+    async def bulk_upsert_guild_commands(self, application_id, guild_id, payload):
+        self.calls.append(guild_id)
+        await asyncio.sleep(LATENCY)
+        if guild_id in self.rate_limit_once:
+            self.rate_limit_once.discard(guild_id)
+            raise discord.RateLimited(LATENCY)
+        return []
+
+def make_tree(http: FakeHTTP, special_guild: int, description: str = "Phát nhạc") -> app_commands.CommandTree:
+    client = discord.Client(intents=discord.Intents.none())
+    client._connection.application_id = 1
+    tree = app_commands.CommandTree(client)
+    tree._http = http
+
+    @tree.command(name="play", description=description)
+    async def play(interaction: discord.Interaction):
+        pass
+
+    @tree.command(name="admin", description="Lệnh riêng", guild=discord.Object(special_guild))
+    async def admin(interaction: discord.Interaction):
+        pass
+
+    return tree
+
+def test_restart_with_unchanged_commands_makes_no_requests(tmp_path):
+    path = str(tmp_path / "command_sync.json")
+    guilds = [types.SimpleNamespace(id=i, name=f"Guild {i}") for i in range(1, GUILDS + 1)]
+
+    async def startup(http: FakeHTTP, description: str = "Phát nhạc") -> float:
+        sync = CommandSync(make_tree(http, special_guild=1, description=description), path=path)
+        started = time.perf_counter()
+        await sync.sync_all(guilds)
+        return time.perf_counter() - started
+
+    async def sequential(http: FakeHTTP) -> float:
+        # Trước: đồng bộ lần lượt từng server mỗi lần khởi động
+        tree = make_tree(http, special_guild=1)
+        started = time.perf_counter()
+        for guild in guilds:
+            await tree.sync(guild=guild)
+        return time.perf_counter() - started
+
+    before_http, first_http, restart_http, changed_http = FakeHTTP(), FakeHTTP({1}), FakeHTTP(), FakeHTTP()
+    before = asyncio.run(sequential(before_http))
+    first = asyncio.run(startup(first_http))
+    restart = asyncio.run(startup(restart_http))
+    changed = asyncio.run(startup(changed_http, description="Phát một bài hát"))
+
+    print(
+        f"\nĐồng bộ lệnh ({GUILDS} server, {LATENCY * 1000:.0f}ms/request): "
+        f"trước {len(before_http.calls)} request {before:.2f}s • "
+        f"lần đầu {len(first_http.calls)} request {first:.2f}s • "
+        f"khởi động lại {len(restart_http.calls)} request {restart * 1000:.1f}ms • "
+        f"đổi lệnh toàn cục {len(changed_http.calls)} request {changed:.2f}s"
+    )
+    assert len(before_http.calls) == GUILDS
+    # Lệnh toàn cục và server có lệnh riêng (thử lại một lần khi bị giới hạn)
+    assert sorted(first_http.calls, key=str) == [1, 1, None]
+    assert restart_http.calls == []
+    assert changed_http.calls == [None]
+    assert restart < LATENCY
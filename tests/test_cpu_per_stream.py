@@ -0,0 +1,77 @@
+import time
+import types
+import resource
+
+import discord
+
+from classes import GuildState, OggOpusSource
+from classes.Song import Song
+from stubs import make_audio, requires_ffmpeg
+
+SECONDS = 120
+
+def cpu_seconds() -> float:
+    """CPU đã dùng của tiến trình này và các tiến trình con (FFmpeg) đã kết thúc."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+def drain(source: discord.AudioSource, encoder=None) -> float:
+    """Đọc hết nguồn nhanh nhất có thể, trả về CPU dùng cho mỗi phút âm thanh (ms)."""
+    started = cpu_seconds()
+    frames = 0
+    try:
+        while frame := source.read():
+            frames += 1
+            # Nguồn PCM còn phải mã hóa Opus trước khi gửi, như VoiceClient làm
+            if encoder and not source.is_opus():
+                encoder.encode(frame, encoder.SAMPLES_PER_FRAME)
+    finally:
+        source.cleanup()
+
+    assert frames >= SECONDS * 50 * 0.95
+    return (cpu_seconds() - started) * 1000 / (SECONDS / 60)
+
+@requires_ffmpeg
+def test_opus_passthrough_uses_less_cpu_than_pcm(tmp_path):
+    webm = tmp_path / "song.webm"
+    webm.write_bytes(make_audio(SECONDS))
+    ogg = tmp_path / "song.opus"
+    ogg.write_bytes(make_audio(SECONDS, fmt="ogg"))
+
+    encoder = discord.opus.Encoder() if discord.opus.is_loaded() else None
+
+    def source_for(path, volume: float) -> discord.AudioSource:
+        song = Song({"title": "cpu", "duration": SECONDS, "acodec": "opus"}, types.SimpleNamespace(guild=None))
+        song.filepath = str(path)
+        return GuildState.create_source(types.SimpleNamespace(volume=volume), song)
+
+    pcm = source_for(webm, 0.5)
+    assert isinstance(pcm, discord.PCMVolumeTransformer)
+    copy = source_for(webm, 1.0)
+    assert isinstance(copy, discord.FFmpegOpusAudio)
+    mmap = source_for(ogg, 1.0)
+    assert isinstance(mmap, OggOpusSource)
+
+    results = {
+        "PCM + âm lượng" + (" + mã hóa Opus" if encoder else ""): drain(pcm, encoder),
+        "FFmpeg -c:a copy": drain(copy),
+        "OggOpusSource": drain(mmap),
+    }
+    print("\nCPU/phút âm thanh: " + " • ".join(f"{name} {ms:.0f}ms" for name, ms in results.items()))
+
+    pcm_cpu, copy_cpu, mmap_cpu = results.values()
+    assert copy_cpu < pcm_cpu
+    assert mmap_cpu < pcm_cpu
+
+@requires_ffmpeg
+def test_new_servers_start_on_the_passthrough_path(tmp_path):
+    ogg = tmp_path / "song.opus"
+    ogg.write_bytes(make_audio(1, fmt="ogg"))
+    song = Song({"title": "cpu", "duration": 1, "acodec": "opus"}, types.SimpleNamespace(guild=None))
+    song.filepath = str(ogg)
+
+    state = GuildState(types.SimpleNamespace(), 1)
+    source = state.create_source(song)
+    source.cleanup()
+    assert state.volume == 1.0
+    assert isinstance(source, OggOpusSource)
@@ -0,0 +1,92 @@
+import time
+import asyncio
+import importlib
+import types
+
+import pytest
+
+from classes import AudioCache
+from classes.Song import Song, YTDL_DOWNLOAD_OPTIONS
+from stubs import StubIE, LocalServer, stub_ytdl
+
+# `classes` xuất lại các lớp trùng tên module, nên lấy module qua importlib
+song_module = importlib.import_module("classes.Song")
+pool_module = importlib.import_module("classes.YTDLPool")
+
+ENQUEUES = 5
+
+@pytest.fixture
+def stub_env(tmp_path, monkeypatch):
+    files = {}
+    for i in range(ENQUEUES * 2):
+        files[f"/v{i}.webm"] = b"W" * 4096
+        files[f"/v{i}.m4a"] = b"M" * 8192
+
+    # Không chạy hậu xử lý FFmpeg, chỉ đo phần trích xuất/tải về
+    options = {
+        **YTDL_DOWNLOAD_OPTIONS,
+        "outtmpl": str(tmp_path / "%(extractor_key)s-%(id)s.%(ext)s"),
+        "postprocessors": [],
+        "quiet": True,
+        "noprogress": True,
+    }
+    monkeypatch.setattr(pool_module, "_get_ytdl", stub_ytdl)
+    monkeypatch.setattr(song_module, "download_options", lambda bitrate=None: options)
+    monkeypatch.setattr(song_module, "audio_cache", AudioCache(str(tmp_path)))
+
+    with LocalServer(files) as server:
+        StubIE.reset(server.url, cost=0.05)
+        yield options
+
+def test_enqueue_extracts_once(stub_env):
+    requester = types.SimpleNamespace(guild=None)
+
+    # Trước: trích xuất rồi gọi lại extract_info(download=True), extractor chạy hai lần
+    started = time.perf_counter()
+    for i in range(ENQUEUES):
+        ytdl = stub_ytdl(stub_env)
+        ytdl.extract_info(f"https://stub.test/watch/v{ENQUEUES + i}", download=False)
+        ytdl.extract_info(f"https://stub.test/watch/v{ENQUEUES + i}", download=True)
+    before = (time.perf_counter() - started) / ENQUEUES
+    before_calls = StubIE.calls / ENQUEUES
+
+    # Sau: tải về từ info đã trích xuất (khởi tạo một lần danh sách extractor, index cache trước khi đo)
+    song_module.audio_cache.key_from_url("https://stub.test/watch/warmup")
+    asyncio.run(song_module.audio_cache.stats())
+    StubIE.calls = 0
+
+    async def enqueue_all():
+        songs = []
+        for i in range(ENQUEUES):
+            songs.append(await Song.from_url_and_download(f"https://stub.test/watch/v{i}", requester))
+        return songs
+
+    started = time.perf_counter()
+    songs = asyncio.run(enqueue_all())
+    after = (time.perf_counter() - started) / ENQUEUES
+
+    print(
+        f"\nextractor/enqueue: trước {before_calls:.0f}, sau {StubIE.calls / ENQUEUES:.0f} • "
+        f"thời gian/enqueue: trước {before * 1000:.0f}ms, sau {after * 1000:.0f}ms"
+    )
+    assert before_calls == 2
+    assert StubIE.calls == ENQUEUES
+    assert all(song and song.filepath and song.filepath.endswith(".webm") for song in songs)
+
+def test_lazy_enqueue_extracts_once(stub_env):
+    requester = types.SimpleNamespace(guild=None)
+    song_module.audio_cache.key_from_url("https://stub.test/watch/warmup")
+    StubIE.calls = 0
+
+    async def enqueue_then_resolve():
+        # Xếp hàng khi đang có bài phát (chỉ lấy thông tin), tải về khi tới lượt
+        songs = [await Song.from_url_lazy(f"https://stub.test/watch/v{i}", requester) for i in range(ENQUEUES)]
+        assert all(song and not song.resolved for song in songs)
+        assert StubIE.calls == ENQUEUES
+        assert all([await song.resolve() for song in songs])
+        return songs
+
+    songs = asyncio.run(enqueue_then_resolve())
+    assert StubIE.calls == ENQUEUES
+    assert all(song.filepath and song.filepath.endswith(".webm") and song.extracted is None for song in songs)
+    assert songs[0].title == "Stub v0"
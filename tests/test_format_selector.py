@@ -0,0 +1,55 @@
+import os
+import json
+
+import pytest
+import yt_dlp
+
+from classes.Song import FORMAT_BITRATE_TIERS, format_selector
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+SITES = ("youtube", "soundcloud", "bandcamp")
+# Bộ chọn định dạng trước khi chọn theo bitrate kênh thoại
+OLD_SELECTOR = "bestaudio[ext=m4a]/bestaudio/best"
+
+def load(site: str) -> dict:
+    """Danh sách formats mẫu theo dạng `yt-dlp -J` của một bài dài 4 phút."""
+    with open(os.path.join(DATA, f"formats_{site}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def select(selector: str, info: dict) -> dict:
+    ytdl = yt_dlp.YoutubeDL({"format": selector, "quiet": True, "no_warnings": True}, auto_init=False)
+    return ytdl.process_ie_result(info, download=False)
+
+@pytest.mark.parametrize("site", SITES)
+def test_every_tier_picks_an_audio_format(site):
+    for tier in FORMAT_BITRATE_TIERS:
+        chosen = select(format_selector(tier), load(site))
+        assert chosen["vcodec"] == "none"
+
+def test_youtube_prefers_smallest_opus_that_meets_the_channel():
+    picks = {tier: select(format_selector(tier), load("youtube"))["format_id"] for tier in FORMAT_BITRATE_TIERS}
+    # 64 kbps: 250 (~68 kbps) thay vì 249 (~53 kbps, thấp hơn kênh); kênh cao hơn Opus tốt nhất thì lấy 251
+    assert picks == {64: "250", 96: "251", 128: "251", 256: "251", 384: "251"}
+
+def test_falls_back_to_other_codecs():
+    assert select(format_selector(64), load("soundcloud"))["format_id"] == "hls_opus_64"
+    # Không có Opus đạt 256 kbps: vẫn lấy Opus tốt nhất để phát thẳng
+    assert select(format_selector(256), load("soundcloud"))["format_id"] == "hls_opus_64"
+    assert select(format_selector(64), load("bandcamp"))["format_id"] == "mp3-128"
+
+def test_byte_report_against_old_selector():
+    lines = []
+    for site in SITES:
+        old = select(OLD_SELECTOR, load(site))
+        for tier in FORMAT_BITRATE_TIERS:
+            new = select(format_selector(tier), load(site))
+            lines.append(
+                f"{site:<10} {tier:>3} kbps: trước {old['format_id']:<12} {old['filesize'] / 1e6:5.2f} MB "
+                f"({old['acodec']}) • sau {new['format_id']:<12} {new['filesize'] / 1e6:5.2f} MB ({new['acodec']})"
+            )
+
+        # Kênh mặc định 64 kbps: tải ít hơn và phát thẳng được (Opus)
+        default = select(format_selector(64), load(site))
+        assert default["filesize"] <= old["filesize"]
+
+    print("\nDung lượng tải cho một bài 4 phút:\n" + "\n".join(lines))
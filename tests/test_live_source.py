@@ -0,0 +1,112 @@
+import time
+import types
+import importlib
+
+import discord
+
+from classes import GuildState, LiveSource
+from classes.Song import Song, LIVE_FFMPEG_OPTIONS, OPEN_ENDED_FFMPEG_OPTIONS
+from stubs import LocalServer, make_audio, requires_ffmpeg
+
+live_module = importlib.import_module("classes.LiveSource")
+
+FRAME = b"\x01" * discord.opus.Encoder.FRAME_SIZE
+
+class FakeSource(discord.AudioSource):
+    def __init__(self, frames: int, error: bool = False):
+        self.frames = frames
+        self.error = error
+
+    def read(self) -> bytes:
+        if self.frames:
+            self.frames -= 1
+            return FRAME
+        if self.error:
+            raise OSError("kết nối bị ngắt")
+        return b""
+
+def drain(source: discord.AudioSource, timeout: float) -> tuple[int, bool]:
+    """Đọc như trình phát (không giới hạn tốc độ) tới khi hết bài hoặc hết thời gian."""
+    frames = 0
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = source.read()
+        if not data:
+            return frames, True
+        if any(data):
+            frames += 1
+        else:
+            time.sleep(0.02)
+    return frames, False
+
+def test_clean_end_finishes_the_song():
+    opened = []
+
+    def open_source():
+        opened.append(1)
+        return FakeSource(100)
+
+    source = LiveSource(open_source)
+    try:
+        assert drain(source, 5) == (100, True)
+    finally:
+        source.cleanup()
+    assert len(opened) == 1
+
+def test_errors_and_live_eof_reconnect(monkeypatch):
+    monkeypatch.setattr(live_module, "LIVE_MAX_RECONNECTS", 2)
+    for kwargs, make in (({}, lambda: FakeSource(100, error=True)), ({"reconnect_on_eof": True}, lambda: FakeSource(100))):
+        opened = []
+
+        def open_source():
+            opened.append(1)
+            return make()
+
+        source = LiveSource(open_source, **kwargs)
+        try:
+            frames, finished = drain(source, 2.5)
+        finally:
+            source.cleanup()
+        assert frames >= 200 and not finished
+        assert len(opened) >= 2
+
+def live_source_for(url: str, data: dict) -> discord.AudioSource:
+    """Nguồn mà GuildState dựng cho một bài phát như luồng trực tiếp."""
+    song = Song({"title": "Radio", "url": url, **data}, types.SimpleNamespace(guild=None))
+    song.is_live = True
+    song.stream_url = url
+    state = types.SimpleNamespace(volume=1.0, _refresh_live=lambda song: True)
+    return song, GuildState.create_source(state, song)
+
+@requires_ffmpeg
+def test_direct_link_ends_when_server_closes_connection():
+    body = make_audio(2, fmt="ogg")
+    # Không có Content-Length: máy chủ đóng kết nối là hết bài
+    with LocalServer({"/radio.ogg": body}, drop_after=len(body)) as server:
+        song, source = live_source_for(f"{server.url}/radio.ogg", {})
+        try:
+            frames, finished = drain(source, 10)
+        finally:
+            source.cleanup()
+
+    assert not song.is_endless()
+    assert OPEN_ENDED_FFMPEG_OPTIONS in song.get_playback_options()["before_options"]
+    assert finished and abs(frames - 100) <= 2
+    # FFmpeg chỉ hỏi lại phần còn thiếu (nhận 416) chứ không phát lại từ đầu
+    assert server.requests <= 3
+
+@requires_ffmpeg
+def test_live_stream_keeps_playing_through_dropped_connections():
+    body = make_audio(6, fmt="ogg")
+    # Mỗi kết nối bị cắt sau khoảng 1 giây âm thanh
+    with LocalServer({"/live.ogg": body}, drop_after=len(body) // 6) as server:
+        song, source = live_source_for(f"{server.url}/live.ogg", {"is_live": True, "live_status": "is_live"})
+        try:
+            frames, finished = drain(source, 6)
+        finally:
+            source.cleanup()
+
+    assert song.is_endless()
+    assert LIVE_FFMPEG_OPTIONS in song.get_playback_options()["before_options"]
+    assert not finished and frames > 300
+    assert server.requests >= 2
@@ -0,0 +1,67 @@
+import pytest
+
+from classes import OggOpusSource
+from classes.OggOpusSource import OPUS_SAMPLE_RATE, packet_samples
+from stubs import make_audio, requires_ffmpeg
+
+SECONDS = 20
+
+@pytest.fixture(scope="module")
+def ogg_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("ogg") / "song.opus"
+    path.write_bytes(make_audio(SECONDS, fmt="ogg"))
+    return str(path)
+
+def played_samples(source: OggOpusSource) -> int:
+    samples = 0
+    try:
+        while packet := source.read():
+            samples += packet_samples(packet)
+    finally:
+        source.cleanup()
+    return samples
+
+def test_packet_samples_reads_toc():
+    # CELT fullband 20ms, một khung
+    assert packet_samples(bytes([31 << 3])) == 960
+    # SILK 10ms, hai khung cùng kích thước
+    assert packet_samples(bytes([(0 << 3) | 1])) == 960
+    # Hybrid 20ms, mã 3 với 3 khung
+    assert packet_samples(bytes([(13 << 3) | 3, 3])) == 2880
+    assert packet_samples(b"") == 0
+
+@requires_ffmpeg
+def test_supports_only_ogg_files(ogg_file, tmp_path):
+    assert OggOpusSource.supports(ogg_file)
+    webm = tmp_path / "song.webm"
+    webm.write_bytes(make_audio(1))
+    assert not OggOpusSource.supports(str(webm))
+    fake = tmp_path / "fake.opus"
+    fake.write_bytes(b"not ogg")
+    assert not OggOpusSource.supports(str(fake))
+    assert not OggOpusSource.supports(None)
+
+@requires_ffmpeg
+def test_plays_whole_file_from_start(ogg_file):
+    source = OggOpusSource(ogg_file)
+    assert source.is_opus()
+    total = played_samples(source)
+    assert abs(total - source.pre_skip - SECONDS * OPUS_SAMPLE_RATE) < 960
+
+@pytest.mark.parametrize("seconds", [0.5, 7.3, 12, 19.5])
+@requires_ffmpeg
+def test_seek_starts_within_one_packet(ogg_file, seconds):
+    total = played_samples(OggOpusSource(ogg_file))
+    remaining = played_samples(OggOpusSource(ogg_file, seconds))
+    # Phần bị bỏ qua khớp vị trí tua với sai số nhỏ hơn một gói 20ms
+    assert abs((total - remaining) - seconds * OPUS_SAMPLE_RATE) <= 960
+
+@requires_ffmpeg
+def test_seek_past_end_plays_nothing(ogg_file):
+    assert played_samples(OggOpusSource(ogg_file, SECONDS + 5)) == 0
+
+@requires_ffmpeg
+def test_cleanup_twice_is_safe(ogg_file):
+    source = OggOpusSource(ogg_file)
+    source.cleanup()
+    source.cleanup()
@@ -0,0 +1,113 @@
+import time
+import random
+import asyncio
+
+import pytest
+
+from classes import PlaybackQueue
+
+def test_matches_list_under_random_operations():
+    rng = random.Random(1)
+    queue = PlaybackQueue(range(1000))
+    model = list(range(1000))
+    next_item = 1000
+
+    for _ in range(5000):
+        op = rng.random()
+        if op < 0.3:
+            index = rng.randrange(-len(model) - 5, len(model) + 5)
+            queue.insert(index, next_item)
+            # insert() kẹp vị trí âm về 0 như list.insert
+            model.insert(index, next_item)
+            next_item += 1
+        elif op < 0.6 and model:
+            index = rng.randrange(-len(model), len(model))
+            assert queue.pop(index) == model.pop(index)
+        elif op < 0.8 and model:
+            source, destination = rng.randrange(len(model)), rng.randrange(len(model))
+            queue.move(source, destination)
+            model.insert(destination, model.pop(source))
+        else:
+            queue.append(next_item)
+            model.append(next_item)
+            next_item += 1
+
+        assert len(queue) == len(model)
+
+    assert list(queue) == model
+    assert [queue[i] for i in range(-3, 3)] == model[-3:] + model[:3]
+    assert queue.head(5) == model[:5]
+    assert queue.peek() == model[0]
+
+def test_out_of_range_index_raises():
+    queue = PlaybackQueue([1, 2, 3])
+    with pytest.raises(IndexError):
+        queue[3]
+    with pytest.raises(IndexError):
+        queue.pop(-4)
+    with pytest.raises(IndexError):
+        PlaybackQueue().pop()
+
+def test_shuffle_and_clear_keep_items():
+    queue = PlaybackQueue(range(1000))
+    queue.shuffle()
+    assert sorted(queue) == list(range(1000))
+    assert queue.clear() and queue.empty()
+    assert queue.peek() is None
+
+def test_get_waits_for_an_item():
+    async def main():
+        queue = PlaybackQueue()
+        waiter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        queue.append("song")
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(main()) == "song"
+
+def best_of(func, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def test_benchmark_against_rebuilt_asyncio_queue():
+    size = 10_000
+
+    # Trước: sao chép asyncio.Queue._queue ra list, sửa rồi đưa lại từng bài
+    def rebuild(queue: asyncio.Queue, edit):
+        items = list(queue._queue)
+        edit(items)
+        while not queue.empty():
+            queue.get_nowait()
+        for item in items:
+            queue.put_nowait(item)
+
+    old = asyncio.Queue()
+    for i in range(size):
+        old.put_nowait(i)
+    new = PlaybackQueue(range(size))
+
+    results = {
+        "remove": (
+            best_of(lambda: (rebuild(old, lambda items: items.pop(size // 2)), old.put_nowait(0))),
+            best_of(lambda: (new.pop(size // 2), new.append(0))),
+        ),
+        "move": (
+            best_of(lambda: rebuild(old, lambda items: items.insert(0, items.pop(size - 1)))),
+            best_of(lambda: new.move(size - 1, 0)),
+        ),
+        "shuffle": (
+            best_of(lambda: rebuild(old, random.shuffle)),
+            best_of(new.shuffle),
+        ),
+    }
+    print(f"\nHàng đợi {size} bài: " + " • ".join(
+        f"{name} trước {before * 1e6:.0f}µs, sau {after * 1e6:.0f}µs" for name, (before, after) in results.items()
+    ))
+    assert len(new) == size
+    assert results["remove"][1] * 10 < results["remove"][0]
+    assert results["move"][1] * 10 < results["move"][0]
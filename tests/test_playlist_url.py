@@ -0,0 +1,16 @@
+import pytest
+
+from classes.Song import Song
+
+@pytest.mark.parametrize("url, playlist", [
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=RDdQw4w9WgXcQ&start_radio=1", False),
+    ("https://youtu.be/dQw4w9WgXcQ?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs", False),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", False),
+    ("https://www.youtube.com/playlist?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs", True),
+    ("https://music.youtube.com/watch?list=OLAK5uy_k", True),
+    ("https://soundcloud.com/artist/sets/album-name", True),
+    ("https://artist.bandcamp.com/album/name", True),
+    ("https://artist.bandcamp.com/track/name", False),
+])
+def test_is_playlist_url(url, playlist):
+    assert Song.is_playlist_url(url) is playlist
@@ -0,0 +1,66 @@
+import gc
+import json
+import types
+import tracemalloc
+
+from classes import PlaybackQueue
+from classes.Song import Song
+
+QUEUE_SIZE = 5000
+
+# Info dict có kích thước gần giống kết quả yt-dlp cho một video YouTube
+INFO_TEMPLATE = json.dumps({
+    "id": "dQw4w9WgXcQ",
+    "title": "Song title",
+    "fulltitle": "Song title",
+    "webpage_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "extractor_key": "Youtube",
+    "duration": 212,
+    "uploader": "Uploader",
+    "channel": "Channel",
+    "thumbnail": "https://i.ytimg.com/vi/dQw4w9WgXcQ/maxresdefault.jpg",
+    "acodec": "opus",
+    "description": "d" * 1500,
+    "tags": [f"tag {i}" for i in range(20)],
+    "thumbnails": [{"url": f"https://i.ytimg.com/vi/dQw4w9WgXcQ/{i}.jpg", "id": str(i), "preference": -i} for i in range(40)],
+    "http_headers": {"User-Agent": "Mozilla/5.0 " + "x" * 100, "Accept": "*/*", "Accept-Language": "en-us"},
+    "formats": [
+        {
+            "format_id": str(i), "url": "https://rr1---sn.googlevideo.com/videoplayback?" + "q" * 900,
+            "ext": "webm", "acodec": "opus", "vcodec": "none", "abr": 128, "filesize": 3_000_000,
+            "http_headers": {"User-Agent": "Mozilla/5.0 " + "x" * 100}, "protocol": "https",
+            "format_note": "medium", "container": "webm_dash", "downloader_options": {"http_chunk_size": 10485760},
+        }
+        for i in range(25)
+    ],
+    "automatic_captions": {f"lang{i}": [{"ext": "vtt", "url": "https://www.youtube.com/api/timedtext?" + "c" * 300}] for i in range(30)},
+})
+
+def retained_bytes(build) -> int:
+    """Bộ nhớ còn được giữ sau khi dựng hàng đợi."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        queue = build()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(queue) == QUEUE_SIZE
+    return size
+
+def test_queued_song_keeps_only_used_fields():
+    requester = types.SimpleNamespace(guild=None)
+
+    # Trước: mỗi bài giữ nguyên info dict của yt-dlp
+    def raw_queue():
+        return PlaybackQueue(json.loads(INFO_TEMPLATE) for _ in range(QUEUE_SIZE))
+
+    # Sau: Song chỉ giữ các trường được dùng, info dict bị bỏ đi
+    def song_queue():
+        return PlaybackQueue(Song(json.loads(INFO_TEMPLATE), requester) for _ in range(QUEUE_SIZE))
+
+    before = retained_bytes(raw_queue) / QUEUE_SIZE
+    after = retained_bytes(song_queue) / QUEUE_SIZE
+    print(f"\nbyte/bài trong hàng đợi ({QUEUE_SIZE} bài): trước {before:,.0f} • sau {after:,.0f}")
+    assert after * 20 < before
@@ -0,0 +1,81 @@
+import asyncio
+import importlib
+import json
+import threading
+import types
+
+from classes import SearchCache, Song
+
+search_cache_module = importlib.import_module("classes.SearchCache")
+song_module = importlib.import_module("classes.Song")
+
+ENTRIES = [{"id": str(i), "title": f"Song {i}", "webpage_url": f"https://example.com/{i}", "duration": 60} for i in range(7)]
+
+def test_puts_are_batched_into_one_write_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_cache_module, "SEARCH_CACHE_SAVE_DELAY", 0.05)
+    path = tmp_path / "search.json"
+    cache = SearchCache(path=str(path))
+    writes = []
+    write = cache._write
+
+    def spy(entries):
+        writes.append(threading.current_thread() is threading.main_thread())
+        write(entries)
+
+    cache._write = spy
+
+    async def main():
+        await cache.load()
+        for i in range(20):
+            cache.put(f"query {i}", ENTRIES)
+        assert not path.exists()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+    assert writes == [False]
+    assert len(json.loads(path.read_text())) == 20
+
+def test_load_restores_unexpired_entries(tmp_path):
+    path = tmp_path / "search.json"
+    path.write_text(json.dumps({
+        "fresh": [9e12, [SearchCache.compact(ENTRIES[0])]],
+        "stale": [0, [SearchCache.compact(ENTRIES[1])]],
+    }))
+    cache = SearchCache(path=str(path))
+
+    async def main():
+        await asyncio.gather(cache.load(), cache.load())
+
+    asyncio.run(main())
+    assert cache.get("  FRESH ")[0]["title"] == "Song 0"
+    assert cache.get("stale") is None
+
+def test_coalesced_searches_store_results_once(monkeypatch):
+    cache = SearchCache(path="")
+    monkeypatch.setattr(song_module, "search_cache", cache)
+    extractions = 0
+    puts = 0
+    put = cache.put
+
+    async def fake_run(func, *args, **kwargs):
+        nonlocal extractions
+        extractions += 1
+        await asyncio.sleep(0.05)
+        return {"entries": ENTRIES}
+
+    def spy(query, entries):
+        nonlocal puts
+        puts += 1
+        return put(query, entries)
+
+    monkeypatch.setattr(song_module.ytdl_pool, "run", fake_run)
+    cache.put = spy
+    requester = types.SimpleNamespace(guild=None)
+
+    async def main():
+        return await asyncio.gather(*(Song.search_only("miku", requester) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert extractions == 1
+    assert puts == 1
+    assert all(len(r) == 7 for r in results)
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import threading
+import importlib
+
+from classes import ShardSupervisor
+from stubs import fake_gateway_worker
+
+supervisor_module = importlib.import_module("classes.ShardSupervisor")
+
+def identified(folder) -> list[dict]:
+    path = folder / "identify.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_workers_split_shards_use_own_files_and_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(supervisor_module, "HEALTH_INTERVAL", 0.25)
+    monkeypatch.setattr(supervisor_module, "WORKER_START_DELAY", 0.1)
+    monkeypatch.setattr(supervisor_module, "WORKER_MAX_BACKOFF", 1)
+    monkeypatch.setenv("FAKE_GATEWAY_DIR", str(tmp_path))
+    monkeypatch.setenv("SEARCH_CACHE_FILE", str(tmp_path / "search.json"))
+    monkeypatch.setenv("COMMAND_SYNC_FILE", "")
+    monkeypatch.delenv("QUEUE_JOURNAL_FILE", raising=False)
+
+    # Worker 1 (shard 2, 3) thoát lỗi, worker 2 (shard 4, 5) bị treo
+    (tmp_path / "crash-2").touch()
+    (tmp_path / "hang-4").touch()
+
+    supervisor = ShardSupervisor(fake_gateway_worker, workers=3, shard_count=6)
+    thread = threading.Thread(target=supervisor.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            counts = [sum(1 for line in identified(tmp_path) if line["shard"] == shard) for shard in range(6)]
+            if counts == [1, 1, 2, 2, 2, 2] and supervisor.restarts == 2:
+                break
+            time.sleep(0.1)
+        processes = list(supervisor.processes.values())
+    finally:
+        supervisor.stop()
+        thread.join(timeout=30)
+
+    assert counts == [1, 1, 2, 2, 2, 2]
+    assert supervisor.ranges == [[0, 1], [2, 3], [4, 5]]
+    assert not thread.is_alive()
+    assert not any(process.is_alive() for process in processes)
+
+    lines = identified(tmp_path)
+    assert {line["shard_count"] for line in lines} == {6}
+    for line in lines:
+        index = line["shard"] // 2
+        assert line["files"] == {
+            "QUEUE_JOURNAL_FILE": f"queues.jsonl.{index}",
+            "COMMAND_SYNC_FILE": "",
+            "SEARCH_CACHE_FILE": f"{tmp_path / 'search.json'}.{index}",
+        }
+
+    # Biến môi trường của tiến trình giám sát không bị thay đổi
+    assert os.environ["SEARCH_CACHE_FILE"] == str(tmp_path / "search.json")
+    assert "QUEUE_JOURNAL_FILE" not in os.environ
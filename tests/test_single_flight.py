@@ -0,0 +1,155 @@
+import time
+import types
+import asyncio
+import sqlite3
+import importlib
+
+import pytest
+
+from classes import AudioCache, SingleFlight, YTDLPool
+
+song_module = importlib.import_module("classes.Song")
+
+def test_concurrent_calls_share_one_task():
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do("key", factory) for _ in range(5))), flight
+
+    results, flight = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.coalesced == 4
+    assert not flight.flights
+
+def test_errors_reach_every_waiter():
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do("key", factory) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+def test_cancelled_flight_holds_key_until_executor_job_finishes(tmp_path):
+    """Người chờ cuối cùng bị hủy giữa lượt tải: lượt tải mới cùng khóa phải chờ luồng cũ ghi xong."""
+    path = tmp_path / "song.part"
+    events = []
+
+    def slow_download(name: str):
+        events.append(("start", name, time.monotonic()))
+        with open(path, "ab") as f:
+            for _ in range(5):
+                f.write(name.encode())
+                time.sleep(0.05)
+        events.append(("end", name, time.monotonic()))
+        return name
+
+    adopted = []
+
+    async def main():
+        pool = YTDLPool(workers=2)
+        flight = SingleFlight("download")
+
+        first = asyncio.create_task(flight.do(
+            "key", lambda: pool.run(slow_download, "a", abandoned=adopted.append)
+        ))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0)
+
+        second = await flight.do("key", lambda: pool.run(slow_download, "b"))
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return second
+
+    assert asyncio.run(main()) == "b"
+    (_, _, end_a), (_, _, start_b) = [e for e in events if e[:2] in (("end", "a"), ("start", "b"))]
+    assert start_b >= end_a
+    assert adopted == ["a"]
+    assert path.read_bytes() == b"a" * 5 + b"b" * 5
+
+def test_queued_job_is_dropped_on_cancel():
+    ran = []
+
+    def job(name: str):
+        time.sleep(0.1)
+        ran.append(name)
+
+    async def main():
+        pool = YTDLPool(workers=1)
+        busy = asyncio.create_task(pool.run(job, "busy"))
+        queued = asyncio.create_task(pool.run(job, "queued"))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        await busy
+        await asyncio.sleep(0.15)
+
+    asyncio.run(main())
+    assert ran == ["busy"]
+
+def cancel_waiter_on_completion(flight: SingleFlight, key: str, waiter: asyncio.Task):
+    """Hủy người chờ đúng lúc tác vụ xong: kết quả đã có nhưng người chờ nhận CancelledError."""
+    flight.flights[key].task.add_done_callback(lambda _: waiter.cancel())
+
+def test_result_nobody_received_goes_to_unclaimed():
+    unclaimed = []
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        waiter = asyncio.create_task(flight.do("key", factory, unclaimed=unclaimed.append))
+        await asyncio.sleep(0)
+        cancel_waiter_on_completion(flight, "key", waiter)
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # Có người nhận kết quả thì không gọi `unclaimed`
+        await flight.do("other", factory, unclaimed=unclaimed.append)
+
+    asyncio.run(main())
+    assert unclaimed == ["result"]
+
+def test_cancelled_download_waiters_release_the_cache_lease(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path))
+    monkeypatch.setattr(song_module, "audio_cache", cache)
+    path = tmp_path / "song.webm"
+    path.write_bytes(b"x" * 100)
+
+    async def fetch_shared(key, url, *args):
+        await asyncio.sleep(0.01)
+        result = song_module.FetchResult({"title": "Song"}, filepath=str(path))
+        if await cache.add("Stub-song", str(path), {"title": "Song"}):
+            result.cache_key = "Stub-song"
+        return result
+
+    monkeypatch.setattr(song_module.Song, "_fetch_shared", staticmethod(fetch_shared))
+
+    async def main():
+        requester = types.SimpleNamespace(guild=None)
+        waiter = asyncio.create_task(song_module.Song.from_url_and_download("https://stub.test/watch/song", requester))
+        while not song_module.download_flight.flights:
+            await asyncio.sleep(0.001)
+        (key,) = song_module.download_flight.flights
+        cancel_waiter_on_completion(song_module.download_flight, key, waiter)
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # Các thao tác cache chạy tuần tự trên một luồng, chờ release xong
+        await cache.stats()
+
+    asyncio.run(main())
+    assert "Stub-song" not in cache.entries
+    assert sqlite3.connect(cache.index_path).execute("SELECT COUNT(*) FROM leases").fetchone()[0] == 0
@@ -0,0 +1,83 @@
+import time
+import asyncio
+import importlib
+import types
+
+import discord
+import pytest
+
+from classes import AudioCache, StreamURLCache
+from classes.Song import Song, YTDL_DOWNLOAD_OPTIONS
+from stubs import StubIE, LocalServer, make_audio, requires_ffmpeg, stub_ytdl
+
+song_module = importlib.import_module("classes.Song")
+pool_module = importlib.import_module("classes.YTDLPool")
+
+# Giả lập đường truyền ~16 Mbit/s tới máy chủ âm thanh
+RATE = 2 * 1024 * 1024
+DURATIONS = {"short": 30, "long": 600}
+
+@pytest.fixture
+def stub_env(tmp_path, monkeypatch):
+    files = {}
+    durations = {}
+    for name, seconds in DURATIONS.items():
+        body = make_audio(seconds)
+        for mode in ("stream", "download"):
+            files[f"/{name}_{mode}.webm"] = body
+            files[f"/{name}_{mode}.m4a"] = body
+            durations[f"{name}_{mode}"] = seconds
+
+    options = {
+        **YTDL_DOWNLOAD_OPTIONS,
+        "outtmpl": str(tmp_path / "%(extractor_key)s-%(id)s.%(ext)s"),
+        "postprocessors": [],
+        "quiet": True,
+        "noprogress": True,
+    }
+    monkeypatch.setattr(pool_module, "_get_ytdl", stub_ytdl)
+    monkeypatch.setattr(song_module, "download_options", lambda bitrate=None: options)
+    monkeypatch.setattr(song_module, "audio_cache", AudioCache(str(tmp_path)))
+    monkeypatch.setattr(song_module, "stream_urls", StreamURLCache())
+
+    with LocalServer(files, rate=RATE) as server:
+        StubIE.reset(server.url, durations=durations)
+        yield monkeypatch
+
+def time_to_first_audio(video_id: str) -> float:
+    """Thời gian từ lúc thêm bài tới khi FFmpeg trả về khung âm thanh đầu tiên."""
+    requester = types.SimpleNamespace(guild=None)
+
+    async def enqueue_and_read():
+        started = time.perf_counter()
+        song = await Song.from_url_and_download(f"https://stub.test/watch/{video_id}", requester)
+        assert song is not None
+
+        source = discord.FFmpegPCMAudio(song.get_source(), **song.get_playback_options())
+        try:
+            frame = await asyncio.get_running_loop().run_in_executor(None, source.read)
+            assert frame
+            return time.perf_counter() - started
+        finally:
+            source.cleanup()
+
+    return asyncio.run(enqueue_and_read())
+
+@requires_ffmpeg
+def test_streaming_start_does_not_grow_with_track_length(stub_env):
+    # Khởi tạo danh sách extractor, index cache một lần trước khi đo
+    song_module.audio_cache.key_from_url("https://stub.test/watch/warmup")
+
+    results = {}
+    for mode, threshold in (("stream", 0), ("download", -1)):
+        stub_env.setattr(song_module, "STREAM_MIN_DURATION", threshold)
+        for name in DURATIONS:
+            results[name, mode] = time_to_first_audio(f"{name}_{mode}")
+
+    print("\nTTFA " + " • ".join(
+        f"{name} ({DURATIONS[name]}s) {mode}: {seconds * 1000:.0f}ms" for (name, mode), seconds in results.items()
+    ))
+    # Phát từ URL: bài 10 phút bắt đầu gần như nhanh bằng bài 30 giây
+    assert results["long", "stream"] - results["short", "stream"] < 0.5
+    # Tải hết rồi mới phát: thời gian chờ tăng theo độ dài bài
+    assert results["long", "stream"] < results["long", "download"]
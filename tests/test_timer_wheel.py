@@ -0,0 +1,91 @@
+import asyncio
+
+from classes import TimerWheel
+
+TICK = 0.01
+
+def test_timer_fires_after_delay():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        fired = asyncio.Event()
+        wheel.schedule("key", 0.05, fired.set)
+        await asyncio.wait_for(fired.wait(), 1)
+        return loop.time() - started, wheel
+
+    elapsed, wheel = asyncio.run(main())
+    assert 0.05 <= elapsed < 0.05 + 10 * TICK
+    assert "key" not in wheel and len(wheel) == 0
+
+def test_reschedule_replaces_and_cancel_removes():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        fired = []
+        wheel.schedule("a", 0.03, lambda: fired.append("a1"))
+        wheel.schedule("a", 0.06, lambda: fired.append("a2"))
+        wheel.schedule("b", 0.03, lambda: fired.append("b"))
+        assert wheel.cancel("b")
+        assert not wheel.cancel("b")
+        await asyncio.sleep(0.1)
+        return fired
+
+    assert asyncio.run(main()) == ["a2"]
+
+def test_delays_longer_than_one_turn_wait_extra_rounds():
+    async def main():
+        wheel = TimerWheel(tick=TICK, size=4)
+        loop = asyncio.get_running_loop()
+        fired = {}
+        started = loop.time()
+        for delay in (0.02, 0.05, 0.13):
+            wheel.schedule(delay, delay, lambda delay=delay: fired.setdefault(delay, loop.time() - started))
+        await asyncio.sleep(0.2)
+        return fired
+
+    fired = asyncio.run(main())
+    assert list(fired) == [0.02, 0.05, 0.13]
+    for delay, elapsed in fired.items():
+        assert delay <= elapsed < delay + 10 * TICK
+
+def test_async_callbacks_and_errors_do_not_stop_the_wheel():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        done = asyncio.Event()
+
+        async def later():
+            await asyncio.sleep(0)
+            done.set()
+
+        def broken():
+            raise RuntimeError("boom")
+
+        wheel.schedule("broken", 0.01, broken)
+        wheel.schedule("later", 0.03, later)
+        await asyncio.wait_for(done.wait(), 1)
+        await asyncio.sleep(0)
+        return wheel
+
+    wheel = asyncio.run(main())
+    assert not wheel.callbacks
+
+def test_many_timers_share_one_task():
+    async def main():
+        wheel = TimerWheel(tick=TICK)
+        fired = 0
+
+        def callback():
+            nonlocal fired
+            fired += 1
+
+        before = len(asyncio.all_tasks())
+        for guild_id in range(10_000):
+            wheel.schedule(("idle", guild_id), 0.02 + (guild_id % 5) * TICK, callback)
+        assert len(asyncio.all_tasks()) == before + 1
+
+        await asyncio.sleep(0.15)
+        return fired, wheel
+
+    fired, wheel = asyncio.run(main())
+    assert fired == 10_000
+    assert wheel.task.done()
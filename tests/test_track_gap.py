@@ -0,0 +1,169 @@
+import time
+import types
+import asyncio
+import threading
+
+import pytest
+
+from classes import GuildState
+from classes.Song import Song
+from enums import LoopMode
+from stubs import make_audio, requires_ffmpeg
+
+SONGS = 3
+SECONDS = 2
+
+class FakeVoiceClient:
+    """
+    Thay cho discord.VoiceClient: đọc nguồn phát theo nhịp 20ms trong một luồng riêng
+    như AudioPlayer, và ghi lại thời điểm bài trước hết dữ liệu / bài sau có khung đầu tiên.
+    """
+
+    def __init__(self):
+        self.channel = types.SimpleNamespace(id=1)
+        self.source = None
+        self.ended: list[float] = []
+        self.started: list[float] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def play(self, source, *, after=None, **kwargs):
+        self.source = source
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(source, self._stop, after), daemon=True)
+        self._thread.start()
+
+    def _run(self, source, stop: threading.Event, after):
+        first = True
+        next_frame = time.perf_counter()
+        while not stop.is_set():
+            data = source.read()
+            if not data:
+                self.ended.append(time.perf_counter())
+                break
+            if first:
+                self.started.append(time.perf_counter())
+                first = False
+            next_frame += 0.02
+            time.sleep(max(0, next_frame - time.perf_counter()))
+
+        source.cleanup()
+        if after:
+            after(None)
+
+    def is_playing(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def is_paused(self) -> bool:
+        return False
+
+    def is_connected(self) -> bool:
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    async def disconnect(self, force: bool = False):
+        self.stop()
+
+@pytest.fixture(scope="module")
+def ogg_files(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("gap")
+    body = make_audio(SECONDS, fmt="ogg")
+    paths = []
+    for i in range(SONGS):
+        path = folder / f"song{i}.opus"
+        path.write_bytes(body)
+        paths.append(str(path))
+    return paths
+
+def play_queue(paths: list[str], volume: float, prepare: bool, monkeypatch) -> list[float]:
+    """Phát hết hàng đợi qua player loop thật, trả về các khoảng lặng giữa hai bài."""
+    if not prepare:
+        async def no_prepare(self, playing):
+            return None
+        monkeypatch.setattr(GuildState, "_prepare_next", no_prepare)
+
+    async def main():
+        async def ready():
+            return None
+
+        bot = types.SimpleNamespace(
+            loop=asyncio.get_running_loop(), wait_until_ready=ready,
+            dispatch=lambda *args: None, get_guild=lambda guild_id: None,
+        )
+        requester = types.SimpleNamespace(guild=None, id=1, mention="@test")
+        state = GuildState(bot, 1)
+        state.voice_client = FakeVoiceClient()
+        state.volume = volume
+        for i, path in enumerate(paths):
+            song = Song({"title": f"Song {i}", "duration": SECONDS, "acodec": "opus"}, requester)
+            song.filepath = path
+            song.resolved = True
+            state.queue.append(song)
+
+        state.start_player_loop()
+        while not state.closed:
+            await asyncio.sleep(0.05)
+        return state.voice_client
+
+    voice_client = asyncio.run(main())
+    monkeypatch.undo()
+    assert len(voice_client.started) == len(paths)
+    return [start - end for end, start in zip(voice_client.ended, voice_client.started[1:])]
+
+@pytest.mark.parametrize("volume, path", [(1.0, "OggOpusSource"), (0.5, "FFmpeg PCM")])
+@requires_ffmpeg
+def test_gap_between_tracks_is_under_50ms(ogg_files, monkeypatch, volume, path):
+    before = play_queue(ogg_files, volume, prepare=False, monkeypatch=monkeypatch)
+    after = play_queue(ogg_files, volume, prepare=True, monkeypatch=monkeypatch)
+    print(
+        f"\nKhoảng lặng tối đa ({path}): không chuẩn bị trước {max(before) * 1000:.1f}ms • "
+        f"chuẩn bị trước {max(after) * 1000:.1f}ms"
+    )
+    assert max(after) < 0.05
+
+@requires_ffmpeg
+def test_looping_one_song_uses_every_prepared_source(ogg_files, monkeypatch):
+    takes = []
+    take = GuildState._take_prepared
+
+    def spy(self, song):
+        prepared = self.prepared is not None
+        source = take(self, song)
+        takes.append((self.loop_mode, prepared, source is not None))
+        return source
+
+    monkeypatch.setattr(GuildState, "_take_prepared", spy)
+
+    async def main():
+        async def ready():
+            return None
+
+        bot = types.SimpleNamespace(
+            loop=asyncio.get_running_loop(), wait_until_ready=ready,
+            dispatch=lambda *args: None, get_guild=lambda guild_id: None,
+        )
+        requester = types.SimpleNamespace(guild=None, id=1, mention="@test")
+        state = GuildState(bot, 1)
+        state.voice_client = FakeVoiceClient()
+        state.loop_mode = LoopMode.SONG
+        for i, path in enumerate(ogg_files[:2]):
+            song = Song({"title": f"Song {i}", "duration": SECONDS, "acodec": "opus"}, requester)
+            song.filepath = path
+            song.resolved = True
+            state.queue.append(song)
+
+        state.start_player_loop()
+        # Bài đầu được phát 3 lần rồi tắt chế độ lặp để phát tiếp bài sau
+        while len(state.voice_client.started) < 3:
+            await asyncio.sleep(0.05)
+        state.loop_mode = LoopMode.OFF
+        while not state.closed:
+            await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    looped = [(prepared, used) for mode, prepared, used in takes if mode == LoopMode.SONG]
+    assert len(looped) >= 3
+    assert all(used for prepared, used in looped if prepared)
+    assert sum(used for prepared, used in looped) >= 2
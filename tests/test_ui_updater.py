@@ -0,0 +1,52 @@
+import types
+import asyncio
+
+from classes import GuildState, UIUpdater, TrackedSource
+from classes.Song import Song
+
+def make_state():
+    bot = types.SimpleNamespace(user=types.SimpleNamespace(display_avatar=types.SimpleNamespace(url="https://example.com/a.png")))
+    state = GuildState(bot, 1)
+    state.ui = UIUpdater(state, interval=0.01)
+    requester = types.SimpleNamespace(guild=None, id=1, mention="@test")
+    state.current_song = Song({"title": "Song", "duration": 200}, requester)
+    state.tracker = TrackedSource(types.SimpleNamespace(is_opus=lambda: False, cleanup=lambda: None), state.current_song)
+
+    sent = []
+
+    async def update_now_playing_message(new_song=False):
+        sent.append(state.create_now_playing_embed().to_dict())
+
+    async def update_voice_channel_status():
+        pass
+
+    state.update_now_playing_message = update_now_playing_message
+    state.update_voice_channel_status = update_voice_channel_status
+    return state, sent
+
+def test_position_alone_does_not_trigger_an_edit():
+    async def main():
+        state, sent = make_state()
+        state.ui.request(new_song=True)
+        await asyncio.sleep(0.05)
+
+        # Chỉ vị trí phát thay đổi: bỏ qua
+        for _ in range(3):
+            state.tracker.samples += 48000 * 5
+            state.ui.request()
+            await asyncio.sleep(0.05)
+        skipped = state.ui.skipped
+
+        # Âm lượng thay đổi: gửi lại, kèm vị trí mới nhất
+        state.volume = 0.5
+        state.ui.request()
+        await asyncio.sleep(0.05)
+        state.ui.stop()
+        return sent, skipped
+
+    sent, skipped = asyncio.run(main())
+    assert len(sent) == 2
+    # Mỗi lượt bỏ qua cả trạng thái kênh thoại lẫn bảng điều khiển
+    assert skipped >= 6
+    positions = [next(f["value"] for f in embed["fields"] if f["name"] == "Thời lượng") for embed in sent]
+    assert positions == ["00:00 / 03:20", "00:15 / 03:20"]
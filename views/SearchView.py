@@ -1,10 +1,9 @@
 import discord
 import logging
-import asyncio
 import math
 from discord.ext import commands
 from typing import Union
-from classes import Song
+from classes import Song, SearchResult, EnqueueJob
 
 log = logging.getLogger(__name__)
 AnyContext = Union[commands.Context, discord.Interaction]
@@ -12,7 +11,7 @@ AnyContext = Union[commands.Context, discord.Interaction]
 class SearchView(discord.ui.View):
     """Giao diện cho kết quả tìm kiếm."""
 
-    def __init__(self, *, music_cog, ctx: AnyContext, results: list[Song]):
+    def __init__(self, *, music_cog, ctx: AnyContext, results: list[SearchResult]):
         super().__init__(timeout=180.0)
         self.music_cog = music_cog
         self.ctx = ctx
@@ -105,23 +104,15 @@ class SearchView(discord.ui.View):
             content="⏳ Đang tải bài hát bạn chọn...", embed=None, view=None
         )
 
-        selected_song = await Song.from_url_and_download(
-            self.results[int(interaction.data["values"][0])].url, self.requester
-        )
-
-        if selected_song:
-            state = self.music_cog.get_guild_state(interaction.guild_id)
-            await state.add_song(selected_song)
+        state = self.music_cog.get_guild_state(interaction.guild_id)
+        result = self.results[int(interaction.data["values"][0])]
 
-            if state.player_task is None or state.player_task.done():
-                state.player_task = asyncio.create_task(state.player_loop())
-            await self.message.edit(
-                content=f"✅ Đã thêm **{selected_song.title}** vào hàng đợi."
-            )
-        else:
-            await self.message.edit(
-                content=f"❌ Rất tiếc, đã có lỗi khi tải về bài hát này."
+        # Việc tải về chạy nền, tiến độ được cập nhật trên chính tin nhắn kết quả tìm kiếm
+        EnqueueJob(state.jobs, f"**{result.title}**", self.message).start(
+            lambda job: self.music_cog._enqueue_song(
+                job, state, result.url, self.requester, Song(result.to_dict(), self.requester)
             )
+        )
 
         self.stop()
 